@@ -1,7 +1,4 @@
-from . import loadSave
-from . import getProj
-from . import sceneVar
-from . import qtBase
-from . import incrementalSave
-from . import IOuserPref
-from . import stringFormat
+from .lazyModules import lazySubmodules
+
+__all__ = ['loadSave', 'getProj', 'sceneVar', 'qtBase', 'incrementalSave', 'IOuserPref', 'stringFormat']
+__getattr__, __dir__ = lazySubmodules(__name__, __all__)
@@ -0,0 +1,196 @@
+"""
+Times importing each shelf button's modules with the lazy package
+submodules against packages that import all their submodules, to check
+what the lazy submodules save on the first click. Every import is timed
+in a new interpreter with -X importtime. Outside of maya, maya, PySide2
+and the other modules only maya has are replaced with stand-ins so the
+toolbox modules still import. Run from the toolbox folder, with mayapy to
+time the real maya modules:
+
+    python -m baseIO.importTimes
+    mayapy -m baseIO.importTimes pipelime.submitToFarm --repeat 10
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+TOOLBOX_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules the shelf buttons don't import themselves but open from their mel or menus
+ENTRY_POINTS = ['baseIO.incrementalSave', 'pipelime.submitToFarm', 'pipelime.renderWatcher']
+
+# run in a new interpreter as: python -X importtime -c _CHILD module eager
+_CHILD = r'''
+import importlib, importlib.abc, importlib.machinery, importlib.util, json, sys, types
+
+# only used when the real module can't be found
+STAND_INS = {'maya', 'pymel', 'mtoa', 'PySide2', 'shiboken2'}
+
+
+class StandIn():
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return standIn(name)()
+
+    def __call__(self, *args, **kwargs):
+        return StandIn()
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+
+
+def standIn(name):
+    # a class so it can also be used as a base class
+    return type(name, (StandIn,), {})
+
+
+class StandInModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        value = standIn(name)
+        setattr(self, name, value)
+        return value
+
+
+class StandInFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def find_spec(self, name, path, target=None):
+        if name.split('.')[0] in STAND_INS:
+            return importlib.machinery.ModuleSpec(name, self, is_package=True)
+        return None
+
+    def create_module(self, spec):
+        return StandInModule(spec.name)
+
+    def exec_module(self, module):
+        pass
+
+
+sys.meta_path.append(StandInFinder())
+entry, eager = sys.argv[1], sys.argv[2] == '1'
+failed = []
+if eager:
+    # packages import every submodule when they are imported, like before they were lazy
+    spec = importlib.util.spec_from_file_location('baseIO.lazyModules', 'baseIO/lazyModules.py')
+    lazyModules = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(lazyModules)
+    sys.modules[spec.name] = lazyModules
+    lazySubmodules = lazyModules.lazySubmodules
+
+    def eagerSubmodules(packageName, submodules, attributes=None):
+        for name in submodules:
+            try:
+                importlib.import_module('.' + name, packageName)
+            except Exception:
+                failed.append('%s.%s' % (packageName, name))
+        return lazySubmodules(packageName, submodules, attributes)
+
+    lazyModules.lazySubmodules = eagerSubmodules
+
+sys.stderr.write('-- entry --\n')
+sys.stderr.flush()
+error = ''
+try:
+    importlib.import_module(entry)
+except Exception as e:
+    error = '%s: %s' % (type(e).__name__, e)
+print(json.dumps({'failed': failed, 'error': error}))
+'''
+_IMPORT_TIME = re.compile(r'^import time:\s*(\d+) \|\s*(\d+) \|( *)(\S+)')
+
+
+def shelfEntryPoints(shelfFile=None):
+    """
+    Returns the modules the python shelf buttons import, in shelf order.
+    """
+    with open(shelfFile or os.path.join(TOOLBOX_ROOT, 'toolboxShelf.json')) as f:
+        shelf = json.load(f)
+    modules = []
+
+    def walk(data):
+        if isinstance(data, dict):
+            command = data.get('command')
+            if data.get('stp') == 'python' and isinstance(command, str):
+                for statement in command.split(';'):
+                    match = re.match(r'\s*(?:import|from)\s+([\w.]+)', statement)
+                    if match and match[1] not in modules:
+                        modules.append(match[1])
+            for value in data.values():
+                walk(value)
+        elif isinstance(data, list):
+            for value in data:
+                walk(value)
+
+    walk(shelf)
+    return modules
+
+
+def _timeImport(python, module, eager):
+    # a new interpreter each time so nothing is already imported
+    result = subprocess.run([python, '-X', 'importtime', '-c', _CHILD, module, '1' if eager else '0'],
+                            cwd=TOOLBOX_ROOT, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    lines = result.stderr.split('-- entry --\n', 1)[-1].splitlines()
+    seconds, count = 0.0, 0
+    for line in lines:
+        match = _IMPORT_TIME.match(line)
+        if not match:
+            continue
+        count += 1
+        # only the imports started by the entry point itself, nested ones are in their cumulative time
+        if len(match[3]) == 1:
+            seconds += int(match[2]) / 1e6
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return seconds, count, report['failed'], report['error']
+
+
+def measureEntryPoints(modules=None, python=None, repeat=5):
+    """
+    Returns {module: {'lazy': seconds, 'eager': seconds, 'lazyModules': count,
+    'eagerModules': count, 'failed': [submodules], 'error': str}}, the median
+    time -X importtime reports for importing each module with the lazy
+    package submodules and with every submodule imported, and the number of
+    modules imported. failed are the submodules that couldn't be imported
+    even with the stand-ins and error is why the module itself couldn't.
+    """
+    python = python or sys.executable
+    results = {}
+    for module in modules or shelfEntryPoints() + ENTRY_POINTS:
+        lazy = [_timeImport(python, module, False) for _ in range(repeat)]
+        eager = [_timeImport(python, module, True) for _ in range(repeat)]
+        results[module] = {
+            'lazy': statistics.median(seconds for seconds, count, failed, error in lazy),
+            'eager': statistics.median(seconds for seconds, count, failed, error in eager),
+            'lazyModules': lazy[0][1],
+            'eagerModules': eager[0][1],
+            'failed': eager[0][2],
+            'error': lazy[0][3] or eager[0][3]
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time importing the modules of the shelf buttons.')
+    parser.add_argument('modules', nargs='*', help='Modules to time, defaults to every shelf button.')
+    parser.add_argument('--python', help='Interpreter to time, like mayapy. Defaults to this one.')
+    parser.add_argument('--repeat', type=int, default=5, help='Imports timed for each module.')
+    args = parser.parse_args()
+    for module, result in measureEntryPoints(args.modules, args.python, args.repeat).items():
+        notes = ''
+        if result['failed']:
+            notes += f', {len(result["failed"])} submodules failed to import'
+        if result['error']:
+            notes += f', failed: {result["error"]}'
+        print(f'{module}: {result["lazy"] * 1000:.1f}ms ({result["lazyModules"]} modules) lazy, '
+              f'{result["eager"] * 1000:.1f}ms ({result["eagerModules"]} modules) with every submodule{notes}')
@@ -0,0 +1,35 @@
+"""
+Lazy submodules for the toolbox packages. A package's submodules are only
+imported the first time they are used, so a shelf button only pays for the
+modules it needs.
+
+    __all__ = ['loadSave', 'getProj']
+    __getattr__, __dir__ = lazySubmodules(__name__, __all__)
+
+baseIO.importTimes measures the difference.
+"""
+import importlib
+import sys
+
+
+def lazySubmodules(packageName, submodules, attributes=None):
+    """
+    Returns the __getattr__ and __dir__ of a package whose submodules are
+    imported on first use.
+
+    attributes = {name: submodule} of names the package exposes from inside
+    one of its submodules.
+    """
+    attributes = attributes or {}
+
+    def __getattr__(name):
+        if name in attributes:
+            return getattr(importlib.import_module(f'.{attributes[name]}', packageName), name)
+        if name in submodules:
+            return importlib.import_module(f'.{name}', packageName)
+        raise AttributeError(f'module {packageName!r} has no attribute {name!r}')
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[packageName])) | set(submodules) | set(attributes))
+
+    return __getattr__, __dir__
@@ -1,5 +1,27 @@
+import contextlib
+import copy
 import json
 import os
+import socket
+import threading
+import time
+import uuid
+
+# seconds to wait for another artist to finish writing a prefs file
+LOCK_TIMEOUT = 10
+# seconds between the owner of a lock rewriting it to show it's still alive
+LOCK_HEARTBEAT = 1
+# a lock that hasn't changed for this long was left behind by a process that died,
+# timed by each waiter so clocks that differ between machines don't matter
+LOCK_STALE = 5
+# windows can't replace a file while another process is reading it
+REPLACE_ATTEMPTS = 20
+
+# path: ((mtime, size), prefDict) of files already read
+_cache = {}
+_cacheLock = threading.Lock()
+# prefs waiting to be written by the transaction open on this thread
+_local = threading.local()
 
 
 def loadJSON(f):
@@ -8,26 +30,154 @@ def loadJSON(f):
     return data
 
 
+def _fileStamp(f):
+    stat = os.stat(f)
+    return stat.st_mtime_ns, stat.st_size
+
+
 def loadDictionary(f):
+    """
+    Returns the dictionary saved in a json file, or an empty one if it can't
+    be read. Files are only read again once their modification time or size
+    changes.
+    """
     try:
-        # look for existing dictionary
-        prefDict = loadJSON(f)
-    except:
+        stamp = _fileStamp(f)
+        with _cacheLock:
+            cached = _cache.get(f)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, loadJSON(f))
+            with _cacheLock:
+                _cache[f] = cached
+        # callers are free to change what they get back
+        return copy.deepcopy(cached[1])
+    except Exception:
         # create new dictionary if it can't find one
-        prefDict = {}
-    return prefDict
+        return {}
 
 
-def writePrefsToFile(prefData, prefFile):
-    # prefData = [object,key,value],[object,key,value]
+def _lockOwner(contents):
+    # the token on the first line of a lock, the heartbeat count follows it
+    return contents.split('\n', 1)[0]
 
-    # make folder
-    folder = prefFile.rsplit('/', 1)[0]
-    if not os.path.exists(folder):
-        os.makedirs(folder)
 
-    prefDict = loadDictionary(prefFile)
-    # update in dictionary
+def _removeLock(lockFile, token):
+    # moves the lock aside before checking it's still the one taken with token,
+    # so a lock someone else took in the meantime is never removed
+    aside = '%s.%s' % (lockFile, uuid.uuid4().hex)
+    try:
+        os.rename(lockFile, aside)
+    except OSError:
+        return False
+    try:
+        with open(aside) as f:
+            owner = _lockOwner(f.read())
+    except OSError:
+        owner = None
+    if owner == token:
+        try:
+            os.remove(aside)
+        except OSError:
+            pass
+        return True
+    # someone else's, put it back unless another lock was taken since
+    try:
+        os.link(aside, lockFile)
+        os.remove(aside)
+        return False
+    except OSError:
+        pass
+    if not os.path.exists(lockFile):
+        try:
+            os.rename(aside, lockFile)
+            return False
+        except OSError:
+            pass
+    # it can't be put back, but it still isn't ours to remove
+    print('could not put back the lock of another process, left it at %s' % aside)
+    return False
+
+
+def _heartbeat(fd, token, stop):
+    # rewrites the lock through the handle it was created with, so a lock that was
+    # broken and taken by someone else is never written to
+    beat = 0
+    while not stop.wait(LOCK_HEARTBEAT):
+        beat += 1
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, ('%s\n%010d' % (token, beat)).encode())
+        except OSError:
+            return
+
+
+@contextlib.contextmanager
+def fileLock(prefFile, timeout=LOCK_TIMEOUT):
+    """
+    Stops other processes writing a file until the block finishes. The lock
+    is a file created next to it, which also works on network shares. The
+    owner rewrites it every LOCK_HEARTBEAT seconds, so only a lock that
+    stops changing for LOCK_STALE seconds is broken.
+    """
+    lockFile = '%s.lock' % prefFile
+    token = '%s %s %s' % (socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+    start = time.time()
+    # the lock being waited on and when it last changed
+    seen, seenTime = None, start
+    while True:
+        try:
+            fd = os.open(lockFile, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                with open(lockFile) as f:
+                    current = f.read()
+            except OSError:
+                # the lock was released while checking it
+                continue
+            now = time.time()
+            if current != seen:
+                seen, seenTime = current, now
+            elif now - seenTime > LOCK_STALE:
+                _removeLock(lockFile, _lockOwner(seen))
+                continue
+            if now - start > timeout:
+                raise TimeoutError('%s is locked by another process' % prefFile)
+            time.sleep(0.05)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(fd, token, stop), daemon=True)
+    try:
+        os.write(fd, ('%s\n%010d' % (token, 0)).encode())
+        heartbeat.start()
+        yield
+    finally:
+        stop.set()
+        if heartbeat.is_alive():
+            heartbeat.join()
+        os.close(fd)
+        _removeLock(lockFile, token)
+
+
+def _writeJSON(prefFile, prefDict):
+    # write next to the file and swap it in so nobody reads a half written file
+    tmpFile = '%s.%s.tmp' % (prefFile, os.getpid())
+    with open(tmpFile, mode='w') as feedsjson:
+        json.dump(prefDict, feedsjson, indent=4, sort_keys=True)
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(tmpFile, prefFile)
+            break
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                os.remove(tmpFile)
+                raise
+            time.sleep(0.1)
+    with _cacheLock:
+        _cache[prefFile] = (_fileStamp(prefFile), copy.deepcopy(prefDict))
+
+
+def updatePrefs(prefDict, prefData):
+    # update in dictionary, prefData = [object,key,value],[object,key,value]
     for pref in prefData:
         if pref[0] in prefDict:
             d = prefDict[pref[0]]
@@ -38,6 +188,54 @@ def writePrefsToFile(prefData, prefFile):
         else:
             prefDict[pref[0]] = {pref[1]: pref[2]}
 
-    # write out to json file
-    with open(prefFile, mode='w') as feedsjson:
-        json.dump(prefDict, feedsjson, indent=4, sort_keys=True)
+
+def _commit(prefFile, prefDataList):
+    # make folder
+    folder = prefFile.rsplit('/', 1)[0]
+    if not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+
+    with fileLock(prefFile):
+        # read under the lock so prefs written by someone else since are kept, straight from
+        # the file as network shares can cache its modification time and size
+        try:
+            prefDict = loadJSON(prefFile)
+        except (FileNotFoundError, ValueError):
+            prefDict = {}
+        for prefData in prefDataList:
+            updatePrefs(prefDict, prefData)
+        _writeJSON(prefFile, prefDict)
+
+
+def writePrefsToFile(prefData, prefFile):
+    # prefData = [object,key,value],[object,key,value]
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.setdefault(prefFile, []).append(prefData)
+        return
+    _commit(prefFile, [prefData])
+
+
+@contextlib.contextmanager
+def transaction():
+    """
+    Holds back the writePrefsToFile calls made inside the block and writes
+    each file once when it finishes, or not at all if it raises. Files read
+    inside the block don't include the prefs waiting to be written.
+
+        with transaction():
+            writePrefsToFile([['user', 'name', 'chris']], prefFile)
+            writePrefsToFile([['user', 'slackID', '1234']], prefFile)
+    """
+    if getattr(_local, 'pending', None) is not None:
+        # nested transactions are written by the outermost one
+        yield
+        return
+    _local.pending = {}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    for prefFile, prefDataList in pending.items():
+        _commit(prefFile, prefDataList)
@@ -1,4 +1,8 @@
+import importlib.util
+import io
 import os
+import re
+import xml.etree.ElementTree as ElementTree
 
 import maya.OpenMayaUI as omui
 import maya.cmds as cmds
@@ -29,17 +33,95 @@ def GetMayaWindow():
     return wrapInstance(int(ptr), QtWidgets.QWidget)
 
 
+# .ui path: (mtime, form class compiled from the file, top widget class)
+# or (mtime, file contents, None) when the file can't be compiled
+_uiCache = {}
+_uiLoader = None
+
+
+def _compiledForm(uiFilePath):
+    # the python the installer compiled with uic, None if it's missing or older than the .ui file
+    modulePath = '%s_ui.py' % os.path.splitext(uiFilePath)[0]
+    try:
+        if os.stat(modulePath).st_mtime < os.stat(uiFilePath).st_mtime:
+            return None
+    except OSError:
+        return None
+    spec = importlib.util.spec_from_file_location(os.path.basename(modulePath)[:-3], modulePath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return vars(module)
+
+
+def _compileUi(uiFilePath):
+    # compiles a .ui file to its Ui_ form class, None if it wasn't compiled at install
+    # and pyside2uic, which isn't shipped with maya 2022 onwards, isn't available
+    try:
+        namespace = _compiledForm(uiFilePath)
+        if namespace is None:
+            import pyside2uic
+            code = io.StringIO()
+            with open(uiFilePath) as f:
+                pyside2uic.compileUi(f, code)
+            # QUiLoader ignores .qrc files that aren't compiled, so leave out their imports too
+            code = '\n'.join(line for line in code.getvalue().splitlines()
+                             if not re.match(r'\s*import \w+_rc$', line))
+            namespace = {}
+            exec(code, namespace)
+    except ImportError:
+        # also custom widgets whose modules can't be imported
+        return None
+    return next((v for k, v in namespace.items() if k.startswith('Ui_')), None)
+
+
+def _cachedUi(uiFilePath):
+    mtime = os.stat(uiFilePath).st_mtime
+    cached = _uiCache.get(uiFilePath)
+    if cached and cached[0] == mtime:
+        return cached
+    widgetClass = ElementTree.parse(uiFilePath).getroot().find('widget').get('class')
+    # promoted and custom top widgets are left to QUiLoader
+    widgetClass = getattr(QtWidgets, widgetClass, None)
+    form = _compileUi(uiFilePath) if widgetClass is not None else None
+    if form is not None:
+        _uiCache[uiFilePath] = (mtime, form, widgetClass)
+    else:
+        with open(uiFilePath, 'rb') as f:
+            _uiCache[uiFilePath] = (mtime, f.read(), None)
+    return _uiCache[uiFilePath]
+
+
 def qtWindow(uiFilePath):
-    # load .ui file
-    loader = QtUiTools.QUiLoader()
-    uifile = QtCore.QFile(uiFilePath)
-    uifile.open(QtCore.QFile.ReadOnly)
-    qt_widget = loader.load(uifile, None)
-    # close .ui file
+    """
+    Returns a new widget built from a .ui file. Each file is only read and
+    compiled the first time it is used in a session, or again after it
+    changes, so building the same widget many times is cheap.
+    """
+    global _uiLoader
+    _, form, widgetClass = _cachedUi(uiFilePath)
+    if widgetClass is not None:
+        qt_widget = widgetClass()
+        ui = form()
+        ui.setupUi(qt_widget)
+        # child widgets are attributes of the widget, the same as QUiLoader
+        for name, value in vars(ui).items():
+            setattr(qt_widget, name, value)
+        return qt_widget
+    # load the cached .ui file
+    if _uiLoader is None:
+        _uiLoader = QtUiTools.QUiLoader()
+    uifile = QtCore.QBuffer()
+    uifile.setData(QtCore.QByteArray(form))
+    uifile.open(QtCore.QIODevice.ReadOnly)
+    qt_widget = _uiLoader.load(uifile, None)
     uifile.close()
     return qt_widget
 
 
+def clearUiCache():
+    _uiCache.clear()
+
+
 class BaseWindow(MayaQWidgetDockableMixin, QtWidgets.QMainWindow):
     # set defaults
     _windowName = 'BaseUI'
@@ -21,6 +21,14 @@ def getRenderLayers():
     return layerData
 
 
+def getRenderableCameras():
+    """
+    Returns the long names of the renderable camera shapes.
+    """
+    cameras = cmds.ls(type='camera', l=True)
+    return [c for c in cameras if cmds.getAttr(f'{c}.renderable') == 1]
+
+
 def getStartFrame():
     startFrame = cmds.playbackOptions(q=True, min=True)
     startFrameStr = str('{0:g}'.format(startFrame))
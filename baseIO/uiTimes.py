@@ -0,0 +1,67 @@
+"""
+Times opening the toolbox windows from their .ui files with QUiLoader
+against the form classes qtBase caches, to check what compiling the .ui
+files at install saves. Run it from the script editor in maya:
+
+    import baseIO.uiTimes as uiTimes
+    uiTimes.printTimes()
+"""
+import glob
+import os
+import time
+
+from PySide2 import QtCore, QtUiTools
+
+import baseIO.qtBase as qtBase
+
+
+def _timeOpen(build, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        widget = build()
+        times.append(time.perf_counter() - start)
+        widget.deleteLater()
+    return times
+
+
+def _loadUi(uiFilePath):
+    # the same as qtBase before the form classes were cached
+    uifile = QtCore.QFile(uiFilePath)
+    uifile.open(QtCore.QFile.ReadOnly)
+    widget = QtUiTools.QUiLoader().load(uifile, None)
+    uifile.close()
+    return widget
+
+
+def measureWindows(uiFiles=None, repeat=10):
+    """
+    Returns {.ui path: {'loader': seconds, 'first': seconds, 'cached': seconds,
+    'compiled': bool}}, the fastest time to build each window with QUiLoader,
+    the time qtWindow took the first time and the fastest time after that.
+    compiled is False when qtWindow had to fall back to QUiLoader.
+    """
+    if uiFiles is None:
+        uiFiles = sorted(glob.glob('%s/*/*.ui' % qtBase.self_path()))
+    results = {}
+    for uiFilePath in uiFiles:
+        qtBase._uiCache.pop(uiFilePath, None)
+        first = _timeOpen(lambda: qtBase.qtWindow(uiFilePath), 1)[0]
+        cached = _timeOpen(lambda: qtBase.qtWindow(uiFilePath), repeat)
+        loader = _timeOpen(lambda: _loadUi(uiFilePath), repeat)
+        results[uiFilePath] = {
+            'loader': min(loader),
+            'first': first,
+            'cached': min(cached),
+            'compiled': qtBase._uiCache[uiFilePath][2] is not None
+        }
+    QtCore.QCoreApplication.processEvents()
+    return results
+
+
+def printTimes(uiFiles=None, repeat=10):
+    for uiFilePath, result in measureWindows(uiFiles, repeat).items():
+        loaded = '' if result['compiled'] else ', not compiled'
+        print('%s: %.1fms with QUiLoader, %.1fms the first time, %.1fms cached%s' % (
+            os.path.basename(uiFilePath), result['loader'] * 1000, result['first'] * 1000,
+            result['cached'] * 1000, loaded))
@@ -1,20 +1,52 @@
+from __future__ import annotations
+
+import argparse
 import asyncio
+import codecs
+import contextlib
+import hashlib
+import http.client
+import importlib.util
+import io
 import json
+import multiprocessing
 import os.path
 import inspect
+import py_compile
 import re
 import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import time
 import traceback
+import urllib.parse
 import urllib.request
-
-from PySide2.QtCore import Qt
-from PySide2.QtWidgets import *
-from PySide2.QtGui import QIcon
-from maya import cmds
-from maya import mel
-from maya.OpenMayaUI import MQtUtil
-from maya.app.general.mayaMixin import MayaQWidgetBaseMixin
-from shiboken2 import wrapInstance
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PySide2.QtCore import Qt
+    from PySide2.QtWidgets import *
+    from PySide2.QtGui import QIcon
+    from maya.OpenMayaUI import MQtUtil
+    from maya.app.general.mayaMixin import MayaQWidgetBaseMixin
+    from shiboken2 import wrapInstance
+except ImportError:
+    # Running headless from plain python, the installer window is not available.
+    class _Headless:
+        """Stand-in base for the Qt widgets when running without a UI."""
+
+    Qt = None
+    QWidget = QPushButton = QDialog = _Headless
+    MayaQWidgetBaseMixin = type('MayaQWidgetBaseMixin', (), {})
+
+try:
+    from maya import cmds
+    from maya import mel
+except ImportError:
+    cmds = mel = None
 import urllib.request as request
 from typing import Optional
 
@@ -26,6 +58,19 @@ _NETWORK_ROOT = '\\\\bigtop/bigtop'
 W_OBJ = 'cirkusinstallerwindow'
 W_TITLE = 'Cirkus Toolbox Installer'
 DEFAULT_PATH = 'Server (default)'
+# Max number of files being copied/downloaded at the same time
+MAX_TRANSFERS = 8
+# Manifest listing every file in the source tree/repo and the one
+# written into each install directory to track what was installed.
+SOURCE_MANIFEST = 'toolboxManifest.json'
+INSTALL_MANIFEST = '.toolboxManifest.json'
+# Size of the blocks read and written while downloading
+BLOCK_SIZE = 64 * 1024
+# Tag set on every shelf control made by the installer so it can tell
+# them apart from buttons that were added by the user.
+SHELF_TAG = 'cirkusToolbox'
+# Seconds cached remote files are used before checking for changes
+CACHE_FRESH_SECONDS = 300
 
 
 def _maya_main_window():
@@ -55,48 +100,722 @@ def _maya_delete_workspace(window_object):
         cmds.deleteUI(control, control=True)
 
 
-def download_data(url: str, local: str = None) -> Optional[str]:
+def iter_download(response, block_size: int = BLOCK_SIZE):
+    """
+    Yields the body of a response in blocks of block_size until it has
+    been fully read.
+    """
+    while True:
+        block = response.read(block_size)
+        if not block:
+            break
+        yield block
+
+
+class _PooledResponse:
+    """
+    Wraps a response from the ConnectionPool. Once it's closed the
+    connection is handed back to the pool if it can be reused and the
+    timing of the request is recorded.
+    """
+
+    def __init__(self, pool, key, conn, response, timing: dict):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self._timing = timing
+        self._start = time.perf_counter()
+        self.status = response.status
+        self.headers = response.headers
+
+    def read(self, amt: int = None) -> bytes:
+        block = self._response.read(amt)
+        self._timing['size'] += len(block)
+        return block
+
+    def close(self):
+        if self._conn is None:
+            return
+        self._timing['transfer'] = time.perf_counter() - self._start
+        self._pool.record(self._timing)
+        # Only keep the connection if the whole body has been read
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool.release(self._key, self._conn)
+        else:
+            self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Keeps a small pool of persistent HTTP/1.1 connections for each host so
+    that every download doesn't pay for a new TCP and TLS handshake. Each
+    request is timed and split into the time spent connecting, waiting on
+    the server and transferring the payload.
+    """
+
+    def __init__(self, size: int = MAX_TRANSFERS, timeout: float = 30):
+        self.size = size
+        self.timeout = timeout
+        self.timings = []
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: tuple):
+        """Returns an idle connection to the host or a new unconnected one."""
+        with self._lock:
+            idle = self._idle.get(key, [])
+            if idle:
+                return idle.pop(), True
+        scheme, host = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, timeout=self.timeout), False
+        return http.client.HTTPConnection(host, timeout=self.timeout), False
+
+    def release(self, key: tuple, conn):
+        """Hands a connection back to the pool, closing it if the pool is full."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def record(self, timing: dict):
+        with self._lock:
+            self.timings.append(timing)
+
+    def close(self):
+        """Closes all the idle connections."""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def urlopen(self, url: str, headers: dict = None, _redirects: int = 5) -> _PooledResponse:
+        """
+        Makes a GET request and returns the response. Any status that isn't
+        a success raises a HTTPError the same as urllib.request.urlopen.
+        """
+        from urllib.error import HTTPError, URLError
+
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or '/'
+        if parts.query:
+            path += f'?{parts.query}'
+
+        conn, reused = self._acquire(key)
+        timing = {'url': url, 'reused': reused, 'connect': 0.0, 'wait': 0.0, 'transfer': 0.0, 'size': 0}
+        try:
+            if not reused:
+                start = time.perf_counter()
+                conn.connect()
+                timing['connect'] = time.perf_counter() - start
+            start = time.perf_counter()
+            conn.request('GET', path, headers=headers or {})
+            response = conn.getresponse()
+            timing['wait'] = time.perf_counter() - start
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()
+            # The server may have dropped an idle connection, retry on a new one
+            if reused:
+                return self.urlopen(url, headers, _redirects)
+            raise URLError(e)
+
+        pooled = _PooledResponse(self, key, conn, response, timing)
+        if 200 <= response.status < 300:
+            return pooled
+
+        # Drain the body so the connection can be used again
+        with pooled:
+            pooled.read()
+        location = response.headers.get('Location')
+        if response.status in (301, 302, 303, 307, 308) and location and _redirects:
+            return self.urlopen(urllib.parse.urljoin(url, location), headers, _redirects - 1)
+        raise HTTPError(url, response.status, response.reason, response.headers, None)
+
+    def summary(self) -> dict:
+        """Totals the timings of every request made through the pool."""
+        with self._lock:
+            timings = list(self.timings)
+        return {
+            'requests': len(timings),
+            'connections': sum(1 for t in timings if not t['reused']),
+            'connect': sum(t['connect'] for t in timings),
+            'wait': sum(t['wait'] for t in timings),
+            'transfer': sum(t['transfer'] for t in timings),
+            'size': sum(t['size'] for t in timings)
+        }
+
+
+_POOL = ConnectionPool()
+
+
+def download_data(url: str, local: str = None, resume: bool = True) -> Optional[str]:
     """
     Downloads data from an url. If local is not defined or set to None
     then it this will return the data in a string format otherwise
     it will be written to file.
 
+    Files are downloaded into a .part file next to local and only renamed
+    once complete so an interrupted download never leaves a truncated file
+    behind. If a .part file already exists the download will continue from
+    where it stopped.
+
     :url:    URL to where the data is being downloaded from.
 
     :local:  Full path to the local file the data will be written into.
              if this is empty then it will be returned,
+
+    :resume: Continue from a previously interrupted download if possible.
+    """
+    if local is None:
+        # Decode incrementally so characters split between blocks are kept whole
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        data = io.StringIO()
+        with _POOL.urlopen(url) as req:
+            for block in iter_download(req):
+                data.write(decoder.decode(block))
+        data.write(decoder.decode(b'', final=True))
+        return data.getvalue()
+
+    download_file(url, local, resume=resume)
+    return None
+
+
+def download_file(url: str, local: str, headers: dict = None, resume: bool = True,
+                  validator: str = None):
     """
-    data = None
-    to_file = local is not None
+    Streams an url into a local file through a .part file and returns the
+    response headers once the file has been renamed into place.
 
-    if to_file and not os.path.exists(os.path.dirname(local)):
-        os.makedirs(os.path.dirname(local))
+    :headers:   Extra headers sent with the request.
 
-    def write_file(r, f):
-        while True:
-            block = r.read(8129)
-            if not block:
-                break
-            f.write(block)
+    :validator: ETag or Last-Modified value of the partial file. When set the
+                resume is only honoured if the remote file hasn't changed.
+    """
+    os.makedirs(os.path.dirname(local), exist_ok=True)
+    part = f'{local}.part'
+    offset = os.path.getsize(part) if resume and os.path.isfile(part) else 0
+
+    headers = dict(headers or {})
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        if validator:
+            headers['If-Range'] = validator
+
+    from urllib.error import HTTPError
+    try:
+        response = _POOL.urlopen(url, headers)
+    except HTTPError as e:
+        # The part file is not valid for the resource anymore, start again.
+        if e.code != 416 or not offset:
+            raise
+        if os.path.isfile(part):
+            os.remove(part)
+        headers.pop('Range', None)
+        headers.pop('If-Range', None)
+        return download_file(url, local, headers, resume=False)
+
+    with response:
+        # Servers not supporting ranges send the whole file back with a 200
+        mode = 'ab' if offset and response.status == 206 else 'wb'
+        expected = response.headers.get('Content-Length')
+        written = 0
+        with open(part, mode, buffering=BLOCK_SIZE) as file:
+            for block in iter_download(response):
+                file.write(block)
+                written += len(block)
+
+    if expected is not None and written < int(expected):
+        raise IOError(f'Download of {url} was interrupted after {written} of {expected} bytes')
+
+    os.replace(part, local)
+    return response.headers
+
+
+class HttpCache:
+    """
+    On-disk cache for remote files keyed by their url. The ETag and
+    Last-Modified headers are stored next to each file so it can be
+    revalidated with a conditional request instead of downloaded again.
+    If the network can't be reached the cached copy is used instead.
+    """
 
-    def write_data(r):
-        nonlocal data
-        if data is None:
-            data = ''
-        while True:
-            block = r.read(8129)
-            if not block:
-                break
-            data += block.decode('utf-8')
-
-    with request.urlopen(url) as req:
-        if to_file:
-            with open(local, 'wb') as file:
-                write_file(req, file)
+    def __init__(self, root: str = None, fresh_seconds: float = CACHE_FRESH_SECONDS):
+        if root is None:
+            root = os.getenv('MAYA_APP_DIR') or os.path.expanduser('~/maya')
+            root = f'{root}/cache/cirkusToolbox'
+        self.root = root
+        self.fresh_seconds = fresh_seconds
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def paths(self, url: str) -> tuple:
+        """Returns the path to the cached body and its metadata for an url."""
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return f'{self.root}/{key}', f'{self.root}/{key}.json'
+
+    def fetch(self, url: str) -> str:
+        """
+        Makes sure the url is cached and up-to-date and returns the path to
+        the cached file. Recently checked files are used without making a
+        request at all.
+        """
+        # Only one thread can update the same url at a time
+        with self._lock:
+            lock = self._locks.setdefault(url, threading.Lock())
+        with lock:
+            return self._fetch(url)
+
+    def _fetch(self, url: str) -> str:
+        body, meta_path = self.paths(url)
+        meta = load_manifest(meta_path) if os.path.isfile(body) else {}
+
+        if meta and time.time() - meta.get('checked', 0) < self.fresh_seconds:
+            return body
+
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        from urllib.error import HTTPError, URLError
+        try:
+            response_headers = download_file(url, body, headers, validator=meta.get('etag'))
+        except HTTPError as e:
+            if e.code != 304:
+                raise
+            response_headers = e.headers
+        except (URLError, OSError) as e:
+            if not meta:
+                raise
+            print(f'Unable to reach {url} ({e}), using the cached copy.')
+            return body
+
+        meta = {
+            'url': url,
+            'etag': response_headers.get('ETag', meta.get('etag')),
+            'last_modified': response_headers.get('Last-Modified', meta.get('last_modified')),
+            'checked': time.time()
+        }
+        write_manifest(meta_path, meta)
+        return body
+
+
+def fetch_cached(url: str, local: str = None) -> Optional[str]:
+    """
+    Works the same as download_data but goes through the HttpCache so
+    unchanged files are not downloaded again.
+    """
+    cached = _HTTP_CACHE.fetch(url)
+    if local is None:
+        with open(cached, 'r', encoding='utf-8') as content:
+            return content.read()
+
+    os.makedirs(os.path.dirname(local), exist_ok=True)
+    shutil.copyfile(cached, f'{local}.part')
+    os.replace(f'{local}.part', local)
+    return None
+
+
+def copy_file(src: str, dst: str) -> int:
+    """
+    Copies a single file into its destination, creating any missing
+    directories on the way. Returns the size of the copied file in bytes.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    # copy2 keeps the modified time so it can be matched with the source
+    shutil.copy2(src, dst)
+    return os.path.getsize(dst)
+
+
+def fetch_file(url: str, dst: str) -> int:
+    """
+    Downloads a single file into its destination. Returns the size of the
+    downloaded file in bytes.
+    """
+    fetch_cached(url, dst)
+    return os.path.getsize(dst)
+
+
+def format_rate(size: int, seconds: float) -> str:
+    """Formats a transfer size over time into a human-readable rate."""
+    rate = size / max(seconds, 1e-6)
+    for unit in ('B', 'KB', 'MB'):
+        if rate < 1024:
+            return f'{rate:.1f} {unit}/s'
+        rate /= 1024
+    return f'{rate:.1f} GB/s'
+
+
+def file_digest(path: str) -> str:
+    """Returns the sha1 hash of a files content."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_entry(path: str, digest: bool = True) -> dict:
+    """
+    Creates a manifest entry for a file with its size, modified time
+    and optionally the hash of its content.
+    """
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'hash': file_digest(path) if digest else None
+    }
+
+
+def build_manifest(root: str, files: list, digest: bool = True) -> dict:
+    """
+    Builds a manifest for all the given files relative to root. Files that
+    do not exist are left out of the manifest.
+    """
+    manifest = {}
+    for file in files:
+        path = f'{root}/{file}'
+        if os.path.isfile(path):
+            manifest[file] = file_entry(path, digest)
+    return manifest
+
+
+def load_manifest(path: str) -> dict:
+    """Loads a manifest from file returning an empty one if it can't be read."""
+    try:
+        with open(path, 'r') as content:
+            return json.loads(content.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(path: str, manifest: dict):
+    """Writes a manifest to file."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as content:
+        json.dump(manifest, content, indent=4, sort_keys=True)
+
+
+def entry_changed(src: Optional[dict], installed: Optional[dict]) -> bool:
+    """
+    Checks if a file needs to be transferred again by comparing its source
+    entry with the entry of what was installed. Hashes are compared if
+    both sides have one otherwise it falls back to the size and modified time.
+    """
+    if src is None or installed is None:
+        return True
+    if src.get('hash') and installed.get('hash'):
+        return src['hash'] != installed['hash']
+    return src['size'] != installed['size'] or abs(src['mtime'] - installed['mtime']) > 1
+
+
+def index_source(root: str, tool_data: dict, tools: list = None) -> list:
+    """
+    Returns every file path relative to root that is needed to install
+    the given tools. If tools is not set then all tools are indexed.
+    """
+    if tools is None:
+        tools = list(tool_data)
+    installer = Installer(None, tool_data, tools, {'path': root, 'is_local': True},
+                          root, root, None, None)
+    for tool in tool_data:
+        if tool in tools:
+            installer.index_files(tool_data[tool])
+
+    files = installer.scripts + installer.modules + [f'icons/{icon}' for icon in installer.icons]
+    return list(dict.fromkeys(files))
+
+
+def write_source_manifest(root: str) -> str:
+    """
+    Generates the manifest for every file listed in the toolboxShelf.json of
+    a source tree. Remote installs use it to tell which files are out of
+    date without a request per file, so it should be written and committed
+    with every release. Without it every file's ETag is checked instead.
+    """
+    with open(f'{root}/toolboxShelf.json', 'r') as content:
+        tool_data = json.loads(content.read())
+
+    path = f'{root}/{SOURCE_MANIFEST}'
+    write_manifest(path, build_manifest(root, index_source(root, tool_data)))
+    return path
+
+
+def build_bundle(root: str, out: str, tools: list = None) -> str:
+    """
+    Packs the selected tools of a source tree into a single compressed
+    archive that can be installed from without any other files. The
+    toolboxShelf.json and manifest are written first so the installer can
+    work out what to extract in the same single read of the archive.
+    """
+    with open(f'{root}/toolboxShelf.json', 'r') as content:
+        tool_data = json.loads(content.read())
+    if tools is not None:
+        tool_data = {tool: tool_data[tool] for tool in tool_data if tool in tools}
+
+    files = [file for file in index_source(root, tool_data) if os.path.isfile(f'{root}/{file}')]
+    manifest = build_manifest(root, files)
+
+    def add_json(bundle, name, data):
+        # Keep the key order so the shelf buttons stay in the same order
+        raw = json.dumps(data, indent=4).encode('utf-8')
+        info = tarfile.TarInfo(name)
+        info.size = len(raw)
+        info.mtime = int(time.time())
+        bundle.addfile(info, io.BytesIO(raw))
+
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with tarfile.open(f'{out}.part', 'w:gz') as bundle:
+        add_json(bundle, 'toolboxShelf.json', tool_data)
+        add_json(bundle, SOURCE_MANIFEST, manifest)
+        for file in files:
+            bundle.add(f'{root}/{file}', arcname=file)
+    os.replace(f'{out}.part', out)
+    print(f'Bundled {len(files)} files from {len(tool_data)} tools into {out}')
+    return out
+
+
+def read_bundle_shelf(path: str) -> dict:
+    """Reads the toolboxShelf.json data from the start of a bundle."""
+    with tarfile.open(path, 'r|gz') as bundle:
+        for member in bundle:
+            if member.name == 'toolboxShelf.json':
+                return json.loads(bundle.extractfile(member).read())
+    raise ValueError(f'{path} is not a valid toolbox bundle')
+
+
+_HTTP_CACHE = HttpCache()
+
+
+def python_cache_info(python: str = None) -> tuple:
+    """
+    Returns the cache tag and bytecode magic number used by a python
+    interpreter. If python is not set the current interpreter is used.
+    """
+    if python is None:
+        return sys.implementation.cache_tag, importlib.util.MAGIC_NUMBER
+    info = subprocess.check_output([
+        python, '-c',
+        'import sys, importlib.util; print(sys.implementation.cache_tag, importlib.util.MAGIC_NUMBER.hex())'
+    ], text=True).split()
+    return info[0], bytes.fromhex(info[1])
+
+
+def pyc_path(path: str, cache_tag: str) -> str:
+    """Returns where the compiled bytecode of a module is cached for a cache tag."""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, '__pycache__', f'{os.path.splitext(name)[0]}.{cache_tag}.pyc')
+
+
+def pyc_is_valid(path: str, cache_tag: str, magic: bytes) -> bool:
+    """
+    Checks if a module has a cached .pyc for the given interpreter that
+    still matches the modified time and size of the source.
+    """
+    try:
+        stat = os.stat(path)
+        with open(pyc_path(path, cache_tag), 'rb') as file:
+            header = file.read(16)
+    except OSError:
+        return False
+    if len(header) < 16 or header[:4] != magic or int.from_bytes(header[4:8], 'little') != 0:
+        return False
+    mtime = int.from_bytes(header[8:12], 'little')
+    size = int.from_bytes(header[12:16], 'little')
+    return mtime == int(stat.st_mtime) & 0xFFFFFFFF and size == stat.st_size & 0xFFFFFFFF
+
+
+def _compile_module(path: str) -> tuple:
+    """Compiles a single module returning how long it took and any error."""
+    start = time.perf_counter()
+    try:
+        py_compile.compile(path, doraise=True)
+    except py_compile.PyCompileError as e:
+        return path, 0.0, e.msg
+    return path, time.perf_counter() - start, None
+
+
+# run by the target interpreter with the modules to compile on stdin, one per line
+_COMPILE_MODULES = r'''
+import json, py_compile, sys, time
+results = []
+for path in sys.stdin.read().splitlines():
+    start = time.perf_counter()
+    try:
+        py_compile.compile(path, doraise=True)
+        results.append([path, time.perf_counter() - start, None])
+    except py_compile.PyCompileError as e:
+        results.append([path, 0.0, e.msg])
+print(json.dumps(results))
+'''
+
+
+def _compile_with(python: str, paths: list, workers: int = None) -> list:
+    """
+    Compiles modules with another interpreter, split between a process for
+    each worker, returning how long each module took and any error.
+    """
+    count = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    processes = []
+    for i in range(count):
+        process = subprocess.Popen([python, '-c', _COMPILE_MODULES], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, text=True)
+        processes.append((process, paths[i::count]))
+    results = []
+    for process, chunk in processes:
+        output = process.communicate('\n'.join(chunk))[0]
+        try:
+            results += [tuple(result) for result in json.loads(output.strip().splitlines()[-1])]
+        except (ValueError, IndexError):
+            # the modules it didn't compile are counted as failed from their missing .pyc
+            pass
+    return results
+
+
+def precompile_modules(paths: list, python: str = None, workers: int = None) -> dict:
+    """
+    Compiles modules to .pyc in a process pool so the first import of each
+    tool doesn't need to compile it. Modules with a valid cache are skipped.
+
+    :python: Interpreter to compile for, like the mayapy of the target maya
+             version. Defaults to the current interpreter.
+
+    Returns the number of modules compiled, skipped and failed along with the
+    compile time that is saved on first import, the time the interpreter
+    took to compile each module added up.
+    """
+    start = time.perf_counter()
+    cache_tag, magic = python_cache_info(python)
+    pending = [path for path in paths if not pyc_is_valid(path, cache_tag, magic)]
+    report = {'compiled': 0, 'skipped': len(paths) - len(pending), 'failed': [], 'saved': 0.0, 'seconds': 0.0}
+
+    results = []
+    if pending and python is not None:
+        # Let the target interpreter compile and time the modules itself
+        results = _compile_with(python, pending, workers)
+    elif pending:
+        # Inside of maya sys.executable is maya itself so use mayapy for the workers
+        context = multiprocessing.get_context('spawn')
+        if not _is_headless():
+            mayapy = os.path.join(os.path.dirname(sys.executable), 'mayapy')
+            context.set_executable(f'{mayapy}.exe' if os.name == 'nt' else mayapy)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                results = list(pool.map(_compile_module, pending))
+        except (BrokenProcessPool, OSError):
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_compile_module, pending))
+    for path, seconds, error in results:
+        if error is not None:
+            report['failed'].append(path)
+            print(f'Failed to compile {path}: {error}')
+        report['saved'] += seconds
+
+    report['failed'] += [path for path in pending if path not in report['failed']
+                         and not pyc_is_valid(path, cache_tag, magic)]
+    report['compiled'] = len(pending) - len(report['failed'])
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def ui_module_path(path: str) -> str:
+    """Returns where the python compiled from a .ui file is written, <name>_ui.py next to it."""
+    return f'{os.path.splitext(path)[0]}_ui.py'
+
+
+def find_uic(python: str = None) -> Optional[str]:
+    """
+    Returns the uic that ships with PySide2 for an interpreter, or None if it
+    can't be found. Defaults to the current interpreter.
+    """
+    try:
+        if python is None:
+            import PySide2
+            folder = os.path.dirname(PySide2.__file__)
         else:
-            write_data(req)
+            folder = subprocess.check_output([
+                python, '-c', 'import os, PySide2; print(os.path.dirname(PySide2.__file__))'
+            ], text=True).strip()
+    except (ImportError, OSError, subprocess.CalledProcessError):
+        folder = None
+    # PySide2 5.15 puts uic in its package, maya also has one next to mayapy
+    folders = [folder] if folder else []
+    folders.append(os.path.dirname(python or sys.executable))
+    for folder in folders:
+        for name in ('uic', 'uic.exe'):
+            if os.path.isfile(os.path.join(folder, name)):
+                return os.path.join(folder, name)
+    return shutil.which('uic')
+
+
+def _compile_ui(uic: str, path: str) -> tuple:
+    """Compiles a single .ui file to python returning any error."""
+    result = subprocess.run([uic, '-g', 'python', path], capture_output=True)
+    if result.returncode:
+        return path, result.stderr.decode('utf-8', 'replace').strip() or f'uic exited with {result.returncode}'
+    # QUiLoader ignores .qrc files that aren't compiled, so leave out their imports too
+    code = '\n'.join(line for line in result.stdout.decode('utf-8').splitlines()
+                     if not re.match(r'\s*import \w+_rc$', line))
+    with open(ui_module_path(path), 'w', encoding='utf-8') as file:
+        file.write(f'{code}\n')
+    return path, None
+
+
+def precompile_ui(paths: list, python: str = None, workers: int = None) -> dict:
+    """
+    Compiles .ui files to python with uic so baseIO.qtBase can build windows
+    from a form class instead of parsing the xml every time. Files whose
+    python is newer than the .ui are skipped.
+
+    :python: Interpreter whose PySide2 uic is used, like the mayapy of the
+             target maya version. Defaults to the current interpreter.
 
-    return data
+    Returns the python modules of the .ui files, so they can be compiled to
+    .pyc as well, along with the number compiled, skipped and failed.
+    """
+    start = time.perf_counter()
+    report = {'modules': [], 'compiled': 0, 'skipped': 0, 'failed': [], 'seconds': 0.0}
+    pending = []
+    for path in paths:
+        try:
+            if os.stat(ui_module_path(path)).st_mtime >= os.stat(path).st_mtime:
+                report['skipped'] += 1
+                report['modules'].append(ui_module_path(path))
+                continue
+        except OSError:
+            pass
+        pending.append(path)
+
+    uic = find_uic(python) if pending else None
+    if pending and uic is None:
+        print('uic was not found, the .ui files will be loaded when the windows open')
+        report['failed'] = pending
+    elif pending:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, error in pool.map(lambda path: _compile_ui(uic, path), pending):
+                if error is not None:
+                    report['failed'].append(path)
+                    print(f'Failed to compile {path}: {error}')
+                    continue
+                report['compiled'] += 1
+                report['modules'].append(ui_module_path(path))
+    report['seconds'] = time.perf_counter() - start
+    return report
 
 
 def _clean_up():
@@ -139,9 +858,10 @@ def _create_shelf_popups(parent: str, click_type: str, menus: list):
         )
 
 
-def create_shelf_button(parent: str, btn_data: dict):
+def create_shelf_button(parent: str, btn_data: dict, tag: str = '') -> str:
     """
-    Creates a new shelf button from the given data.
+    Creates a new shelf button from the given data. Returns the name of
+    the created control.
     """
     label = btn_data.get('label', 'Undefined Button')
     icon = btn_data.get('icon', 'commandButton.png')
@@ -151,8 +871,7 @@ def create_shelf_button(parent: str, btn_data: dict):
 
     if icon == 'separator':
         # Make it a seperator if it is one
-        cmds.separator(p=parent, style='shelf', horizontal=0)
-        return
+        return cmds.separator(p=parent, style='shelf', horizontal=0, docTag=tag)
 
     if isinstance(icon, list):
         icon = icon[0]
@@ -166,13 +885,125 @@ def create_shelf_button(parent: str, btn_data: dict):
         command=cmd,
         commandRepeatable=True,
         sourceType=stp,
-        statusBarMessage=sbm
+        statusBarMessage=sbm,
+        docTag=tag
     )
 
     # If button has a menu item create it
     if 'menuItem' in btn_data:
         click_type = btn_data.get('menuItem-click-type', 'right').lower()
         _create_shelf_popups(shelf_btn, click_type, btn_data.get('menuItem', []))
+    return shelf_btn
+
+
+def shelf_button_tag(btn_data: dict) -> str:
+    """
+    Returns the tag for a button made from btn_data. The tag changes whenever
+    anything in the data changes so it can be used to find outdated buttons.
+    """
+    digest = hashlib.sha1(json.dumps(btn_data, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'{SHELF_TAG}:{digest}'
+
+
+@contextlib.contextmanager
+def _suspend_shelf_updates(shelf: str):
+    """Stops maya and the shelf widget from redrawing until all changes are made."""
+    widget = None
+    if Qt is not None and not _is_headless():
+        ptr = MQtUtil.findLayout(shelf)
+        if ptr is not None:
+            widget = wrapInstance(int(ptr), QWidget)
+            widget.setUpdatesEnabled(False)
+    cmds.refresh(suspend=True)
+    try:
+        yield
+    finally:
+        cmds.refresh(suspend=False)
+        if widget is not None:
+            widget.setUpdatesEnabled(True)
+
+
+def reconcile_shelf(shelf: str, buttons: list) -> dict:
+    """
+    Updates a shelf to match the given button data using the least amount
+    of changes. Buttons are matched by their tag first and then by their label
+    and command. Matched buttons are kept or updated in place, missing ones
+    are added and any button previously made by the installer that is no
+    longer wanted is removed. Buttons added by the user are left alone.
+
+    Returns the number of buttons added, updated, removed and unchanged.
+    """
+    result = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+    by_tag = {}
+    by_key = {}
+    ours = set()
+    for control in cmds.shelfLayout(shelf, q=True, childArray=True) or []:
+        tag = cmds.control(control, q=True, docTag=True) or ''
+        if tag.startswith(SHELF_TAG):
+            ours.add(control)
+            by_tag.setdefault(tag, []).append(control)
+        if cmds.objectTypeUI(control, isType='shelfButton'):
+            key = (cmds.shelfButton(control, q=True, label=True), cmds.shelfButton(control, q=True, command=True))
+            by_key.setdefault(key, []).append(control)
+
+    def take(mapping: dict, key) -> Optional[str]:
+        # Get the first unclaimed control for a key
+        for control in mapping.get(key, []):
+            if control not in keep:
+                return control
+        return None
+
+    keep = []
+    with _suspend_shelf_updates(shelf):
+        for btn in buttons:
+            tag = shelf_button_tag(btn)
+            control = take(by_tag, tag)
+            if control is not None:
+                result['unchanged'] += 1
+                keep.append(control)
+                continue
+
+            control = None
+            if btn.get('icon') != 'separator':
+                control = take(by_key, (btn.get('label', 'Undefined Button'), btn.get('command', '')))
+            if control is not None and 'menuItem' not in btn:
+                # Same button with different settings so update it in place
+                icon = btn.get('icon', 'commandButton.png')
+                cmds.shelfButton(
+                    control, e=True,
+                    image1=icon[0] if isinstance(icon, list) else icon,
+                    sourceType=btn.get('stp', 'mel'),
+                    statusBarMessage=btn.get('sbm', ''),
+                    docTag=tag
+                )
+                ours.add(control)
+                result['updated'] += 1
+                keep.append(control)
+                continue
+            if control is not None:
+                # Menus can't be edited so rebuild the button
+                cmds.deleteUI(control)
+                ours.discard(control)
+                result['updated'] += 1
+            else:
+                result['added'] += 1
+            keep.append(create_shelf_button(shelf, btn, tag))
+
+        for control in ours - set(keep):
+            cmds.deleteUI(control)
+            result['removed'] += 1
+
+        # Put the buttons back into order if they have been moved around
+        children = cmds.shelfLayout(shelf, q=True, childArray=True) or []
+        positions = [children.index(control) for control in keep]
+        if positions != sorted(positions):
+            start = min(positions) + 1
+            for index, control in enumerate(keep):
+                cmds.shelfLayout(shelf, e=True, position=(control, start + index))
+
+    print(f'Shelf {shelf}: {result["added"]} added, {result["updated"]} updated, '
+          f'{result["removed"]} removed, {result["unchanged"]} unchanged')
+    return result
 
 
 def remove_shelf_button(shelf, button):
@@ -200,6 +1031,117 @@ def remove_shelf_button(shelf, button):
             cmds.deleteUI(btn)
 
 
+class ShelfStandIn:
+    """
+    Stand-in for the maya.cmds and maya.mel shelf commands used by the
+    installer when running without the Maya UI. Every control is recorded
+    so the shelf can be written out as a shelf_<name>.mel file that maya
+    loads on its next start.
+    """
+
+    def __init__(self):
+        self.shelves = {}
+        self._controls = {}
+        self._count = 0
+
+    def _add(self, parent: str, kind: str, **flags) -> str:
+        self._count += 1
+        name = f'{parent}|{kind}{self._count}'
+        self._controls[name] = dict(flags, name=name, type=kind, parent=parent, menu=[])
+        if parent in self.shelves:
+            self.shelves[parent].append(name)
+        return name
+
+    def eval(self, command: str):
+        """Handles the mel addNewShelfTab command."""
+        match = re.match('addNewShelfTab\\("(.+)"\\)', command)
+        if match:
+            self.shelves.setdefault(match[1], [])
+
+    def layout(self, name: str, q: bool = False, ca: bool = False) -> list:
+        return list(self.shelves)
+
+    def shelfLayout(self, shelf: str, q: bool = False, e: bool = False, childArray: bool = False,
+                    position: tuple = None) -> list:
+        if e and position is not None:
+            children = self.shelves[shelf]
+            children.remove(position[0])
+            children.insert(position[1] - 1, position[0])
+        return list(self.shelves.get(shelf, []))
+
+    def control(self, name: str, q: bool = False, docTag: bool = False) -> str:
+        return self._controls[name].get('docTag', '')
+
+    def refresh(self, suspend: bool = False):
+        pass
+
+    def shelfButton(self, name: str = None, e: bool = False, q: bool = False, p: str = None,
+                    mi: tuple = None, **flags):
+        if q:
+            return self._controls[name].get(next(iter(flags)), '')
+        if e:
+            control = self._controls[name]
+            if mi is not None:
+                control['menu'].append({'label': mi[0], 'command': mi[1]})
+            control.update(flags)
+            return name
+        return self._add(p, 'shelfButton', **flags)
+
+    def separator(self, p: str = None, **flags) -> str:
+        return self._add(p, 'separator', **flags)
+
+    def popupMenu(self, p: str = None, **flags) -> str:
+        return p
+
+    def menuItem(self, p: str = None, l: str = '', d: bool = False, command: str = ''):
+        if not d:
+            self._controls[p]['menu'].append({'label': l, 'command': command})
+
+    def objectTypeUI(self, name: str, isType: str = None) -> bool:
+        return self._controls[name]['type'] == isType
+
+    def deleteUI(self, name: str):
+        control = self._controls.pop(name)
+        self.shelves[control['parent']].remove(name)
+
+    def warning(self, message: str):
+        print(f'Warning: {message}')
+
+    def to_mel(self, shelf: str) -> str:
+        """Returns the shelf in the same format maya saves shelf_<name>.mel files."""
+        def esc(value) -> str:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+            return value.replace('\n', '\\n')
+
+        lines = [f'global proc shelf_{shelf} () {{', '    global string $gBuffStr;',
+                 '    global string $gBuffStr0;', '    global string $gBuffStr1;', '']
+        for name in self.shelves.get(shelf, []):
+            control = self._controls[name]
+            if control['type'] == 'separator':
+                lines.append('    separator -enable 1 -width 12 -height 35 -manage 1 -visible 1 '
+                             '-style "shelf" -horizontal 0;')
+                continue
+            lines += [
+                '    shelfButton',
+                '        -enableCommandRepeat 1',
+                '        -width 32 -height 32',
+                f'        -label "{esc(control.get("label", ""))}"',
+                f'        -annotation "{esc(control.get("label", ""))}"',
+                f'        -statusBarMessage "{esc(control.get("statusBarMessage", ""))}"',
+                '        -style "iconOnly"',
+                f'        -image "{esc(control.get("image1", ""))}"',
+                f'        -image1 "{esc(control.get("image1", ""))}"',
+                f'        -command "{esc(control.get("command", ""))}"',
+                f'        -sourceType "{esc(control.get("sourceType", "mel"))}"',
+                '        -commandRepeatable 1',
+            ]
+            for item in control['menu']:
+                lines.append(f'        -mi "{esc(item["label"])}" ( "{esc(item["command"])}" )')
+            lines.append('    ;')
+        lines += ['', '}', '']
+        return '\n'.join(lines)
+
+
 class RowColumnWidget(QWidget):
     """Simple widget to build a set of rows and columns"""
 
@@ -268,7 +1210,8 @@ class Installer:
     """Simple Installer class to handle installing the tools."""
 
     def __init__(self, shelf, tool_data, to_install, install_from: dict,
-                 scripts_path, icons_path, progress_bar, status_widget):
+                 scripts_path, icons_path, progress_bar, status_widget,
+                 max_transfers: int = MAX_TRANSFERS):
         self.shelf = shelf
         self._step = 0
         self.tool_data = tool_data
@@ -289,6 +1232,8 @@ class Installer:
 
         self.src_path: str = install_from['path']
         self.is_local: bool = install_from['is_local']
+        # Local installs can either be from a directory or a bundle archive
+        self.is_bundle: bool = bool(self.is_local and self.src_path and os.path.isfile(self.src_path))
 
         self._file_pattern = re.compile('[\\w.]+\\.\\w+$')
 
@@ -296,9 +1241,40 @@ class Installer:
         self.install_progress = 0
         self.install_steps = 0
 
+        # Number of files transferred at the same time. Setting this to 1
+        # will transfer every file one after another.
+        self.max_transfers = max_transfers
+        self.transferred_bytes = 0
+        self._transfer_start = time.perf_counter()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # Compile the installed modules and .ui files for the python they will be
+        # imported by. If python isn't set it will be compiled for the current interpreter.
+        self.precompile = True
+        self.python: Optional[str] = None
+
+        # Manifest of the source files and the files that need transferring
+        # as {section: (files, install dir, source prefix, install manifest)}
+        self.source_manifest = {}
+        self._pending = {}
+
     def update_progresss_bar(self):
-        progress = self.install_progress / self.install_steps
-        self.progress_bar.setValue(progress * 100)
+        if self.progress_bar is None:
+            return
+        progress = self.install_progress / max(self.install_steps, 1)
+        self.progress_bar.setValue(int(progress * 100))
+
+        # Show the aggregate throughput of everything transferred so far
+        elapsed = time.perf_counter() - self._transfer_start
+        self.progress_bar.setFormat(f'%p%  ({format_rate(self.transferred_bytes, elapsed)})')
+        QApplication.processEvents()
+
+    def set_status(self, text: str):
+        """Shows the current install step in the status widget or prints it when headless."""
+        if self.status_widget is None:
+            print(text)
+            return
+        self.status_widget.setText(text)
 
     def index_files(self, data: dict):
         """
@@ -339,40 +1315,39 @@ class Installer:
                 self.index_files(data[index])
                 continue
 
-    def _async_copy(self, files, to, extra: str = '') -> list:
-        tasks = []
-
-        async def cop(src, dst):
-            nonlocal self
-            print(f'Copying {self._file_pattern.search(src)[0]} -> <{dst}>')
-
-            # Make directory if needed
-            if not os.path.exists(os.path.dirname(dst)):
-                os.makedirs(os.path.dirname(dst))
+    async def _transfer(self, action: str, transfer, src: str, dst: str):
+        """
+        Runs a blocking transfer function on the worker pool so that multiple
+        files can be in flight at once. The progress bar is updated back on
+        the event loop once the file is done.
+        """
+        name = self._file_pattern.search(src)[0]
+        loop = asyncio.get_running_loop()
 
-            # Copy filre to new dest
-            shutil.copy(src, dst)
+        start = time.perf_counter()
+        size = await loop.run_in_executor(self._executor, transfer, src, dst)
+        elapsed = time.perf_counter() - start
+        print(f'{action} {name} -> <{dst}> {size / 1024:.1f} KB in {elapsed:.2f}s ({format_rate(size, elapsed)})')
 
-            # Update progress bar
-            self.install_progress += 1
-            self.update_progresss_bar()
+        # Update progress bar
+        self.transferred_bytes += size
+        self.install_progress += 1
+        self.update_progresss_bar()
 
+    def _async_copy(self, files, to, extra: str = '') -> list:
+        tasks = []
         for file in files:
-            tasks.append(asyncio.create_task(cop(f'{self.src_path}/{extra}{file}', f'{to}/{file}')))
+            tasks.append(asyncio.create_task(
+                self._transfer('Copying', copy_file, f'{self.src_path}/{extra}{file}', f'{to}/{file}')
+            ))
         return tasks
 
     def _async_download(self, files, to, extra: str = '') -> list:
         tasks = []
-
-        async def cop(src, dst):
-            nonlocal self
-            print(f'Downloading {self._file_pattern.search(src)[0]} -> <{dst}>')
-            download_data(src, dst)
-            self.install_progress += 1
-            self.update_progresss_bar()
-
         for file in files:
-            tasks.append(asyncio.create_task(cop(f'{_REPO}{extra}{file}', f'{to}/{file}')))
+            tasks.append(asyncio.create_task(
+                self._transfer('Downloading', fetch_file, f'{_REPO}{extra}{file}', f'{to}/{file}')
+            ))
         return tasks
 
     async def _install_files(self, files, to, extra: str = ''):
@@ -386,54 +1361,265 @@ class Installer:
         else:
             tasks = self._async_download(files, to, extra)
         await asyncio.gather(*tasks)
-        # self._async_download(files, to)
         self.update_progresss_bar()
 
-    def _install_buttons(self):
-        """Installs all the buttons to the shelf."""
-        def index_buttons(t):
-            nonlocal self
-            for btn in t['buttons']:
-                create_shelf_button(self.shelf, btn)
+    def _sections(self) -> dict:
+        """
+        Returns every section of files that is going to be installed with
+        its install directory and prefix of where it sits in the source.
+        """
+        sections = {}
+        if self.install_icons:
+            sections['icons'] = (self.icons, self.icons_path, 'icons/')
+        if self.install_scripts:
+            sections['scripts'] = (self.scripts + self.modules, self.scripts_path, '')
+        return sections
+
+    def _source_files(self) -> list:
+        """Returns the path in the source of every file that is going to be installed."""
+        files = []
+        for section, (section_files, to, extra) in self._sections().items():
+            files += [f'{extra}{file}' for file in section_files]
+        return list(dict.fromkeys(files))
+
+    def _listed_files(self) -> dict:
+        """
+        Returns {section: files} of every tool in the tool data, not only the
+        ones being installed, so files of tools left out of this install are
+        never treated as removed.
+        """
+        everything = Installer(None, self.tool_data, list(self.tool_data),
+                               {'path': self.src_path, 'is_local': self.is_local},
+                               self.scripts_path, self.icons_path, None, None)
+        for tool in self.tool_data:
+            everything.index_files(self.tool_data[tool])
+        return {section: set(files) for section, (files, to, extra) in everything._sections().items()}
+
+    def _load_source_manifest(self):
+        """
+        Loads the manifest of the source files. Local installs use the
+        manifest that comes with the tree, but any entry whose size or
+        modified time doesn't match the file is hashed again so a stale
+        manifest can't hide an edited file. Files it doesn't list are
+        compared by their modified time and size.
+        """
+        if not self.is_local:
+            from urllib.error import URLError
+            try:
+                self.source_manifest = json.loads(fetch_cached(f'{_REPO}{SOURCE_MANIFEST}'))
+            except (URLError, ValueError):
+                print('No remote manifest available, checking each file for changes instead.')
+                self.source_manifest = self._remote_manifest()
+            return
+
+        committed = load_manifest(f'{self.src_path}/{SOURCE_MANIFEST}')
+        self.source_manifest = {}
+        rehashed = 0
+        for file in self._source_files():
+            path = f'{self.src_path}/{file}'
+            if not os.path.isfile(path):
+                continue
+            entry = committed.get(file)
+            stat = os.stat(path)
+            if entry is None:
+                entry = file_entry(path, digest=False)
+            elif entry.get('size') != stat.st_size or abs(entry.get('mtime', 0) - stat.st_mtime) > 1:
+                entry = file_entry(path)
+                rehashed += 1
+            self.source_manifest[file] = entry
+        if rehashed:
+            print(f'{rehashed} files have changed since {SOURCE_MANIFEST} was written')
+
+    def _remote_manifest(self) -> dict:
+        """
+        Builds the source manifest of a remote install without a committed
+        manifest. Every file goes through the HttpCache, which only
+        downloads files whose ETag has changed, and is hashed from the cache.
+        """
+        def entry(file: str) -> tuple:
+            from urllib.error import URLError
+            try:
+                return file, file_entry(_HTTP_CACHE.fetch(f'{_REPO}{file}'))
+            except (URLError, OSError) as e:
+                print(f'Unable to check {file} ({e}), it will be downloaded.')
+                return file, None
+
+        with ThreadPoolExecutor(max_workers=max(self.max_transfers, 1)) as pool:
+            entries = pool.map(entry, self._source_files())
+        return {file: entry for file, entry in entries if entry is not None}
+
+    def _find_changes(self):
+        """
+        Compares the source manifest against the install manifest of each
+        section to find what files need to be transferred. Files that were
+        installed before are only removed once neither the source manifest
+        nor any tool in the tool data lists them, so tools left out of this
+        install are kept.
+        """
+        self._pending = {}
+        listed = self._listed_files()
+        for section, (files, to, extra) in self._sections().items():
+            installed = load_manifest(f'{to}/{INSTALL_MANIFEST}').get(section, {})
+            files = list(dict.fromkeys(files))
+            pending = []
+            for file in files:
+                entry = installed.get(file)
+                dst = f'{to}/{file}'
+                if entry is None or not os.path.isfile(dst) or os.path.getsize(dst) != entry['size']:
+                    pending.append(file)
+                elif entry_changed(self.source_manifest.get(f'{extra}{file}'), entry):
+                    pending.append(file)
+
+            for file in set(installed) - set(files) - listed.get(section, set()):
+                if f'{extra}{file}' in self.source_manifest:
+                    continue
+                if os.path.isfile(f'{to}/{file}'):
+                    print(f'Removing {file} <{to}> as it is no longer listed')
+                    os.remove(f'{to}/{file}')
+                installed.pop(file)
+
+            print(f'{section}: {len(pending)} of {len(files)} files have changed')
+            self._pending[section] = (pending, to, extra, installed)
+
+    def _update_install_manifests(self):
+        """Records all the transferred files in the install manifest of each section."""
+        for section, (pending, to, extra, installed) in self._pending.items():
+            for file in pending:
+                if os.path.isfile(f'{to}/{file}'):
+                    installed[file] = file_entry(f'{to}/{file}')
+            path = f'{to}/{INSTALL_MANIFEST}'
+            manifest = load_manifest(path)
+            manifest[section] = installed
+            write_manifest(path, manifest)
+
+    async def _install_all(self):
+        """
+        Transfers the icons, scripts and modules at the same time through a
+        single worker pool limited to `max_transfers` files in flight.
+        """
+        with ThreadPoolExecutor(max_workers=max(self.max_transfers, 1)) as self._executor:
+            groups = []
+            for pending, to, extra, installed in self._pending.values():
+                groups.append(self._install_files(pending, to, extra))
+            await asyncio.gather(*groups)
+        self._executor = None
+
+    def _install_bundle(self):
+        """
+        Installs from a bundle in a single sequential read of the archive.
+        The manifest at the start of the bundle is used to work out what
+        has changed before extracting only those files.
+        """
+        targets = None
+        with open(self.src_path, 'rb', buffering=BLOCK_SIZE) as raw:
+            with tarfile.open(fileobj=raw, mode='r|gz') as bundle:
+                for member in bundle:
+                    if member.name == SOURCE_MANIFEST:
+                        self.source_manifest = json.loads(bundle.extractfile(member).read())
+                        self._find_changes()
+                        targets = {}
+                        for pending, to, extra, installed in self._pending.values():
+                            for file in pending:
+                                if f'{extra}{file}' not in self.source_manifest:
+                                    print(f'{extra}{file} is not in the bundle and will be skipped')
+                                    continue
+                                targets[f'{extra}{file}'] = f'{to}/{file}'
+                        self.install_steps = len(targets)
+                        continue
+                    if targets is None or member.name not in targets:
+                        continue
+
+                    dst = targets[member.name]
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    with bundle.extractfile(member) as src, open(f'{dst}.part', 'wb') as file:
+                        shutil.copyfileobj(src, file, BLOCK_SIZE)
+                    os.replace(f'{dst}.part', dst)
+                    os.utime(dst, (member.mtime, member.mtime))
+                    print(f'Extracted {member.name} -> <{dst}>')
+
+                    self.transferred_bytes += member.size
+                    self.install_progress += 1
+                    self.update_progresss_bar()
+
+        if targets is None:
+            raise ValueError(f'{self.src_path} is missing its {SOURCE_MANIFEST}')
 
+    def _install_buttons(self):
+        """Updates the shelf to have the buttons of all the installed tools."""
+        buttons = []
         for index in self.tool_data:
             if index not in self.to_install:
                 continue
             tool = self.tool_data[index]
             if 'buttons' in tool:
-                index_buttons(tool)
+                buttons += tool['buttons']
+        return reconcile_shelf(self.shelf, buttons)
 
-    def start(self):
-        """Start installing all selected tools"""
+    def start(self) -> dict:
+        """
+        Start installing all selected tools. Returns the number of files and
+        bytes transferred and how long it took. Shelf buttons are only
+        created if a shelf has been set.
+        """
         # Index all the files that need to be installed
         for tool in self.tool_data:
             if tool in self.to_install:
                 self.index_files(self.tool_data[tool])
 
-        files: int = 0
-        if self.install_icons:
-            files += len(self.icons)
-        if self.install_scripts:
-            files += len(self.scripts) + len(self.modules)
-        self.install_steps = files
-
-        if self.install_icons:
-            self.status_widget.setText('Downloading icons')
-            asyncio.run(
-                self._install_files(self.icons, self.icons_path, 'icons/')
-            )
-        if self.install_scripts:
-            self.status_widget.setText('Downloading scripts')
-            asyncio.run(
-                self._install_files(self.scripts, self.scripts_path)
-            )
-            self.status_widget.setText('Downloading modules')
-            asyncio.run(
-                self._install_files(self.modules, self.scripts_path)
-            )
+        self.transferred_bytes = 0
+        self._transfer_start = time.perf_counter()
 
-        self.status_widget.setText('Creating shelf buttons')
-        self._install_buttons()
+        if self.is_bundle:
+            self.set_status('Extracting bundle')
+            self._install_bundle()
+        else:
+            # Only transfer the files that have changed since the last install
+            self.set_status('Checking for changes')
+            self._load_source_manifest()
+            self._find_changes()
+            self.install_steps = sum(len(pending) for pending, to, extra, installed in self._pending.values())
+
+            self.set_status('Downloading icons, scripts and modules')
+            asyncio.run(self._install_all())
+        self._update_install_manifests()
+        files = self.install_progress
+
+        elapsed = time.perf_counter() - self._transfer_start
+        print(f'Transferred {files} files ({self.transferred_bytes / 1024:.1f} KB) in {elapsed:.2f}s '
+              f'({format_rate(self.transferred_bytes, elapsed)}, {self.max_transfers} at a time)')
+        if not self.is_local:
+            timing = _POOL.summary()
+            print(f'{timing["requests"]} requests over {timing["connections"]} connections: '
+                  f'{timing["connect"]:.2f}s connecting, {timing["wait"]:.2f}s waiting, '
+                  f'{timing["transfer"]:.2f}s transferring {timing["size"] / 1024:.1f} KB')
+
+        compiled = None
+        if self.precompile and self.install_scripts:
+            self.set_status('Compiling modules')
+            forms = precompile_ui([f'{self.scripts_path}/{file}' for file in dict.fromkeys(self.modules)
+                                   if file.endswith('.ui') and os.path.isfile(f'{self.scripts_path}/{file}')],
+                                  self.python)
+            if forms['compiled'] or forms['failed']:
+                print(f'Compiled {forms["compiled"]} .ui files ({forms["skipped"]} already up-to-date, '
+                      f'{len(forms["failed"])} failed) in {forms["seconds"]:.2f}s')
+            modules = list(dict.fromkeys(f'{self.scripts_path}/{file}' for file in self.scripts + self.modules
+                                         if file.endswith('.py')))
+            modules += forms['modules']
+            compiled = precompile_modules([path for path in modules if os.path.isfile(path)], self.python)
+            print(f'Compiled {compiled["compiled"]} modules ({compiled["skipped"]} already up-to-date, '
+                  f'{len(compiled["failed"])} failed) in {compiled["seconds"]:.2f}s, '
+                  f'saving {compiled["saved"]:.2f}s of compiling on first import')
+
+        if self.shelf is not None:
+            self.set_status('Creating shelf buttons')
+            self._install_buttons()
+
+        return {
+            'files': files,
+            'bytes': self.transferred_bytes,
+            'seconds': time.perf_counter() - self._transfer_start,
+            'compiled': compiled
+        }
 
 
 class InstallerWindow(MayaQWidgetBaseMixin, QDialog):
@@ -500,7 +1686,11 @@ class InstallerWindow(MayaQWidgetBaseMixin, QDialog):
 
     @property
     def is_local_install(self) -> bool:
-        return self._install_from_options.currentIndex()
+        return self._install_from_options.currentIndex() > 0
+
+    @property
+    def is_bundle_install(self) -> bool:
+        return self._install_from_options.currentIndex() == 2
 
     def _check_install_state(self):
         """
@@ -509,6 +1699,11 @@ class InstallerWindow(MayaQWidgetBaseMixin, QDialog):
         the listed tools in the UI to match if it is sourcing from either
         remote or local paths.
         """
+        # Clear the selected path if it doesn't match a directory/bundle install
+        if self._local_toolbox_dir is not None and self.is_local_install:
+            if os.path.isfile(self._local_toolbox_dir) != self.is_bundle_install:
+                self._local_toolbox_dir = None
+                self._install_local_text.setText('')
         self._fetch_tools_data()
         if self.is_local_install:
             if self._local_toolbox_dir is None:
@@ -527,18 +1722,32 @@ class InstallerWindow(MayaQWidgetBaseMixin, QDialog):
         default_dir = os.getcwd()
         if self._install_local_text.text() != '':
             default_dir = self._install_local_text.text()
-        responce = QFileDialog.getExistingDirectory(
-            parent=self,
-            caption='Select install directory',
-            directory=default_dir
-        )
+        if self.is_bundle_install:
+            responce = QFileDialog.getOpenFileName(
+                parent=self,
+                caption='Select install bundle',
+                dir=os.path.dirname(default_dir),
+                filter='Toolbox Bundle (*.tar.gz)'
+            )[0]
+        else:
+            responce = QFileDialog.getExistingDirectory(
+                parent=self,
+                caption='Select install directory',
+                directory=default_dir
+            )
 
         # ignore cancels
         if responce is None or len(responce) == 0:
             return
 
         # Check if the required files are in the directory to install with
-        files = os.listdir(responce)
+        files = [] if os.path.isfile(responce) else os.listdir(responce)
+        if os.path.isfile(responce):
+            try:
+                read_bundle_shelf(responce)
+                files.append('toolboxShelf.json')
+            except (tarfile.TarError, ValueError):
+                pass
         if 'toolboxShelf.json' not in files:
             cmds.warning('Invalid Install Directory. This does not contain the required data to install the Cirkus '
                          'Toolbox with.')
@@ -565,7 +1774,7 @@ class InstallerWindow(MayaQWidgetBaseMixin, QDialog):
 
         # Install Type
         self._install_from_options = QComboBox()
-        self._install_from_options.addItems(['Remote Install', 'Local Install'])
+        self._install_from_options.addItems(['Remote Install', 'Local Install', 'Bundle Install'])
 
         local_layout = QHBoxLayout()
         local_widget = QWidget(layout=local_layout, visible=self._install_from_options.currentIndex())
@@ -747,7 +1956,6 @@ class InstallerWindow(MayaQWidgetBaseMixin, QDialog):
         if shelf_name == '':
             shelf_name = 'CoolTool'
         create_shelf(shelf_name)
-        remove_shelf_button(shelf_name, 'ALL')
 
         # Loop over all checked tools and install them
         widgets = self._tools_list_widget.list()
@@ -813,11 +2021,11 @@ class InstallerWindow(MayaQWidgetBaseMixin, QDialog):
         """
         # Attempt to download remote data.
         if self._remote_data is None:
-            from urllib.error import HTTPError
+            from urllib.error import URLError
             try:
-                shelf = download_data(f'{_REPO}toolboxShelf.json')
+                shelf = fetch_cached(f'{_REPO}toolboxShelf.json')
                 self._remote_data = json.loads(shelf)
-            except HTTPError:
+            except URLError:
                 cmds.warning('Failted to download remote data.')
 
         # Attempt to download the tool's data from the repo online.
@@ -825,6 +2033,11 @@ class InstallerWindow(MayaQWidgetBaseMixin, QDialog):
             self._load_tools(self._remote_data)
             return
 
+        # Load from a bundle
+        if self._local_toolbox_dir is not None and os.path.isfile(self._local_toolbox_dir):
+            self._load_tools(read_bundle_shelf(self._local_toolbox_dir))
+            return
+
         # Load from file
         if self._local_toolbox_dir is not None:
             file = os.path.join(self._local_toolbox_dir, 'toolboxShelf.json')
@@ -837,5 +2050,192 @@ def open_window():
     installer.show()
 
 
+def _is_headless() -> bool:
+    """Checks if this is running without access to the Maya UI."""
+    if Qt is None or cmds is None or not hasattr(cmds, 'about'):
+        return True
+    return cmds.about(batch=True)
+
+
+def install_targets(source: str, targets: list, tools: list = None, shelf: str = 'CoolTool',
+                    max_transfers: int = MAX_TRANSFERS, parallel: int = 4, python: str = None,
+                    precompile: bool = True) -> dict:
+    """
+    Installs the toolbox into multiple maya user directories at the same time
+    without any UI. Each target gets its scripts in <target>/scripts, its icons
+    in <target>/prefs/icons and the shelf written to
+    <target>/prefs/shelves/shelf_<shelf>.mel.
+
+    :source: Local toolbox directory, a bundle or 'remote' to download the files.
+
+    :python: The mayapy of the targets maya version to compile the modules for.
+
+    Returns a report with the timing of every target.
+    """
+    is_local = source != 'remote'
+    if not is_local:
+        tool_data = json.loads(fetch_cached(f'{_REPO}toolboxShelf.json'))
+    elif os.path.isfile(source):
+        tool_data = read_bundle_shelf(source)
+    else:
+        with open(f'{source}/toolboxShelf.json', 'r') as content:
+            tool_data = json.loads(content.read())
+    if tools is None:
+        tools = list(tool_data)
+
+    def install(target: str) -> dict:
+        start = time.perf_counter()
+        report = {'target': target, 'files': 0, 'bytes': 0, 'seconds': 0.0, 'error': None}
+        try:
+            installer = Installer(None, tool_data, tools, {'path': source, 'is_local': is_local},
+                                  f'{target}/scripts', f'{target}/prefs/icons', None, None,
+                                  max_transfers)
+            installer.precompile = precompile
+            installer.python = python
+            report.update(installer.start())
+        except Exception as e:
+            report['error'] = f'{type(e).__name__}: {e}'
+            print(traceback.format_exc())
+        report['seconds'] = time.perf_counter() - start
+        return report
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(parallel, 1)) as pool:
+        reports = list(pool.map(install, targets))
+
+    # The shelf is the same for every target so it only needs building once
+    global cmds, mel
+    maya_cmds, maya_mel = cmds, mel
+    cmds = mel = ShelfStandIn()
+    try:
+        create_shelf(shelf)
+        Installer(shelf, tool_data, tools, {'path': source, 'is_local': is_local},
+                  DEFAULT_PATH, DEFAULT_PATH, None, None)._install_buttons()
+        shelf_mel = cmds.to_mel(shelf)
+    finally:
+        cmds, mel = maya_cmds, maya_mel
+
+    for report in reports:
+        if report['error'] is None:
+            path = f'{report["target"]}/prefs/shelves/shelf_{shelf}.mel'
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as file:
+                file.write(shelf_mel)
+
+    return {
+        'source': source,
+        'tools': tools,
+        'seconds': time.perf_counter() - start,
+        'targets': reports,
+        'http': _POOL.summary()
+    }
+
+
+def benchmark_transfers(source: str, tools: list = None, transfers: list = None, repeat: int = 3) -> dict:
+    """
+    Times a full install of the scripts and icons into empty directories for
+    each number of files transferred at once, so the worker pool can be
+    compared with transferring one file at a time. Remote sources go through
+    the HttpCache, which is warmed up by an untimed install first.
+
+    Returns {transfers: {'files', 'bytes', 'runs': [seconds], 'best'}}.
+    """
+    import tempfile
+
+    if transfers is None:
+        transfers = [1, MAX_TRANSFERS]
+    is_local = source != 'remote'
+    if not is_local:
+        tool_data = json.loads(fetch_cached(f'{_REPO}toolboxShelf.json'))
+    elif os.path.isfile(source):
+        tool_data = read_bundle_shelf(source)
+    else:
+        with open(f'{source}/toolboxShelf.json', 'r') as content:
+            tool_data = json.loads(content.read())
+    if tools is None:
+        tools = list(tool_data)
+
+    def run(max_transfers: int) -> dict:
+        with tempfile.TemporaryDirectory() as target:
+            installer = Installer(None, tool_data, tools, {'path': source, 'is_local': is_local},
+                                  f'{target}/scripts', f'{target}/prefs/icons', None, None, max_transfers)
+            installer.precompile = False
+            return installer.start()
+
+    if not is_local:
+        run(MAX_TRANSFERS)
+
+    results = {}
+    for max_transfers in transfers:
+        runs = [run(max_transfers) for _ in range(max(repeat, 1))]
+        results[max_transfers] = {
+            'files': runs[0]['files'],
+            'bytes': runs[0]['bytes'],
+            'runs': [result['seconds'] for result in runs],
+            'best': min(result['seconds'] for result in runs)
+        }
+    return results
+
+
+def main(argv: list = None) -> int:
+    """Command line entry point to install the toolbox without the installer window."""
+    parser = argparse.ArgumentParser(description='Install the Cirkus Toolbox without the Maya UI.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    install = commands.add_parser('install', help='Install into one or more maya user directories.')
+    install.add_argument('targets', nargs='+', help='Maya user directories to install into.')
+    install.add_argument('--source', default='remote', help='Toolbox directory, bundle or "remote".')
+    install.add_argument('--tools', nargs='*', help='Names of the tools to install. Defaults to all.')
+    install.add_argument('--shelf', default='CoolTool', help='Name of the shelf to create.')
+    install.add_argument('--transfers', type=int, default=MAX_TRANSFERS, help='Files transferred at once per target.')
+    install.add_argument('--parallel', type=int, default=4, help='Targets installed at once.')
+    install.add_argument('--report', help='Write the JSON timing report to this file instead of stdout.')
+    install.add_argument('--python', help='mayapy of the target maya version to compile the modules for.')
+    install.add_argument('--no-compile', action='store_true',
+                         help='Skip compiling the modules to .pyc and the .ui files to python.')
+
+    bundle = commands.add_parser('bundle', help='Pack a toolbox directory into a single install bundle.')
+    bundle.add_argument('source', help='Toolbox directory to bundle.')
+    bundle.add_argument('out', help='Path of the bundle to create.')
+    bundle.add_argument('--tools', nargs='*', help='Names of the tools to bundle. Defaults to all.')
+
+    manifest = commands.add_parser('manifest', help='Write the toolboxManifest.json for a toolbox directory.')
+    manifest.add_argument('source', help='Toolbox directory.')
+
+    benchmark = commands.add_parser('benchmark', help='Time installs with different numbers of transfers at once.')
+    benchmark.add_argument('--source', default='remote', help='Toolbox directory, bundle or "remote".')
+    benchmark.add_argument('--tools', nargs='*', help='Names of the tools to install. Defaults to all.')
+    benchmark.add_argument('--transfers', type=int, nargs='+', default=[1, MAX_TRANSFERS],
+                           help='Numbers of files transferred at once to compare.')
+    benchmark.add_argument('--repeat', type=int, default=3, help='Installs timed for each number of transfers.')
+
+    args = parser.parse_args(argv)
+    if args.command == 'benchmark':
+        results = benchmark_transfers(args.source, args.tools, args.transfers, args.repeat)
+        for max_transfers, result in results.items():
+            print(f'{max_transfers:>3} at a time: {result["files"]} files ({result["bytes"] / 1024:.1f} KB), '
+                  f'best {result["best"]:.2f}s of {len(result["runs"])} '
+                  f'({format_rate(result["bytes"], result["best"])})')
+        return 0
+    if args.command == 'bundle':
+        build_bundle(args.source, args.out, args.tools)
+        return 0
+    if args.command == 'manifest':
+        print(write_source_manifest(args.source))
+        return 0
+
+    # the status of each target goes to stderr so stdout is only the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = install_targets(args.source, args.targets, args.tools, args.shelf, args.transfers,
+                                 args.parallel, args.python, not args.no_compile)
+    if args.report:
+        write_manifest(args.report, report)
+    else:
+        print(json.dumps(report, indent=4))
+    return int(any(target['error'] for target in report['targets']))
+
+
 if __name__ == '__main__':
+    if _is_headless():
+        sys.exit(main())
     open_window()
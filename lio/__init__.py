@@ -1,8 +1,13 @@
-from . import llamaIO
-from . import io_publishModel
-from . import io_publishAnimation
-from .io_publishAnimation import IO_publishAnim_window, runWithUI
-from . import io_importMaterials
-from . import io_publishCamera
-from . import io_importAnimation
-from . import io_importCamera
\ No newline at end of file
+from baseIO.lazyModules import lazySubmodules
+
+__all__ = [
+    'llamaIO', 'io_publishModel', 'io_publishAnimation', 'io_importMaterials', 'io_publishCamera',
+    'io_importAnimation', 'io_importCamera', 'IO_publishAnim_window', 'runWithUI'
+]
+
+# names lio exposes from inside its submodules
+_ATTRIBUTES = {
+    'IO_publishAnim_window': 'io_publishAnimation',
+    'runWithUI': 'io_publishAnimation'
+}
+__getattr__, __dir__ = lazySubmodules(__name__, __all__, _ATTRIBUTES)
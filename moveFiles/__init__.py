@@ -1,2 +1,4 @@
-from . import httpDropbox
-from . import localFiles
+from baseIO.lazyModules import lazySubmodules
+
+__all__ = ['httpDropbox', 'localFiles']
+__getattr__, __dir__ = lazySubmodules(__name__, __all__)
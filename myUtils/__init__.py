@@ -1,2 +1,4 @@
-from . import shadingNetwork
-from . import paths
+from baseIO.lazyModules import lazySubmodules
+
+__all__ = ['shadingNetwork', 'paths']
+__getattr__, __dir__ = lazySubmodules(__name__, __all__)
@@ -18,25 +18,31 @@ def listShadingNodes(objects,nodeType):
 	#list ALL of the objects shape nodes
 	allShapes = []
 	for o in objects:
-		shapes = cmds.listRelatives( o, allDescendents=True,type='shape')
-		allShapes += shapes
-	
-	for shape in allShapes:
-		#find connected shading networks
-		con = cmds.listConnections( shape, scn=True, type='shadingEngine' )
-		#remove duplicate materials  
-		allMaterials = list(set(con))
-		#add objects back into the list while it's being iterated 
-		for m in allMaterials:
-			materials = cmds.listConnections( m, source=True,scn=True,sh=True,destination=False)
-			if materials:
-				for mat in materials:
-					if cmds.objectType( mat) != 'mesh': 
-						allMaterials.append(mat)
-						#add file textures to the list 
-						if cmds.ls(mat,type=nodeType):
-							allTextures.append(mat)
-	return allTextures	
+		shapes = cmds.listRelatives( o, allDescendents=True,type='shape',fullPath=True)
+		if shapes:
+			allShapes += shapes
+		elif cmds.ls(o,shapes=True):
+			allShapes.append(o)
+	if not allShapes:
+		return allTextures
+
+	#find connected shading networks, shapes usually share a few materials so each is only walked once
+	con = cmds.listConnections( allShapes, scn=True, type='shadingEngine' )
+	#remove duplicate materials
+	allMaterials = list(set(con or []))
+	visited = set(allMaterials)
+	#add objects back into the list while it's being iterated
+	for m in allMaterials:
+		materials = cmds.listConnections( m, source=True,scn=True,sh=True,destination=False)
+		if materials:
+			for mat in materials:
+				if mat not in visited and cmds.objectType( mat) != 'mesh':
+					visited.add(mat)
+					allMaterials.append(mat)
+					#add file textures to the list
+					if cmds.ls(mat,type=nodeType):
+						allTextures.append(mat)
+	return allTextures
 
 #sel = cmds.ls(sl=True)
 #fileNodes = listShadingNodes(sel,'file')
@@ -1,2 +1,4 @@
-from . import lm_projectWindow
-from . import submitToFarm
+from baseIO.lazyModules import lazySubmodules
+
+__all__ = ['lm_projectWindow', 'submitToFarm', 'renderWatcher']
+__getattr__, __dir__ = lazySubmodules(__name__, __all__)
@@ -13,6 +13,7 @@ import baseIO.getProj as getProj
 import baseIO.incrementalSave as incSave
 import baseIO.loadSave as IO
 import baseIO.qtBase as qtBase
+import pipelime.lm_metadataIndex as metadataIndex
 from lio.io_publishModel import IO_publishModel
 
 
@@ -58,7 +59,7 @@ def publishModel():
     metaData.append(['user', 'value', '%s' % localPrefDict["userName"]["value"].strip('\'')])
     metaData.append(['note', 'value', '%s' % assetManagerUIWindow.mainWidget.textEdit_note.toPlainText()])
     folderName = getProj.sceneFolder().rsplit('/', 1)[1]
-    IO.writePrefsToFile(metaData, '%s/.data/%s_REF.json' % (getProj.sceneFolder(), folderName))
+    metadataIndex.writeMetadata('%s/%s_REF' % (getProj.sceneFolder(), folderName), metaData, metadataIndex.PUBLISH)
 
 
 def incrementSceneFile():
@@ -81,7 +82,7 @@ def writeDataAfterSave():
     localPrefDict = IO.loadDictionary('%s/localPrefs.json' % qtBase.local_path())
     metaData.append(['user', 'value', '%s' % localPrefDict["userName"]["value"].strip('\'')])
     metaData.append(['note', 'value', '%s' % assetManagerUIWindow.mainWidget.textEdit_note.toPlainText()])
-    IO.writePrefsToFile(metaData, '%s/.data/%s.json' % (getProj.sceneFolder(), getProj.sceneName()))
+    metadataIndex.writeMetadata(getProj.filepath(), metaData)
 
 
 def setProjectPth():
@@ -116,13 +117,15 @@ def orderByModified(dirpath):
                for stat, path in entries if S_ISREG(stat[ST_MODE]))
 
     recentFiles = []
+    entries = sorted(entries)
+    # metadata of every version in one go
+    metadata = metadataIndex.readFolder(dirpath, [path for cdate, path in entries])
 
-    for cdate, path in sorted(entries):
+    for cdate, path in entries:
         # print time.ctime(cdate), os.path.basename(path)
-        dateModified = time.strftime('%Y/%m/%d - %I:%M %p', time.localtime(os.path.getmtime(path)))
+        dateModified = time.strftime('%Y/%m/%d - %I:%M %p', time.localtime(cdate))
 
-        fileDictPath = '%s/.data/%s.json' % (path.rsplit('\\', 1)[0], path.split('\\')[-1].rsplit('.', 1)[0])
-        fileDict = IO.loadDictionary(fileDictPath)
+        fileDict = metadata[path]
         artistName = ''
         try:
             artistName = fileDict["user"]["value"]
@@ -283,19 +286,17 @@ def setAsset():
         assetManagerUIWindow.mainWidget.label_date.setText('%s - %s' % (dateModified, timeModified))
     except Exception:
         assetManagerUIWindow.mainWidget.label_date.setText('')
+    # read the publish metadata
+    namePath = '%s/scenes/REF/%s/%s/%s_REF' % (
+        projectsDictGlobal[project]["projectPath"], assetType, assetName, assetName)
+    assetDict = metadataIndex.readMetadata(namePath, metadataIndex.PUBLISH)
     # find and display username
     try:
-        namePath = '%s/scenes/REF/%s/%s/.data/%s_REF.json' % (
-            projectsDictGlobal[project]["projectPath"], assetType, assetName, assetName)
-        assetDict = IO.loadDictionary(namePath)
         assetManagerUIWindow.mainWidget.label_userName.setText(assetDict["user"]["value"])
     except Exception:
         assetManagerUIWindow.mainWidget.label_userName.setText('')
     # find and display note
     try:
-        namePath = '%s/scenes/REF/%s/%s/.data/%s_REF.json' % (
-            projectsDictGlobal[project]["projectPath"], assetType, assetName, assetName)
-        assetDict = IO.loadDictionary(namePath)
         assetManagerUIWindow.mainWidget.textEdit_note.setText(assetDict["note"]["value"])
     except Exception:
         assetManagerUIWindow.mainWidget.textEdit_note.setText('')
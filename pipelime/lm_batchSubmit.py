@@ -0,0 +1,411 @@
+"""
+Submits a list of shot scenes to the farm without opening them in Maya's UI.
+
+Scenes are opened in a pool of mayapy processes which read the render layers,
+cameras, frame range and the layer settings stored by the submit window, the
+jobs are then sent to Smedge from the main process. Progress is written to a
+manifest after every scene so an interrupted run can be resumed.
+
+    mayapy -m pipelime.lm_batchSubmit "P:/project/scenes/sh*/*.mb" --paused
+    mayapy -m pipelime.lm_batchSubmit shots.csv --workers 6 --manifest shots.json
+
+A CSV shot list needs a 'scene' column, any other column overrides the value
+for every layer of that scene: jobType, priority, packetSize, pool, range,
+layers (separated by spaces), note and project.
+"""
+import argparse
+import csv
+import getpass
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from pipelime.lm_jobGraph import MAX_SUBMISSIONS
+
+# mayapy processes opening scenes at the same time
+MAX_WORKERS = 4
+# shot list columns that can override layer settings
+OVERRIDES = ['jobType', 'priority', 'packetSize', 'pool', 'range', 'layers', 'note', 'project']
+TOOLBOX_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def readShotList(sources):
+    """
+    Returns a list of shots [{'scene': path, override: value}] from glob
+    patterns and CSV files. Scenes listed twice are only submitted once.
+    """
+    shots = {}
+    for source in sources:
+        if source.lower().endswith('.csv'):
+            with open(source, newline='') as csvFile:
+                for row in csv.DictReader(csvFile):
+                    scene = (row.get('scene') or '').strip()
+                    if not scene:
+                        continue
+                    shot = {k: v.strip() for k, v in row.items() if k in OVERRIDES and v and v.strip()}
+                    shot['scene'] = scene.replace('\\', '/')
+                    shots[shot['scene']] = shot
+        else:
+            for scene in sorted(glob.glob(source)):
+                scene = scene.replace('\\', '/')
+                shots.setdefault(scene, {'scene': scene})
+    return list(shots.values())
+
+
+def globalPrefs():
+    """
+    Returns the paths to Submit.exe and Render.exe saved in the global prefs.
+    """
+    try:
+        with open(f'{TOOLBOX_ROOT}/config/globalPrefs.json') as prefFile:
+            prefs = json.load(prefFile)
+    except (OSError, ValueError):
+        prefs = {}
+    submitExe = prefs.get('pathToSubmitExe', {}).get('value', 'C:/Program Files/Smedge/Submit.exe')
+    renderExe = prefs.get('pathToRenderExe', {}).get('value', 'C:/Program Files/Autodesk/{maya_ver}/bin/Render.exe')
+    return submitExe.strip('\''), renderExe.strip('\'')
+
+
+def findProject(scene):
+    """
+    Returns the first folder above the scene that contains a workspace.mel.
+    """
+    folder = os.path.dirname(scene)
+    while folder and os.path.dirname(folder) != folder:
+        if os.path.isfile(os.path.join(folder, 'workspace.mel')):
+            return folder.replace('\\', '/')
+        folder = os.path.dirname(folder)
+    return None
+
+
+def defaultManifest(source, shots):
+    """
+    Returns the manifest path used when none is given, next to the CSV shot
+    list or in the folder of the first scene.
+    """
+    if source.lower().endswith('.csv'):
+        return '%s.manifest.json' % source.rsplit('.', 1)[0]
+    return '%s/batchSubmit.json' % os.path.dirname(shots[0]['scene'])
+
+
+class BatchManifest():
+    """
+    Keeps track of which scenes and jobs have been submitted. It is written
+    after every scene so a run can be stopped and resumed at any point.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.scenes = {}
+        if path and os.path.isfile(path):
+            with open(path) as manifestFile:
+                self.scenes = json.load(manifestFile).get('scenes', {})
+
+    def isDone(self, scene):
+        return self.scenes.get(scene, {}).get('status') == 'submitted'
+
+    def submittedJobs(self, scene):
+        # {label: jobID} of the jobs already on the farm
+        return {j['label']: j['jobID'] for j in self.scenes.get(scene, {}).get('jobs', []) if j.get('jobID')}
+
+    def record(self, scene, entry):
+        self.scenes[scene] = entry
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, mode='w') as manifestFile:
+            json.dump({'scenes': self.scenes}, manifestFile, indent=4)
+        os.replace(tmp, self.path)
+
+
+# worker process functions
+
+def initWorker():
+    """
+    Starts Maya once in each worker process.
+    """
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+
+
+def _cacheNodes(jobType):
+    import maya.cmds as cmds
+    plugin, nodeType = ('pgYetiMaya', 'pgYetiMaya') if jobType == 'Yeti Cache' else ('bifrostGraph', 'bifrostContainer')
+    try:
+        cmds.loadPlugin(plugin, quiet=True)
+        nodes = cmds.ls(type=nodeType)
+    except RuntimeError:
+        return []
+    if jobType == 'Bifrost Cache':
+        nodes = [n for n in nodes if cmds.attributeQuery('evaluationType', node=n, exists=True)
+                 and cmds.getAttr(f'{n}.evaluationType') == 0]
+    return [[n, 1] for n in nodes]
+
+
+def _writeLayerData(scene, layerSettings, job, creator):
+    # the same sidecar the submit window writes for each layer it submits
+    import maya.cmds as cmds
+    import baseIO.loadSave as IO
+    try:
+        renderFilePath = cmds.renderSettings(fin=True, fp=True, cts=True, lyr=layerSettings.layer)[0]
+    except RuntimeError:
+        return
+    prefData = [
+        ['img', 'imgpath', '%s/' % renderFilePath.rsplit('/', 1)[0]],
+        ['img', 'imgname', renderFilePath.split('/')[-1]],
+        ['user', 'name', creator],
+        ['job', 'range', job.options['-Range']],
+        ['job', 'packetSize', layerSettings.packetSize],
+        ['job', 'spec', job.toDict()]
+    ]
+    sceneFolder = scene.filepath.rsplit('/', 1)[0]
+    niceLayerName = '%s.%s' % (layerSettings.layer, layerSettings.camera.replace(':', '_'))
+    IO.writePrefsToFile(prefData, f'{sceneFolder}/.data/{scene.sceneName}.{niceLayerName}.json')
+
+
+def gatherScene(shot, settings, defaults, dryRun=False):
+    """
+    Opens a scene in the worker and builds its jobs. Returns a dictionary that
+    can be sent back to the main process. Nothing is written on a dry run.
+    """
+    import maya.cmds as cmds
+    import baseIO.sceneVar as sceneVar
+    import pipelime.lm_jobSpec as jobSpec
+    import pipelime.lm_layerStore as layerStore
+
+    timings = {}
+    start = time.perf_counter()
+    project = shot.get('project') or findProject(shot['scene'])
+    if project:
+        cmds.workspace(project, openWorkspace=True)
+    cmds.file(shot['scene'], open=True, force=True, prompt=False, ignoreVersion=True)
+    timings['open'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mayaVersion = f'Maya{cmds.about(v=True)}'
+    settings = jobSpec.SubmitSettings(**settings)
+    settings.renderExe = settings.renderExe.replace('{maya_ver}', mayaVersion)
+    settings.note = shot.get('note', settings.note)
+    scene = jobSpec.SceneInfo.fromScene()
+
+    jobType = shot.get('jobType', defaults['jobType'])
+    if jobType in ('Yeti Cache', 'Bifrost Cache'):
+        layers, cameras = _cacheNodes(jobType), ['']
+    else:
+        layers, cameras = sceneVar.getRenderLayers(), sceneVar.getRenderableCameras()
+    onlyLayers = shot.get('layers', '').split()
+    timeline = f'{sceneVar.getStartFrame()}-{sceneVar.getEndFrame()}'
+
+    jobs = []
+    for layer, renderable in layers:
+        if onlyLayers:
+            if layer not in onlyLayers:
+                continue
+        elif not renderable:
+            continue
+
+        values = dict(defaults, range=timeline, jobType=jobType)
+        saved = layerStore.readSettings(layer)
+        # the job type comes from the command line or shot list, like the window's comes from the window
+        saved.pop('jobType', None)
+        values.update(saved)
+        values.update({k: shot[k] for k in ('jobType', 'priority', 'packetSize', 'pool', 'range') if k in shot})
+        for c in cameras:
+            label = layer
+            if len(cameras) > 1:
+                label = '%s - %s' % (layer, c.split('|')[-2])
+            layerSettings = jobSpec.LayerSettings(
+                layer=layer,
+                camera=c.split('|')[-1],
+                label=label,
+                jobType=values['jobType'],
+                priority=int(values['priority']),
+                packetSize=int(values['packetSize']),
+                pool=values['pool'],
+                range=values['range']
+            )
+            job = jobSpec.buildJob(scene, settings, layerSettings)
+            jobs.append(job.toDict())
+            if not dryRun:
+                _writeLayerData(scene, layerSettings, job, settings.creator)
+    timings['gather'] = time.perf_counter() - start
+
+    # free the scene before the worker opens the next one
+    cmds.file(new=True, force=True)
+    return {'jobs': jobs, 'timings': timings}
+
+
+# main process functions
+
+def submitScene(scene, result, manifest, pool, dryRun=False):
+    """
+    Submits the jobs gathered from a scene, skipping jobs the manifest
+    already has an ID for. Returns the manifest entry.
+    """
+    import pipelime.lm_jobSpec as jobSpec
+    from pipelime.lm_submitUtil import submit_job
+
+    start = time.perf_counter()
+    submitted = manifest.submittedJobs(scene)
+    jobs = [jobSpec.JobSpec(**j) for j in result['jobs']]
+    futures = {}
+    for job in jobs:
+        if job.label in submitted:
+            continue
+        if dryRun:
+            print(job.toCommand())
+            continue
+        if job.outputFolder and not os.path.exists(job.outputFolder):
+            os.makedirs(job.outputFolder)
+        futures[pool.submit(submit_job, job.toCommand())] = job.label
+
+    errors = []
+    for future in as_completed(futures):
+        label = futures[future]
+        try:
+            submitted[label] = future.result()
+        except Exception as e:
+            errors.append(f'{label}: {e}')
+    timings = dict(result['timings'], submit=time.perf_counter() - start)
+
+    status = 'submitted'
+    if errors or len(submitted) < len(jobs):
+        status = 'failed'
+    if dryRun:
+        status = 'dry run'
+    return {
+        'status': status,
+        'jobs': [{'label': j.label, 'jobID': submitted.get(j.label)} for j in jobs],
+        'timings': timings,
+        'error': '; '.join(errors)
+    }
+
+
+def printSummary(entries, wallTime):
+    """
+    Prints how long each scene took to open, gather and submit.
+    """
+    width = max([len(os.path.basename(s)) for s in entries] + [5])
+    print(f'\n{"scene":<{width}}  {"status":<10} {"jobs":>4} {"open":>8} {"gather":>8} {"submit":>8} {"total":>8}')
+    totals = {'open': 0.0, 'gather': 0.0, 'submit': 0.0}
+    for scene, entry in entries.items():
+        t = entry.get('timings', {})
+        for k in totals:
+            totals[k] += t.get(k, 0.0)
+        total = sum(t.get(k, 0.0) for k in totals)
+        print(f'{os.path.basename(scene):<{width}}  {entry["status"]:<10} {len(entry.get("jobs", [])):>4} '
+              f'{t.get("open", 0.0):>7.1f}s {t.get("gather", 0.0):>7.1f}s {t.get("submit", 0.0):>7.1f}s '
+              f'{total:>7.1f}s')
+        if entry.get('error'):
+            print(f'{"":<{width}}  {entry["error"]}')
+    failed = len([e for e in entries.values() if e['status'] == 'failed'])
+    print(f'\n{len(entries)} scenes ({failed} failed) in {wallTime:.1f}s, '
+          f'open {totals["open"]:.1f}s gather {totals["gather"]:.1f}s submit {totals["submit"]:.1f}s')
+
+
+def runBatch(shots, settings, defaults, manifest, workers=MAX_WORKERS, mayapy=None, dryRun=False):
+    """
+    Opens the shots in a pool of mayapy processes and submits each scene as
+    soon as its jobs have been gathered.
+    """
+    startTime = time.perf_counter()
+    todo = [s for s in shots if not manifest.isDone(s['scene'])]
+    skipped = len(shots) - len(todo)
+    if skipped:
+        print(f'skipping {skipped} scenes already submitted')
+
+    entries = {}
+    if not todo:
+        return entries
+
+    context = multiprocessing.get_context('spawn')
+    if mayapy:
+        context.set_executable(mayapy)
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo)), mp_context=context,
+                             initializer=initWorker) as processPool, \
+            ThreadPoolExecutor(max_workers=MAX_SUBMISSIONS) as submitPool:
+        futures = {processPool.submit(gatherScene, shot, settings, defaults, dryRun): shot['scene'] for shot in todo}
+        for future in as_completed(futures):
+            scene = futures[future]
+            try:
+                entry = submitScene(scene, future.result(), manifest, submitPool, dryRun)
+            except Exception as e:
+                entry = {'status': 'failed', 'jobs': [], 'timings': {}, 'error': str(e)}
+            print(f'{entry["status"]}: {scene}')
+            entries[scene] = entry
+            if not dryRun:
+                manifest.record(scene, entry)
+
+    printSummary(entries, time.perf_counter() - startTime)
+    return entries
+
+
+def main(argv=None):
+    submitExe, renderExe = globalPrefs()
+    parser = argparse.ArgumentParser(prog='lm_batchSubmit', description='Submit shot scenes to the farm.')
+    parser.add_argument('shots', nargs='+', help='glob patterns of scenes or CSV shot lists')
+    parser.add_argument('--manifest', help='file used to resume the run, defaults to next to the first shot list')
+    parser.add_argument('--restart', action='store_true', help='ignore scenes already in the manifest')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='mayapy processes opening scenes')
+    parser.add_argument('--mayapy', help='mayapy used for the workers, defaults to the running interpreter')
+    parser.add_argument('--dry-run', action='store_true', help='print the submit commands without submitting')
+    parser.add_argument('--submit-exe', default=submitExe)
+    parser.add_argument('--render-exe', default=renderExe)
+    parser.add_argument('--creator', default=getpass.getuser())
+    parser.add_argument('--note', default='')
+    parser.add_argument('--stagger', default='0')
+    parser.add_argument('--paused', action='store_true')
+    parser.add_argument('--half-res', action='store_true')
+    parser.add_argument('--no-detect-errors', action='store_true')
+    parser.add_argument('--gpu', action='store_true')
+    parser.add_argument('--progressive', action='store_true',
+                        help='render every 8th frame first then fill in the gaps, render jobs only')
+    parser.add_argument('--job-type', default='Render',
+                        choices=['Render', 'Playblast', 'Yeti Cache', 'Bifrost Cache'])
+    parser.add_argument('--priority', type=int, default=50)
+    parser.add_argument('--packet-size', type=int, default=10)
+    parser.add_argument('--pool', default='')
+    args = parser.parse_args(argv)
+
+    shots = readShotList(args.shots)
+    if not shots:
+        parser.error('no scenes found')
+
+    manifestPath = args.manifest or defaultManifest(args.shots[0], shots)
+    manifest = BatchManifest(None if args.restart else manifestPath)
+    manifest.path = manifestPath
+
+    settings = {
+        'submitExe': args.submit_exe,
+        'renderExe': args.render_exe,
+        'creator': args.creator,
+        'note': args.note,
+        'staggerStart': args.stagger,
+        'paused': args.paused,
+        'halfResolution': args.half_res,
+        'detectErrors': not args.no_detect_errors,
+        'gpu': args.gpu,
+        'progressive': args.progressive
+    }
+    defaults = {
+        'jobType': args.job_type,
+        'priority': args.priority,
+        'packetSize': args.packet_size,
+        'pool': args.pool
+    }
+    entries = runBatch(shots, settings, defaults, manifest, args.workers, args.mayapy, args.dry_run)
+    return 1 if [e for e in entries.values() if e['status'] == 'failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
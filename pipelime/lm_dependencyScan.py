@@ -0,0 +1,318 @@
+"""
+Finds the files a scene needs on the farm and checks they exist before it is
+submitted.
+
+Paths are grouped by folder so each folder is listed once, folders are
+listed at the same time from a thread pool and listings are kept until the
+folder's modification time changes, so scanning again after fixing a path
+only lists the folders that changed. Files are kept with their own
+modification time and size, and files asked for by name are stat'ed again
+as overwriting one doesn't change its folder.
+"""
+import fnmatch
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import maya.cmds as cmds
+
+import myUtils.shadingNetwork as shadingNetwork
+
+# folders listed at the same time
+MAX_STATS = 16
+# key for dependencies used by every layer
+ALL_LAYERS = 'all layers'
+# node types that point at a file and the attribute holding the path
+FILE_NODES = {
+    'AlembicNode': ('alembic', 'abc_File'),
+    'gpuCache': ('gpu cache', 'cacheFileName'),
+    'RedshiftProxyMesh': ('proxy', 'fileName'),
+    'RedshiftDomeLight': ('texture', 'tex0'),
+    'pgYetiMaya': ('yeti cache', 'cacheFileName'),
+}
+# frame numbers in a path e.g. %04d, ####, <f>
+_FRAME_TOKEN = re.compile(r'%0?(\d*)d|#+|<f>', re.IGNORECASE)
+# texture tiles in a path e.g. <UDIM>, <UVTILE>, u<U>_v<V>
+_TILE_TOKEN = re.compile(r'<udim>|<uvtile>|<u>|<v>', re.IGNORECASE)
+
+# folder: (folder mtime, {name: (mtime, size)}), None for files that weren't asked for
+_folderCache = {}
+_cacheLock = threading.Lock()
+
+
+def _isPattern(name):
+    return '*' in name or _FRAME_TOKEN.search(name) or _TILE_TOKEN.search(name)
+
+
+@dataclass
+class Dependency:
+    path: str
+    kind: str
+    node: str
+    # frames that have to exist for sequences
+    frames: list = None
+    layers: set = field(default_factory=set)
+    status: str = 'ok'
+    detail: str = ''
+
+
+def _frameName(name, frame):
+    def replace(match):
+        token = match.group(0)
+        if token.startswith('%'):
+            return str(frame).zfill(int(match.group(1) or 0))
+        if token.startswith('#'):
+            return str(frame).zfill(len(token))
+        return str(frame)
+    return _FRAME_TOKEN.sub(replace, name)
+
+
+def _listFolder(folder, names):
+    """
+    Returns (exists, {name: (mtime, size)} of the folder, {name: size}) for
+    the names asked for. The folder is only listed again when its
+    modification time changes. Overwriting a file doesn't change the
+    folder's, so files asked for from a listing that was kept are stat'ed
+    again.
+    """
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except OSError:
+        return False, {}, {}
+    with _cacheLock:
+        cached = _folderCache.get(folder)
+    # names stat'ed by this listing
+    listed = set()
+    if cached and cached[0] == mtime:
+        entries = cached[1]
+    else:
+        entries = {}
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    entries[entry.name] = None
+                    if entry.name not in names:
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                    listed.add(entry.name)
+        except OSError:
+            return False, {}, {}
+
+    sizes = {}
+    for name in names:
+        if name not in entries:
+            continue
+        if name not in listed:
+            try:
+                stat = os.stat(f'{folder}/{name}')
+            except OSError:
+                continue
+            entries[name] = (stat.st_mtime_ns, stat.st_size)
+        sizes[name] = entries[name][1]
+    with _cacheLock:
+        _folderCache[folder] = (mtime, entries)
+    return True, entries, sizes
+
+
+def clearCache():
+    with _cacheLock:
+        _folderCache.clear()
+
+
+def checkDependencies(dependencies):
+    """
+    Sets the status of every dependency: ok, missing, empty or incomplete for
+    sequences with missing frames.
+    """
+    folders = {}
+    for d in dependencies:
+        folder, name = os.path.split(d.path.replace('\\', '/'))
+        if not _isPattern(name):
+            folders.setdefault(folder, set()).add(name)
+        else:
+            folders.setdefault(folder, set())
+
+    with ThreadPoolExecutor(max_workers=MAX_STATS) as pool:
+        results = dict(zip(folders, pool.map(lambda f: _listFolder(f, folders[f]), folders)))
+
+    for d in dependencies:
+        folder, name = os.path.split(d.path.replace('\\', '/'))
+        exists, listing, sizes = results[folder]
+        if not exists:
+            d.status, d.detail = 'missing', 'folder does not exist'
+        elif d.frames and _FRAME_TOKEN.search(name):
+            missing = [f for f in d.frames if _frameName(name, f) not in listing]
+            if len(missing) == len(d.frames):
+                d.status, d.detail = 'missing', 'no frames'
+            elif missing:
+                d.status, d.detail = 'incomplete', f'{len(missing)} of {len(d.frames)} frames missing'
+        elif _isPattern(name):
+            pattern = _TILE_TOKEN.sub('*', _FRAME_TOKEN.sub('*', name))
+            if not fnmatch.filter(listing, pattern):
+                d.status, d.detail = 'missing', 'no files match'
+        elif name not in listing:
+            d.status = 'missing'
+        elif sizes.get(name) == 0:
+            d.status, d.detail = 'empty', '0 bytes'
+    return dependencies
+
+
+def layerShapes(layer):
+    """
+    Returns the long names of the shapes in a render layer, or None if the
+    layer's members can't be queried.
+    """
+    try:
+        members = cmds.editRenderLayerMembers(layer, q=True, fullNames=True)
+    except (RuntimeError, ValueError):
+        return None
+    if not members:
+        return None
+    shapes = set(cmds.ls(members, long=True, shapes=True) or [])
+    shapes.update(cmds.listRelatives(members, allDescendents=True, fullPath=True, type='shape') or [])
+    return shapes
+
+
+def _nodeShapes(node):
+    shapes = set(cmds.ls(node, long=True, shapes=True) or [])
+    connected = cmds.listConnections(node, source=False, destination=True, shapes=True) or []
+    shapes.update(cmds.ls(connected, long=True, shapes=True) or [])
+    return shapes
+
+
+def cacheNodesByLayer(layers, nodes):
+    """
+    Returns {layer: [nodes]} of the Yeti or Bifrost nodes whose shapes are in
+    each render layer. Layers whose members can't be queried use every node.
+    """
+    shapesByLayer = {layer: layerShapes(layer) for layer in layers}
+    used = {layer: [] for layer in layers}
+    for node in nodes:
+        try:
+            nodeShapes = _nodeShapes(node)
+        except (RuntimeError, ValueError):
+            # deleted since its cache was submitted
+            continue
+        for layer, shapes in shapesByLayer.items():
+            if shapes is None or nodeShapes & shapes:
+                used[layer].append(node)
+    return used
+
+
+def _nodePaths(nodeType, attr):
+    try:
+        nodes = cmds.ls(type=nodeType) or []
+    except RuntimeError:
+        return []
+    paths = []
+    for n in nodes:
+        if nodeType == 'pgYetiMaya':
+            # only yeti nodes reading from a cache need the cache
+            if not cmds.attributeQuery('fileMode', node=n, exists=True) or cmds.getAttr(f'{n}.fileMode') != 1:
+                continue
+        try:
+            path = cmds.getAttr(f'{n}.{attr}')
+        except (RuntimeError, ValueError):
+            continue
+        if path:
+            paths.append((n, path))
+    return paths
+
+
+def _bifrostPaths():
+    try:
+        containers = cmds.ls(type='bifrostContainer') or []
+    except RuntimeError:
+        return []
+    paths = []
+    for n in containers:
+        for attr in cmds.listAttr(n, string='*CachePath') or []:
+            prefix = attr[:-len('CachePath')]
+            enable = 'enable%s%sCache' % (prefix[:1].upper(), prefix[1:])
+            if cmds.attributeQuery(enable, node=n, exists=True) and not cmds.getAttr(f'{n}.{enable}'):
+                continue
+            folder = cmds.getAttr(f'{n}.{attr}')
+            fileName = cmds.getAttr(f'{n}.{prefix}CacheFileName') \
+                if cmds.attributeQuery(f'{prefix}CacheFileName', node=n, exists=True) else ''
+            if folder:
+                # bifrost writes a folder of files named after the cache
+                paths.append((n, '%s/%s/*' % (folder.rstrip('/\\'), fileName) if fileName else f'{folder}/*'))
+    return paths
+
+
+def collectDependencies(layers, frames=None):
+    """
+    Returns the files used by the given render layers: file textures found
+    through their shading networks, references, alembic, gpu and proxy
+    caches, Yeti caches and Bifrost caches.
+    """
+    dependencies = {}
+
+    def add(path, kind, node, layerNames, depFrames=None):
+        path = cmds.workspace(expandName=path) if not os.path.isabs(path) else path
+        key = path.replace('\\', '/')
+        dep = dependencies.setdefault(key, Dependency(key, kind, node, depFrames))
+        dep.layers.update(layerNames)
+
+    shapesByLayer = {layer: layerShapes(layer) for layer in layers}
+    allShapes = None
+    for layer, shapes in shapesByLayer.items():
+        if shapes is None:
+            if allShapes is None:
+                allShapes = set(cmds.ls(shapes=True, long=True) or [])
+            shapesByLayer[layer] = shapes = allShapes
+        for texture in shadingNetwork.listShadingNodes(list(shapes), 'file'):
+            path = cmds.getAttr('%s.fileTextureName' % texture)
+            if path:
+                add(path, 'texture', texture, [layer])
+
+    for reference in cmds.file(q=True, reference=True) or []:
+        # remove the copy number e.g. asset.ma{1}
+        add(re.sub(r'\{\d+\}$', '', reference), 'reference', reference, [ALL_LAYERS])
+
+    for nodeType, (kind, attr) in FILE_NODES.items():
+        for node, path in _nodePaths(nodeType, attr):
+            nodeShapes = _nodeShapes(node)
+            used = [layer for layer, shapes in shapesByLayer.items() if nodeShapes & shapes]
+            depFrames = frames if nodeType == 'pgYetiMaya' else None
+            add(path, kind, node, used or [ALL_LAYERS], depFrames)
+
+    for node, path in _bifrostPaths():
+        add(path, 'bifrost cache', node, [ALL_LAYERS])
+
+    return list(dependencies.values())
+
+
+def scanScene(layers, frames=None):
+    """
+    Collects and checks the dependencies of the given layers. Returns
+    ({layer: [problem dependencies]}, seconds taken).
+    """
+    start = time.perf_counter()
+    dependencies = checkDependencies(collectDependencies(layers, frames))
+    problems = {}
+    for d in dependencies:
+        if d.status == 'ok':
+            continue
+        for layer in sorted(d.layers):
+            problems.setdefault(layer, []).append(d)
+    return problems, time.perf_counter() - start
+
+
+def formatProblems(problems, limit=20):
+    lines = []
+    for layer, deps in problems.items():
+        lines.append(f'{layer}:')
+        for d in deps[:limit]:
+            detail = f' ({d.detail})' if d.detail else ''
+            lines.append(f'    {d.status} {d.kind}: {d.path}{detail}')
+        if len(deps) > limit:
+            lines.append(f'    ...and {len(deps) - limit} more')
+    return '\n'.join(lines)
@@ -0,0 +1,368 @@
+"""
+Frame cost estimates for farm jobs.
+
+Per-frame render times are measured from the images a previous submission of
+the layer wrote: frames in the same packet are rendered one after another on
+one node, so the time between two images is the render time of the second.
+The times are kept in .data/<scene>.<layer>.<camera>.times.json next to the
+sidecars the submitter writes and are used to suggest packet sizes.
+
+    python -m pipelime.lm_frameScheduler .data/sh010.rs_bg.camShape.times.json --range 1-240 --nodes 12
+"""
+import argparse
+import bisect
+import heapq
+import json
+import math
+import os
+import re
+import statistics
+import time
+
+# seconds of rendering each packet should take
+TARGET_PACKET_SECONDS = 20 * 60
+# seconds a node spends loading the scene before rendering a packet
+PACKET_OVERHEAD = 60
+MAX_PACKET_SIZE = 100
+_RANGE_PART = re.compile(r'^(-?\d+(?:\.\d+)?)(?:-(-?\d+(?:\.\d+)?))?(?:x(\d+))?$')
+_FRAME_FILE = re.compile(r'^(?P<prefix>.*?)(?P<frame>\d+)(?P<ext>\.[^.]+)$')
+_VERSION = re.compile(r'[._]?v\d+$')
+
+
+def parseRange(frameRange):
+    """
+    Returns the sorted frames of a range such as '1-100', '1-10,15,20-30'
+    or '1-100x5'.
+    """
+    return sorted(rangeFrames(frameRange))
+
+
+def rangeFrames(frameRange):
+    """
+    Returns the frames of a range in the order Smedge renders them.
+    """
+    frames = {}
+    for part in str(frameRange).replace(' ', '').split(','):
+        if not part:
+            continue
+        match = _RANGE_PART.match(part)
+        if not match:
+            raise ValueError(f'invalid frame range {frameRange!r}')
+        start = int(float(match.group(1)))
+        end = int(float(match.group(2))) if match.group(2) else start
+        step = int(match.group(3) or 1)
+        if end < start:
+            start, end = end, start
+        frames.update(dict.fromkeys(range(start, end + 1, max(step, 1))))
+    return list(frames)
+
+
+def formatRange(frames):
+    """
+    Returns frames as a range Smedge understands e.g. [1, 2, 3, 5] -> '1-3,5'.
+    The order of the frames is kept, only runs of consecutive frames are
+    joined.
+    """
+    parts = []
+    start = end = None
+    for f in frames:
+        if start is not None and f == end + 1:
+            end = f
+            continue
+        if start is not None:
+            parts.append(f'{start}' if start == end else f'{start}-{end}')
+        start = end = f
+    if start is not None:
+        parts.append(f'{start}' if start == end else f'{start}-{end}')
+    return ','.join(parts)
+
+
+def progressivePasses(frames, step=8):
+    """
+    Splits frames into passes, a coarse pass of every Nth frame and the last
+    frame first, followed by passes that halve the gaps until every frame is
+    in a pass e.g. step 4 on 1-9 -> [1, 5, 9], [3, 7], [2, 4, 6, 8].
+    """
+    frames = sorted(frames)
+    if not frames:
+        return []
+    passes = []
+    seen = set()
+    step = max(int(step), 1)
+    while step >= 1:
+        passFrames = frames[::step]
+        if not passes:
+            passFrames.append(frames[-1])
+        passFrames = [f for f in dict.fromkeys(passFrames) if f not in seen]
+        seen.update(passFrames)
+        if passFrames:
+            passes.append(passFrames)
+        step //= 2
+    return passes
+
+
+def progressiveOrder(frames, step=8):
+    """
+    Returns frames in the order of their progressive passes.
+    """
+    return [f for passFrames in progressivePasses(frames, step) for f in passFrames]
+
+
+def formatSteppedRange(frames):
+    """
+    Returns ascending frames as a range using Smedge's stepped sub-ranges
+    e.g. [1, 9, 17, 25, 30] -> '1-25x8,30', so a pass of a long shot stays a
+    few sub-ranges long.
+    """
+    parts = []
+    i = 0
+    while i < len(frames):
+        end = i
+        if i + 1 < len(frames):
+            step = frames[i + 1] - frames[i]
+            while end + 1 < len(frames) and frames[end + 1] - frames[end] == step:
+                end += 1
+        # two frames a step apart are shorter written on their own
+        if end == i or (end == i + 1 and step != 1):
+            parts.append(f'{frames[i]}')
+            i += 1
+            continue
+        parts.append(f'{frames[i]}-{frames[end]}' if step == 1 else f'{frames[i]}-{frames[end]}x{step}')
+        i = end + 1
+    return ','.join(parts)
+
+
+def progressiveRange(frameRange, step=8):
+    """
+    Returns a range with a sub-range for each progressive pass, coarse pass
+    first e.g. 1-2000 -> '1-1993x8,2000,5-1997x8,3-1999x4,2-1998x2'.
+    """
+    return ','.join(formatSteppedRange(passFrames) for passFrames in progressivePasses(parseRange(frameRange), step))
+
+
+def fixedPackets(frames, packetSize):
+    packetSize = max(int(packetSize), 1)
+    return [frames[i:i + packetSize] for i in range(0, len(frames), packetSize)]
+
+
+def versionlessName(sceneName):
+    """
+    Returns the scene name without its version so all versions of a shot share
+    their history e.g. sh010_lighting_v003 -> sh010_lighting.
+    """
+    return _VERSION.sub('', sceneName) or sceneName
+
+
+def historyPath(sceneFolder, sceneName, layer, camera):
+    niceLayerName = '%s.%s' % (layer, camera.replace(':', '_'))
+    return f'{sceneFolder}/.data/{versionlessName(sceneName)}.{niceLayerName}.times.json'
+
+
+def loadFrameTimes(historyFile):
+    """
+    Returns {frame: seconds} recorded for a layer.
+    """
+    try:
+        with open(historyFile) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {int(frame): float(seconds) for frame, seconds in data.get('frames', {}).items()}
+
+
+def saveFrameTimes(historyFile, frameTimes):
+    folder = os.path.dirname(historyFile)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    data = {'frames': {str(f): round(t, 2) for f, t in sorted(frameTimes.items())}, 'updated': time.time()}
+    tmp = f'{historyFile}.tmp'
+    with open(tmp, mode='w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp, historyFile)
+
+
+def imageFrameTimes(imagePath, imageName, frames, packetSize):
+    """
+    Measures frame render times from the modification times of a rendered
+    sequence. The first frame of each packet also includes loading the scene
+    so it is not measured.
+    """
+    match = _FRAME_FILE.match(imageName)
+    if not match or not os.path.isdir(imagePath):
+        return {}
+    mtimes = {}
+    with os.scandir(imagePath) as entries:
+        for entry in entries:
+            fileMatch = _FRAME_FILE.match(entry.name)
+            if fileMatch and fileMatch['prefix'] == match['prefix'] and fileMatch['ext'] == match['ext']:
+                mtimes[int(fileMatch['frame'])] = entry.stat().st_mtime
+
+    times = {}
+    for packet in fixedPackets(frames, packetSize):
+        for previous, frame in zip(packet, packet[1:]):
+            if frame in mtimes and previous in mtimes and mtimes[frame] >= mtimes[previous]:
+                times[frame] = mtimes[frame] - mtimes[previous]
+    return times
+
+
+def updateHistory(historyFile, sidecarFiles):
+    """
+    Adds the frame times of the renders described by the submit sidecars to
+    the layer history. A sidecar is only read again once it, or its image
+    folder, changed since the history was written.
+    """
+    try:
+        historyTime = os.path.getmtime(historyFile)
+    except OSError:
+        historyTime = 0
+    frameTimes = loadFrameTimes(historyFile)
+    # the history is written whenever a sidecar was read, even without new times, so it isn't read again
+    changed = False
+    for sidecar in sidecarFiles:
+        try:
+            with open(sidecar) as f:
+                data = json.load(f)
+            imagePath = data['img']['imgpath']
+            job = data['job']
+            newest = max(os.path.getmtime(sidecar), os.path.getmtime(imagePath))
+        except (OSError, ValueError, KeyError):
+            continue
+        if newest <= historyTime:
+            continue
+        try:
+            frames = rangeFrames(job['range'])
+        except ValueError:
+            frames = []
+        frameTimes.update(imageFrameTimes(imagePath, data['img']['imgname'], frames, job['packetSize']))
+        changed = True
+    if changed:
+        saveFrameTimes(historyFile, frameTimes)
+    return frameTimes
+
+
+def layerHistory(sceneFolder, sceneName, layer, camera):
+    """
+    Returns {frame: seconds} for a layer from the renders of every version of
+    the scene. Other shots starting with the same name, like sh010 for sh01,
+    aren't included.
+    """
+    niceLayerName = '%s.%s' % (layer, camera.replace(':', '_'))
+    # versions of the scene and the scene without a version
+    pattern = re.compile(r'%s(?:[._]?v\d+)?\.%s\.json$'
+                         % (re.escape(versionlessName(sceneName)), re.escape(niceLayerName)))
+    dataFolder = f'{sceneFolder}/.data'
+    try:
+        sidecars = [f'{dataFolder}/{name}' for name in os.listdir(dataFolder) if pattern.match(name)]
+    except OSError:
+        sidecars = []
+    return updateHistory(historyPath(sceneFolder, sceneName, layer, camera), sidecars)
+
+
+def estimateCosts(frames, frameTimes, default=1.0):
+    """
+    Returns {frame: seconds} for every frame. Frames without history take the
+    average of the closest measured frames on either side.
+    """
+    known = sorted(frameTimes)
+    if not known:
+        return {f: default for f in frames}
+    costs = {}
+    for f in frames:
+        if f in frameTimes:
+            costs[f] = frameTimes[f]
+            continue
+        i = bisect.bisect_left(known, f)
+        neighbours = [frameTimes[known[j]] for j in (i - 1, i) if 0 <= j < len(known)]
+        costs[f] = sum(neighbours) / len(neighbours)
+    return costs
+
+
+def planPackets(frames, costs, packetSeconds=TARGET_PACKET_SECONDS):
+    """
+    Splits frames into packets of roughly equal render time.
+    """
+    packets = []
+    packet = []
+    packetCost = 0.0
+    for f in frames:
+        if packet and packetCost + costs[f] > packetSeconds:
+            packets.append(packet)
+            packet = []
+            packetCost = 0.0
+        packet.append(f)
+        packetCost += costs[f]
+    if packet:
+        packets.append(packet)
+    return packets
+
+
+def suggestPacketSize(frames, costs, nodes=None, packetSeconds=TARGET_PACKET_SECONDS):
+    """
+    Returns a packet size that makes packets take about packetSeconds. With
+    the number of nodes given it is lowered so every node gets a packet.
+    """
+    if not frames:
+        return 1
+    frameCost = statistics.mean(costs[f] for f in frames) or 1.0
+    packetSize = int(round(packetSeconds / frameCost))
+    if nodes:
+        packetSize = min(packetSize, math.ceil(len(frames) / nodes))
+    return max(1, min(packetSize, MAX_PACKET_SIZE))
+
+
+def simulate(packets, costs, nodes, overhead=PACKET_OVERHEAD):
+    """
+    Replays packets on a number of nodes, each packet going to the first free
+    node. Returns the makespan in seconds and how busy the nodes were.
+    """
+    work = 0.0
+    free = [0.0] * max(int(nodes), 1)
+    for packet in packets:
+        start = heapq.heappop(free)
+        packetCost = overhead + sum(costs[f] for f in packet)
+        work += packetCost
+        heapq.heappush(free, start + packetCost)
+    makespan = max(free)
+    return {'packets': len(packets), 'makespan': makespan, 'utilisation': work / (makespan * len(free)) if makespan else 0.0}
+
+
+def compareSchedules(frames, costs, packetSize, nodes, overhead=PACKET_OVERHEAD):
+    """
+    Simulates the current packet size against the suggested packet size and
+    packets split by render time.
+    """
+    suggested = suggestPacketSize(frames, costs, nodes)
+    # the same number of packets as the suggested size, but each taking the same time
+    packetSeconds = sum(costs[f] for f in frames) / len(fixedPackets(frames, suggested))
+    return {
+        f'packet size {packetSize}': simulate(fixedPackets(frames, packetSize), costs, nodes, overhead),
+        f'packet size {suggested} (suggested)': simulate(fixedPackets(frames, suggested), costs, nodes, overhead),
+        'equal time packets': simulate(planPackets(frames, costs, packetSeconds), costs, nodes, overhead)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lm_frameScheduler', description='Replay recorded frame times on the farm.')
+    parser.add_argument('history', help='.times.json file of a layer')
+    parser.add_argument('--range', help='frames to simulate, defaults to the recorded frames')
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--packet-size', type=int, default=10)
+    parser.add_argument('--overhead', type=float, default=PACKET_OVERHEAD, help='seconds to load the scene')
+    args = parser.parse_args(argv)
+
+    frameTimes = loadFrameTimes(args.history)
+    if not frameTimes:
+        parser.error(f'no frame times in {args.history}')
+    frames = parseRange(args.range) if args.range else sorted(frameTimes)
+    costs = estimateCosts(frames, frameTimes)
+
+    print(f'{len(frames)} frames, {sum(costs.values()) / 3600:.1f} node hours on {args.nodes} nodes')
+    results = compareSchedules(frames, costs, args.packet_size, args.nodes, args.overhead)
+    baseline = next(iter(results.values()))['makespan']
+    for name, result in results.items():
+        print(f'{name:<32} {result["packets"]:>5} packets  {result["makespan"] / 60:>8.1f} min  '
+              f'{result["utilisation"]:>4.0%} busy  {baseline / result["makespan"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import replace
+
+from pipelime.lm_submitUtil import submit_job
+
+# jobs sent to smedge at the same time
+MAX_SUBMISSIONS = 4
+
+
+class JobGraph():
+    """
+    Farm jobs and the jobs they wait for. Jobs are submitted once everything
+    they depend on has a job ID, which is passed to Smedge with -WaitForJobID.
+
+    A whole job dependency waits for the upstream job to finish. Otherwise
+    each frame only waits for the same frame of the upstream job, so e.g.
+    meshing can start on the first frames while the sim is still running.
+
+        graph = JobGraph()
+        graph.add('sim', simJob)
+        graph.add('mesh', meshJob, after=['sim'], wholeJob=False)
+        jobIDs = graph.submit()
+    """
+
+    def __init__(self):
+        # name: JobSpec
+        self.jobs = {}
+        # name: [upstream names]
+        self.upstream = {}
+        # name: True if it waits for whole upstream jobs
+        self.wholeJob = {}
+        # name: jobID of jobs already on the farm that new jobs can wait for
+        self.submitted = {}
+
+    def add(self, name, job, after=None, wholeJob=True):
+        if name in self.jobs:
+            raise ValueError(f'job {name!r} was already added')
+        self.jobs[name] = job
+        self.upstream[name] = list(after or [])
+        self.wholeJob[name] = wholeJob
+        return name
+
+    def addSubmitted(self, name, jobID):
+        """
+        Adds a job that is already on the farm so new jobs can wait for it.
+        """
+        self.submitted[name] = jobID
+        return name
+
+    def order(self):
+        """
+        Returns the job names with every job after the jobs it waits for.
+        """
+        for name, upstream in self.upstream.items():
+            missing = [u for u in upstream if u not in self.jobs and u not in self.submitted]
+            if missing:
+                raise ValueError(f'job {name!r} waits for unknown jobs {missing}')
+        remaining = {name: len([u for u in upstream if u in self.jobs]) for name, upstream in self.upstream.items()}
+        ordered = [name for name, count in remaining.items() if count == 0]
+        for name in ordered:
+            for downstream, upstream in self.upstream.items():
+                if name in upstream:
+                    remaining[downstream] -= upstream.count(name)
+                    if remaining[downstream] == 0:
+                        ordered.append(downstream)
+        if len(ordered) != len(self.jobs):
+            raise ValueError('job dependencies form a cycle: %s' % [n for n in self.jobs if n not in ordered])
+        return ordered
+
+    def ready(self, jobIDs, started, order=None):
+        """
+        Returns the jobs not yet started whose upstream jobs all have IDs.
+        order is the result of order() if it was already worked out.
+        """
+        return [name for name in (order or self.order()) if name not in started
+                and all(jobIDs.get(u) for u in self.upstream[name])]
+
+    def blocked(self, failed, order=None):
+        """
+        Returns the jobs that can't be submitted because a job they wait for
+        failed to submit.
+        """
+        order = order or self.order()
+        blocked = set(failed)
+        for name in order:
+            if any(u in blocked for u in self.upstream[name]):
+                blocked.add(name)
+        return [name for name in order if name in blocked and name not in failed]
+
+    def command(self, name, jobIDs):
+        """
+        Returns the submit command of a job with the IDs of its upstream jobs.
+        """
+        job = self.jobs[name]
+        upstream = self.upstream[name]
+        if upstream:
+            options = dict(job.options)
+            # more than one upstream job is passed as a comma separated list
+            options['-WaitForJobID'] = ','.join(jobIDs[u] for u in upstream)
+            options['-WaitForWholeJob'] = 1 if self.wholeJob[name] else 0
+            job = replace(job, options=options)
+        return job.toCommand()
+
+    def submit(self, maxWorkers=MAX_SUBMISSIONS, submit=submit_job):
+        """
+        Submits every job, independent jobs at the same time. Returns
+        {name: jobID}, jobs that failed or were blocked by a failed job are
+        None.
+        """
+        submission = GraphSubmission(self, maxWorkers, submit)
+        while not submission.finished:
+            submission.poll(timeout=None)
+        return {name: submission.jobIDs.get(name) for name in self.jobs}
+
+
+class GraphSubmission():
+    """
+    Sends the jobs of a JobGraph to Smedge from a pool of threads, each job as
+    soon as the jobs it waits for have an ID. poll() doesn't block unless it
+    is given a timeout, so it can be called from a timer on Maya's main
+    thread.
+
+        submission = GraphSubmission(graph)
+        while not submission.finished:
+            for name, jobID, error in submission.poll(timeout=None):
+                print(name, jobID)
+    """
+
+    def __init__(self, graph, maxWorkers=MAX_SUBMISSIONS, submit=submit_job):
+        self.graph = graph
+        # raises before anything is sent if the jobs wait for each other
+        self.order = graph.order()
+        self.submit = submit
+        self.jobIDs = dict(graph.submitted)
+        self.started = set()
+        self.failed = []
+        # [[name, jobID, error]] in the order the jobs finished
+        self.results = []
+        # future: name
+        self.running = {}
+        self.pool = ThreadPoolExecutor(max_workers=maxWorkers)
+        self._submitReady()
+        if not self.running:
+            self._finish()
+
+    @property
+    def finished(self):
+        return not self.running
+
+    def _submitReady(self):
+        for name in self.graph.ready(self.jobIDs, self.started, self.order):
+            self.started.add(name)
+            command = self.graph.command(name, self.jobIDs)
+            print(command)
+            self.running[self.pool.submit(self.submit, command)] = name
+
+    def _finish(self):
+        self.pool.shutdown()
+        blocked = []
+        for name in self.graph.blocked(self.failed, self.order):
+            print(f'not submitting {name}, a job it waits for failed')
+            self.jobIDs[name] = None
+            blocked.append([name, None, RuntimeError('a job it waits for failed to submit')])
+        return blocked
+
+    def poll(self, timeout=0):
+        """
+        Collects the jobs that have been submitted, waiting up to timeout
+        seconds for one, and sends the jobs that were waiting on them.
+        Returns [[name, jobID, error]] of the jobs that finished since the
+        last poll.
+        """
+        if not self.running:
+            return []
+        done, _ = wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+        finished = []
+        for future in done:
+            name = self.running.pop(future)
+            try:
+                jobID = future.result()
+                if not jobID or not jobID.strip():
+                    raise RuntimeError('Submit printed no job ID')
+                finished.append([name, jobID.strip(), None])
+            except Exception as e:
+                print(f'failed to submit {name}: {e}')
+                self.failed.append(name)
+                finished.append([name, None, e])
+            self.jobIDs[name] = finished[-1][1]
+        self._submitReady()
+        if not self.running:
+            finished += self._finish()
+        self.results += finished
+        return finished
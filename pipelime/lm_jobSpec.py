@@ -0,0 +1,192 @@
+import json
+from dataclasses import asdict, dataclass, field
+
+from pipelime.lm_frameScheduler import progressiveRange
+from pipelime.lm_submitUtil import build_submit
+
+
+@dataclass
+class SceneInfo:
+    """
+    Information about the open scene that every job needs. Create it with
+    SceneInfo.fromScene() once per submission.
+    """
+    filepath: str
+    project: str
+    sceneName: str
+    width: int = 1920
+    height: int = 1080
+
+    @classmethod
+    def fromScene(cls):
+        import maya.cmds as cmds
+        import baseIO.getProj as getProj
+        return cls(
+            filepath=getProj.filepath(),
+            project=getProj.getProject(),
+            sceneName=getProj.sceneName(),
+            width=cmds.getAttr('defaultResolution.width'),
+            height=cmds.getAttr('defaultResolution.height')
+        )
+
+
+@dataclass
+class SubmitSettings:
+    """Settings shared by every job in a submission."""
+    submitExe: str
+    renderExe: str
+    creator: str = ''
+    note: str = ''
+    staggerStart: str = '0'
+    paused: bool = False
+    halfResolution: bool = False
+    detectErrors: bool = True
+    gpu: bool = False
+    # render a coarse pass of every progressiveStep frame before the rest, render jobs only
+    progressive: bool = False
+    progressiveStep: int = 8
+
+
+@dataclass
+class LayerSettings:
+    """Settings of a single layer/camera pair being submitted."""
+    layer: str
+    camera: str
+    label: str
+    jobType: str = 'Render'
+    priority: int = 50
+    packetSize: int = 10
+    pool: str = ''
+    range: str = '1-100'
+    enabled: bool = True
+
+
+@dataclass
+class JobSpec:
+    """
+    A single Smedge job. The options are kept in the order they are passed to
+    Submit.exe. Any option starting with an underscore is added as is.
+    """
+    submitExe: str
+    options: dict = field(default_factory=dict)
+    label: str = ''
+    # folder that needs to exist before the job runs
+    outputFolder: str = ''
+
+    def toCommand(self) -> str:
+        return build_submit(f'"{self.submitExe}"', True, **self.options)
+
+    def toDict(self) -> dict:
+        return asdict(self)
+
+
+def _commonOptions(scene: SceneInfo, settings: SubmitSettings, layer: LayerSettings) -> dict:
+    options = {
+        '-Name': f'maya: {scene.sceneName} ({layer.label})',
+        '-Priority': layer.priority,
+        '-PacketSize': layer.packetSize,
+        '-Pool': layer.pool,
+        '-Range': layer.range,
+        '-Executable': settings.renderExe,
+    }
+    if settings.paused:
+        options['_Paused'] = '-Paused'
+    options['-Creator'] = settings.creator
+    options['-StaggerStart'] = settings.staggerStart
+    options['-Note'] = settings.note
+    return options
+
+
+def _frameRange(settings: SubmitSettings, layer: LayerSettings) -> str:
+    # renders only, playblasts and caches run every frame from $(SubRange.Start) to $(SubRange.End) of a packet
+    if settings.progressive:
+        return progressiveRange(layer.range, settings.progressiveStep)
+    return layer.range
+
+
+def _mayaBatch(settings: SubmitSettings) -> str:
+    return settings.renderExe.replace('Render', 'mayaBatch')
+
+
+def renderJob(scene: SceneInfo, settings: SubmitSettings, layer: LayerSettings) -> JobSpec:
+    options = {
+        '-Type': 'Redshift for Maya',
+        '-Scene': scene.filepath,
+        '-Project': scene.project,
+        '_Layer': f'-Extra "-rl {layer.layer}"',
+        '_Camera': f'-Extra "-cam {layer.camera}"',
+    }
+    options.update(_commonOptions(scene, settings, layer))
+    options['-Range'] = _frameRange(settings, layer)
+    if settings.halfResolution:
+        options['_HalfResolution'] = f'-Extra "-x {scene.width / 2} -y {scene.height / 2} -preRender "setAttr ' \
+                                     f'\\"redshiftOptions.unifiedMaxSamples\\" 16; setAttr ' \
+                                     f'\\"redshiftOptions.unifiedMinSamples\\" 4;""'
+    if not settings.detectErrors:
+        options['-DetectErrors'] = 0
+    if settings.gpu:
+        options['_Resources'] = '-CPUs -1 -GPUs 1 -RAM -1'
+    else:
+        options['_Resources'] = '-CPUs 0 -GPUs 0 -RAM 0'
+    options['_Distribute'] = '-DistributeMode 0 -StaggerCount 1 -StaggerMode 1'
+    return JobSpec(settings.submitExe, options, layer.label)
+
+
+def playblastJob(scene: SceneInfo, settings: SubmitSettings, layer: LayerSettings) -> JobSpec:
+    cameraName = layer.camera.rsplit('|', 1)[0].replace('|', '_')
+    filename = f'{scene.sceneName}/{scene.sceneName}_{layer.layer}_{cameraName}'
+    playblastFolder = f'{scene.project}images/playblasts/{filename}'
+
+    options = {'-Type': 'Generic Script'}
+    options.update(_commonOptions(scene, settings, layer))
+    options['_Command'] = f'-Command "{_mayaBatch(settings)} -file \\"{scene.filepath}\\" -command ' \
+                          f'\\"setPlayblastOptions(\\"\\"{layer.camera}\\"\\",\\"\\"{layer.layer}\\"\\");playblast ' \
+                          f'-format image -startTime $(SubRange.Start) -endTime $(SubRange.End) -filename ' \
+                          f'(\\"\\"{playblastFolder}\\"\\") -sequenceTime 0 -clearCache 1 -viewer 0 ' \
+                          f'-showOrnaments 0 -fp 4 -percent 100 -quality 70 -widthHeight 1920 1080;\\" '
+    return JobSpec(settings.submitExe, options, layer.label)
+
+
+def cacheJob(scene: SceneInfo, settings: SubmitSettings, layer: LayerSettings) -> JobSpec:
+    renderLayerName = layer.layer.replace(':', '_')
+    filename = f'{scene.sceneName}/{scene.sceneName}_{renderLayerName}'
+    cacheFile = f'{scene.project}cache/yeti/{filename}.%04d.fur'
+
+    options = {
+        '-Type': 'Generic Script',
+        '-UsageLimit': 1,
+        '-DistributeMode': 'Forward'
+    }
+    options.update(_commonOptions(scene, settings, layer))
+    options['_Command'] = f'-Command "{_mayaBatch(settings)} -file \\"{scene.filepath}\\" -command ' \
+                          f'\\"pgYetiCommand -writeCache \\"\\"{cacheFile}\\"\\" -range $(SubRange.Start) ' \
+                          f'$(SubRange.End) -samples 5 {layer.layer};\\" '
+    return JobSpec(settings.submitExe, options, layer.label, cacheFile.rsplit('/', 1)[0])
+
+
+_BUILDERS = {
+    'Render': renderJob,
+    'Playblast': playblastJob,
+    'Yeti Cache': cacheJob,
+    'Bifrost Cache': cacheJob
+}
+
+
+def buildJob(scene: SceneInfo, settings: SubmitSettings, layer: LayerSettings) -> JobSpec:
+    """
+    Builds the job for a layer depending on its job type. Unknown job types
+    are submitted as renders.
+    """
+    return _BUILDERS.get(layer.jobType, renderJob)(scene, settings, layer)
+
+
+def writeBatch(jobs: list, path: str):
+    """Writes jobs to a JSON file so they can be submitted later or from another script."""
+    with open(path, mode='w') as batchFile:
+        json.dump([j.toDict() for j in jobs], batchFile, indent=4)
+
+
+def readBatch(path: str) -> list:
+    """Reads the jobs written by writeBatch."""
+    with open(path) as batchFile:
+        return [JobSpec(**j) for j in json.load(batchFile)]
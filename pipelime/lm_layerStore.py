@@ -0,0 +1,84 @@
+"""
+Submit settings saved on render layer (or cache) nodes.
+
+All the settings of a layer are kept as one JSON string attribute, so a
+layer is read with one getAttr and written with one setAttr. Layers saved
+before this have a string attribute per widget of the submit window; they
+are read from those until the layer is next saved, which replaces them.
+"""
+import json
+
+import maya.cmds as cmds
+
+SETTINGS_ATTR = 'farmSettings'
+# LayerSettings fields that are saved
+SETTINGS = ['jobType', 'priority', 'packetSize', 'pool', 'range']
+# attributes the settings used to be saved in, one per widget
+LEGACY_ATTRIBUTES = {
+    'comboBox_jobType': 'jobType',
+    'spinBox_2': 'priority',
+    'spinBox_layerPacketSize': 'packetSize',
+    'comboBox_layerPool': 'pool',
+    'lineEdit_layerRange': 'range'
+}
+
+
+def _legacyAttributes(node):
+    try:
+        userAttributes = cmds.listAttr(node, userDefined=True) or []
+    except (RuntimeError, ValueError):
+        return []
+    return [attr for attr in userAttributes if attr in LEGACY_ATTRIBUTES]
+
+
+def readSettings(node):
+    """
+    Returns the {setting: value} saved on a node, empty if nothing was saved.
+    """
+    try:
+        data = cmds.getAttr(f'{node}.{SETTINGS_ATTR}')
+    except (RuntimeError, ValueError):
+        data = None
+    if data:
+        try:
+            return json.loads(data)
+        except ValueError:
+            print(f'ignoring unreadable farm settings on {node}')
+            return {}
+
+    # settings saved by older versions of the submit window
+    settings = {}
+    for attr in _legacyAttributes(node):
+        value = cmds.getAttr(f'{node}.{attr}')
+        if value not in (None, ''):
+            settings[LEGACY_ATTRIBUTES[attr]] = value
+    return settings
+
+
+def writeSettings(node, settings):
+    """
+    Saves {setting: value} on a node, replacing any settings saved in the
+    old one attribute per widget layout.
+    """
+    if not cmds.attributeQuery(SETTINGS_ATTR, node=node, exists=True):
+        cmds.addAttr(node, longName=SETTINGS_ATTR, dataType='string')
+        for attr in _legacyAttributes(node):
+            cmds.deleteAttr(node, attribute=attr)
+    cmds.setAttr(f'{node}.{SETTINGS_ATTR}', json.dumps(settings, sort_keys=True), type='string')
+
+
+def writeLayers(layers):
+    """
+    Saves the settings of LayerSettings rows, once for each node when a
+    layer is rendered through more than one camera.
+    """
+    nodes = {}
+    for layer in layers:
+        # empty settings aren't saved so the window's value is used
+        nodes[layer.layer] = {field: getattr(layer, field) for field in SETTINGS if getattr(layer, field) != ''}
+    for node, settings in nodes.items():
+        try:
+            writeSettings(node, settings)
+        except RuntimeError as e:
+            # referenced or locked nodes can't take new attributes
+            print(f'could not save farm settings on {node}: {e}')
@@ -0,0 +1,209 @@
+"""
+Table model of the layers in the submit window.
+
+Each row is a LayerSettings, so no widgets are made per layer. The view only
+paints the rows that are visible and the delegates make an editor for the
+cell being edited. Changes from the global controls update a whole column
+and emit a single dataChanged.
+"""
+from PySide2 import QtCore
+from PySide2 import QtGui
+from PySide2 import QtWidgets
+
+# columns and the LayerSettings field they show
+LAYER, JOB_TYPE, RANGE, PRIORITY, POOL, PACKET_SIZE = range(6)
+COLUMNS = [
+    ('Layer', 'label'),
+    ('Type', 'jobType'),
+    ('Range', 'range'),
+    ('Priority', 'priority'),
+    ('Pool', 'pool'),
+    ('Packet', 'packetSize')
+]
+# job types a layer can be switched between, cache layers keep the type of the window
+JOB_TYPES = ['Render', 'Playblast']
+PRIORITY_MAX = 50
+PACKET_SIZE_MAX = 999
+ROW_HEIGHT = 24
+COLUMN_WIDTHS = {JOB_TYPE: 90, RANGE: 90, PRIORITY: 60, POOL: 110, PACKET_SIZE: 60}
+DISABLED_COLOUR = QtGui.QColor('#777777')
+
+
+class LayerTableModel(QtCore.QAbstractTableModel):
+
+    def __init__(self, parent=None):
+        super(LayerTableModel, self).__init__(parent)
+        # [LayerSettings]
+        self.layers = []
+        # [{column: tool tip}] for each row
+        self.toolTips = []
+        # pools offered by the pool delegate
+        self.pools = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.layers)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        layer = self.layers[index.row()]
+        column = index.column()
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return getattr(layer, COLUMNS[column][1])
+        if role == QtCore.Qt.CheckStateRole and column == LAYER:
+            return QtCore.Qt.Checked if layer.enabled else QtCore.Qt.Unchecked
+        if role == QtCore.Qt.ToolTipRole:
+            return self.toolTips[index.row()].get(column)
+        if role == QtCore.Qt.ForegroundRole and not layer.enabled:
+            return DISABLED_COLOUR
+        return None
+
+    def flags(self, index):
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if index.column() == LAYER:
+            return flags | QtCore.Qt.ItemIsUserCheckable
+        if index.column() == JOB_TYPE and self.layers[index.row()].jobType not in JOB_TYPES:
+            return flags
+        return flags | QtCore.Qt.ItemIsEditable
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid():
+            return False
+        layer = self.layers[index.row()]
+        column = index.column()
+        if column == LAYER and role == QtCore.Qt.CheckStateRole:
+            layer.enabled = value == QtCore.Qt.Checked
+            # the whole row is greyed out when disabled
+            self.dataChanged.emit(self.index(index.row(), 0), self.index(index.row(), len(COLUMNS) - 1))
+            return True
+        if column == LAYER or role != QtCore.Qt.EditRole:
+            return False
+        field = COLUMNS[column][1]
+        setattr(layer, field, type(getattr(layer, field))(value))
+        self.dataChanged.emit(index, index)
+        return True
+
+    def setLayers(self, layers, toolTips=None):
+        self.beginResetModel()
+        self.layers = list(layers)
+        self.toolTips = list(toolTips) if toolTips else [{} for _ in self.layers]
+        self.endResetModel()
+
+    def setToolTip(self, row, column, toolTip):
+        """
+        Sets the tool tip of a cell and repaints it, along with any change made
+        to the row's LayerSettings.
+        """
+        self.toolTips[row][column] = toolTip
+        index = self.index(row, column)
+        self.dataChanged.emit(index, index)
+
+    def setColumn(self, column, value):
+        """
+        Sets a column of every row, LAYER sets whether the rows are enabled.
+        """
+        if not self.layers:
+            return
+        field = 'enabled' if column == LAYER else COLUMNS[column][1]
+        for layer in self.layers:
+            setattr(layer, field, value)
+        first, last = (0, len(COLUMNS) - 1) if column == LAYER else (column, column)
+        self.dataChanged.emit(self.index(0, first), self.index(len(self.layers) - 1, last))
+
+    def shiftPriority(self, difference):
+        """
+        Moves the priority of every row by the same amount, keeping the
+        differences between layers.
+        """
+        if not self.layers:
+            return
+        for layer in self.layers:
+            layer.priority = min(max(layer.priority + difference, 0), PRIORITY_MAX)
+        self.dataChanged.emit(self.index(0, PRIORITY), self.index(len(self.layers) - 1, PRIORITY))
+
+    def setPools(self, pools):
+        self.pools = list(pools)
+
+    def enabledLayers(self):
+        return [layer for layer in self.layers if layer.enabled]
+
+
+class ComboBoxDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Edits a cell with a combo box of the items returned by items(index).
+    """
+
+    def __init__(self, items, parent=None):
+        super(ComboBoxDelegate, self).__init__(parent)
+        self.items = items
+
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QComboBox(parent)
+        editor.addItems(self.items(index))
+        # commit as soon as an item is picked rather than when the editor loses focus
+        editor.activated.connect(lambda: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        value = index.data(QtCore.Qt.EditRole)
+        if editor.findText(value) < 0:
+            editor.addItem(value)
+        editor.setCurrentText(value)
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText())
+
+
+class SpinBoxDelegate(QtWidgets.QStyledItemDelegate):
+
+    def __init__(self, minimum, maximum, parent=None):
+        super(SpinBoxDelegate, self).__init__(parent)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QSpinBox(parent)
+        editor.setRange(self.minimum, self.maximum)
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setValue(index.data(QtCore.Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        editor.interpretText()
+        model.setData(index, editor.value())
+
+
+def setupView(view, model):
+    """
+    Shows a LayerTableModel in a QTableView with editors for each column.
+    """
+    view.setModel(model)
+    # kept on the view so the delegates aren't garbage collected
+    view.delegates = [
+        ComboBoxDelegate(lambda index: JOB_TYPES, view),
+        SpinBoxDelegate(0, PRIORITY_MAX, view),
+        ComboBoxDelegate(lambda index: index.model().pools, view),
+        SpinBoxDelegate(1, PACKET_SIZE_MAX, view)
+    ]
+    for column, delegate in zip([JOB_TYPE, PRIORITY, POOL, PACKET_SIZE], view.delegates):
+        view.setItemDelegateForColumn(column, delegate)
+    view.setEditTriggers(QtWidgets.QAbstractItemView.AllEditTriggers)
+    view.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+    # rows of the same height let the view work out which rows are visible without measuring them
+    view.verticalHeader().setVisible(False)
+    view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+    view.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
+    # fixed widths, sizing columns to their contents would measure every row
+    for column, width in COLUMN_WIDTHS.items():
+        view.setColumnWidth(column, width)
+    view.horizontalHeader().setSectionResizeMode(LAYER, QtWidgets.QHeaderView.Stretch)
+    return view
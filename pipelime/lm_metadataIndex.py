@@ -0,0 +1,427 @@
+"""
+Scene metadata of a project kept in one SQLite database in .projectData,
+instead of a small JSON sidecar in .data next to every scene.
+
+Records are keyed by the scene path without its extension (the same name
+the sidecars use) relative to the project root, plus a kind and, for layer
+records, the layer name. Each record holds the same dictionary the sidecar
+held, so a folder of asset versions is one query rather than a file open
+per version.
+
+SQLite's WAL mode needs shared memory and doesn't work on network shares.
+The journal is picked once by whoever creates the database, WAL on a local
+disk and a rollback journal on a share, where writers wait on the busy
+timeout. Clients on a share switch a WAL database back to a rollback
+journal, and don't use it if it's open somewhere else.
+Projects without a .projectData folder keep using the sidecars.
+
+    python -m pipelime.lm_metadataIndex P:/project
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import baseIO.loadSave as IO
+
+DATABASE = '.projectData/metadata.db'
+# seconds a writer waits for another artist's write to finish
+BUSY_TIMEOUT = 30
+# record kinds
+SCENE = 'scene'
+PUBLISH = 'publish'
+LAYER = 'layer'
+# file systems that can't use WAL
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'fuse.sshfs', 'afpfs', '9p'}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    path TEXT NOT NULL COLLATE NOCASE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    folder TEXT NOT NULL COLLATE NOCASE,
+    data TEXT NOT NULL,
+    modified REAL NOT NULL,
+    PRIMARY KEY (path, kind, name)
+);
+CREATE INDEX IF NOT EXISTS records_folder ON records (folder, kind);
+"""
+
+# folder: MetadataIndex, or None if it isn't in a project with a .projectData folder
+_indexes = {}
+# project root: MetadataIndex
+_projects = {}
+_indexLock = threading.Lock()
+
+
+def isNetworkPath(path):
+    """
+    Returns True if a path is on a network share.
+    """
+    path = os.path.abspath(path)
+    if path.startswith(('\\\\', '//')):
+        return True
+    if os.name == 'nt':
+        import ctypes
+        drive = os.path.splitdrive(path)[0] + '\\'
+        # DRIVE_REMOTE
+        return ctypes.windll.kernel32.GetDriveTypeW(drive) == 4
+    try:
+        with open('/proc/mounts') as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    # the longest mount point the path is under
+    fileSystem = ''
+    longest = -1
+    for mountPoint, mountType in mounts:
+        if (path == mountPoint or path.startswith(mountPoint.rstrip('/') + '/')) and len(mountPoint) > longest:
+            fileSystem, longest = mountType, len(mountPoint)
+    return fileSystem in NETWORK_FILESYSTEMS
+
+
+def journalModeOf(path):
+    """
+    Returns 'WAL' or 'DELETE' from the header of a database without opening
+    it, or None if it hasn't been created yet.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(20)
+    except OSError:
+        return None
+    if len(header) < 20:
+        return None
+    # the read and write versions are 2 in WAL mode and 1 with a rollback journal
+    return 'WAL' if header[18] == 2 else 'DELETE'
+
+
+def sceneKey(path):
+    # scene path without the extension, the name its sidecars are saved under
+    folder, fileName = os.path.split(path.replace('\\', '/'))
+    return '%s/%s' % (folder, fileName.split('.')[0])
+
+
+def _folderOf(key):
+    return key.rsplit('/', 1)[0] if '/' in key else '.'
+
+
+def sidecarPath(scenePath, name=''):
+    folder, scene = sceneKey(scenePath).rsplit('/', 1)
+    return '%s/.data/%s%s.json' % (folder, scene, '.%s' % name if name else '')
+
+
+class MetadataIndex():
+    """
+    The metadata database of a project.
+
+        index = MetadataIndex('P:/project')
+        index.update('P:/project/maya/scenes/sh010/sh010_v003.mb', [['user', 'value', 'chris']])
+        versions = index.folderRecords('P:/project/maya/scenes/sh010')
+    """
+
+    def __init__(self, projectRoot):
+        self.root = os.path.abspath(projectRoot).replace('\\', '/')
+        self.path = '%s/%s' % (self.root, DATABASE)
+        self.network = isNetworkPath(self.root)
+        # the journal the database uses, found when it's first connected to
+        self.journalMode = None
+        self._created = False
+
+    def _relative(self, path):
+        path = os.path.abspath(path).replace('\\', '/')
+        try:
+            relative = os.path.relpath(path, self.root).replace('\\', '/')
+        except ValueError:
+            # on another drive
+            return path
+        return path if relative.startswith('../') else relative
+
+    def key(self, scenePath):
+        return self._relative(sceneKey(scenePath))
+
+    def connect(self):
+        if not self._created:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.journalMode = journalModeOf(self.path)
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        connection.execute('PRAGMA busy_timeout = %d' % (BUSY_TIMEOUT * 1000))
+        if not self._created:
+            try:
+                self._setUp(connection)
+            except BaseException:
+                connection.close()
+                raise
+            self._created = True
+        return connection
+
+    def _setUp(self, connection):
+        if self.journalMode is None:
+            # a new database, its journal is picked by whoever creates it and kept
+            mode = 'DELETE' if self.network else 'WAL'
+            try:
+                self.journalMode = connection.execute('PRAGMA journal_mode = %s' % mode).fetchone()[0].upper()
+            except sqlite3.OperationalError:
+                # someone else created it at the same time
+                self.journalMode = journalModeOf(self.path)
+        if self.journalMode == 'WAL' and self.network:
+            # WAL was picked on the machine sharing the project, it only changes while nobody has it open
+            try:
+                self.journalMode = connection.execute('PRAGMA journal_mode = DELETE').fetchone()[0].upper()
+            except sqlite3.OperationalError:
+                pass
+            if self.journalMode != 'DELETE':
+                raise sqlite3.OperationalError('%s uses WAL, which doesn\'t work on a network share, and is open '
+                                               'somewhere else' % self.path)
+        connection.executescript(SCHEMA)
+
+    def _write(self, records):
+        # records = [(scenePath, kind, name, prefData)], merged into what is saved like writePrefsToFile
+        connection = self.connect()
+        try:
+            # take the write lock before reading so another artist can't write in between
+            connection.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            for scenePath, kind, name, prefData in records:
+                key = self.key(scenePath)
+                row = connection.execute('SELECT data FROM records WHERE path = ? AND kind = ? AND name = ?',
+                                         (key, kind, name)).fetchone()
+                data = json.loads(row[0]) if row else {}
+                IO.updatePrefs(data, prefData)
+                connection.execute('INSERT OR REPLACE INTO records (path, kind, name, folder, data, modified) '
+                                   'VALUES (?, ?, ?, ?, ?, ?)',
+                                   (key, kind, name, _folderOf(key), json.dumps(data, sort_keys=True), now))
+            connection.execute('COMMIT')
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+
+    def update(self, scenePath, prefData, kind=SCENE, name=''):
+        self._write([(scenePath, kind, name, prefData)])
+
+    def updateMany(self, records):
+        """
+        Writes [(scenePath, kind, name, prefData)] in one transaction.
+        """
+        if records:
+            self._write(records)
+
+    def get(self, scenePath, kind=SCENE, name=''):
+        """
+        Returns the record of a scene, or None if there isn't one.
+        """
+        connection = self.connect()
+        try:
+            row = connection.execute('SELECT data FROM records WHERE path = ? AND kind = ? AND name = ?',
+                                     (self.key(scenePath), kind, name)).fetchone()
+        finally:
+            connection.close()
+        return json.loads(row[0]) if row else None
+
+    def folderRecords(self, folder, kind=SCENE):
+        """
+        Returns {scene name: record} of every scene in a folder.
+        """
+        connection = self.connect()
+        try:
+            rows = connection.execute('SELECT path, data FROM records WHERE folder = ? AND kind = ?',
+                                      (self._relative(folder), kind)).fetchall()
+        finally:
+            connection.close()
+        return {path.rsplit('/', 1)[-1]: json.loads(data) for path, data in rows}
+
+    def sceneRecords(self, scenePath, kind=LAYER):
+        """
+        Returns {name: record} of the layers or other named records of a scene.
+        """
+        connection = self.connect()
+        try:
+            rows = connection.execute('SELECT name, data FROM records WHERE path = ? AND kind = ?',
+                                      (self.key(scenePath), kind)).fetchall()
+        finally:
+            connection.close()
+        return {name: json.loads(data) for name, data in rows}
+
+    def importSidecars(self, folder=None):
+        """
+        Adds the .data sidecars under a folder, the whole project by default.
+        Sidecars older than the record already in the index are skipped.
+        Returns the number of sidecars imported.
+        """
+        rows = []
+        for dirpath, dirnames, filenames in os.walk(folder or self.root):
+            if os.path.basename(dirpath) != '.data':
+                continue
+            sceneFolder = os.path.dirname(dirpath).replace('\\', '/')
+            for fileName in filenames:
+                # frame times are kept next to the images they were measured from
+                if not fileName.endswith('.json') or fileName.endswith('.times.json'):
+                    continue
+                sidecar = os.path.join(dirpath, fileName)
+                try:
+                    with open(sidecar) as f:
+                        data = json.load(f)
+                    modified = os.path.getmtime(sidecar)
+                except (OSError, ValueError):
+                    continue
+                if not isinstance(data, dict):
+                    continue
+                scene, _, name = fileName[:-len('.json')].partition('.')
+                if name:
+                    kind = LAYER
+                elif scene.endswith('_REF'):
+                    kind = PUBLISH
+                elif 'user' in data or 'note' in data:
+                    kind = SCENE
+                else:
+                    # submit window settings saved for the scene
+                    continue
+                key = self.key('%s/%s' % (sceneFolder, scene))
+                rows.append((key, kind, name, _folderOf(key), json.dumps(data, sort_keys=True), modified))
+
+        connection = self.connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany('INSERT INTO records (path, kind, name, folder, data, modified) '
+                                   'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (path, kind, name) DO UPDATE SET '
+                                   'data = excluded.data, modified = excluded.modified '
+                                   'WHERE excluded.modified > records.modified', rows)
+            connection.execute('COMMIT')
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+        return len(rows)
+
+
+def indexFor(folder):
+    """
+    Returns the MetadataIndex of the project a folder is in, found from the
+    .projectData folder above it, or None if it isn't in one.
+    """
+    folder = os.path.abspath(folder).replace('\\', '/')
+    with _indexLock:
+        if folder in _indexes:
+            return _indexes[folder]
+    index = None
+    parent = folder
+    while True:
+        if os.path.isdir('%s/.projectData' % parent):
+            with _indexLock:
+                index = _projects.setdefault(parent, MetadataIndex(parent))
+            break
+        parent, child = os.path.split(parent)
+        if not child:
+            break
+    with _indexLock:
+        _indexes[folder] = index
+    return index
+
+
+def writeMetadata(scenePath, prefData, kind=SCENE, name=''):
+    """
+    Saves metadata for a scene in its project's index, or in a sidecar if
+    the project has no index or it can't be written.
+    """
+    index = indexFor(os.path.dirname(scenePath))
+    if index is not None:
+        try:
+            index.update(scenePath, prefData, kind, name)
+            return
+        except sqlite3.Error as e:
+            print('could not write to the project index, saving a sidecar instead: %s' % e)
+    IO.writePrefsToFile(prefData, sidecarPath(scenePath, name))
+
+
+def writeRecords(folder, records):
+    """
+    Adds [(scenePath, kind, name, prefData)] to the index of the project a
+    folder is in, in one transaction. Returns False if there is no index or
+    it couldn't be written.
+    """
+    index = indexFor(folder)
+    if index is None:
+        return False
+    try:
+        index.updateMany(records)
+    except sqlite3.Error as e:
+        print('could not write to the project index: %s' % e)
+        return False
+    return True
+
+
+def readMetadata(scenePath, kind=SCENE, name=''):
+    """
+    Returns the metadata of a scene from its project's index, or from its
+    sidecar if it isn't in the index.
+    """
+    index = indexFor(os.path.dirname(scenePath))
+    if index is not None:
+        try:
+            record = index.get(scenePath, kind, name)
+            if record is not None:
+                return record
+        except sqlite3.Error as e:
+            print('could not read the project index: %s' % e)
+    return IO.loadDictionary(sidecarPath(scenePath, name))
+
+
+def readFolder(folder, scenePaths, kind=SCENE):
+    """
+    Returns {scene path: metadata} for scenes in the same folder with one
+    query. Only scenes missing from the index are read from their sidecars.
+    """
+    records = {}
+    index = indexFor(folder)
+    if index is not None:
+        try:
+            # scene names are matched without case like the index does
+            records = {name.lower(): record for name, record in index.folderRecords(folder, kind).items()}
+        except sqlite3.Error as e:
+            print('could not read the project index: %s' % e)
+    metadata = {}
+    for scenePath in scenePaths:
+        record = records.get(sceneKey(scenePath).rsplit('/', 1)[-1].lower())
+        metadata[scenePath] = record if record is not None else IO.loadDictionary(sidecarPath(scenePath))
+    return metadata
+
+
+def readLayers(scenePath, names):
+    """
+    Returns {name: metadata} of layers of a scene with one query. Layers
+    missing from the index are read from their sidecars, and are empty if
+    they haven't been submitted.
+    """
+    records = {}
+    index = indexFor(os.path.dirname(scenePath))
+    if index is not None:
+        try:
+            records = index.sceneRecords(scenePath, LAYER)
+        except sqlite3.Error as e:
+            print('could not read the project index: %s' % e)
+    return {name: records[name] if name in records else IO.loadDictionary(sidecarPath(scenePath, name))
+            for name in names}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lm_metadataIndex', description='Import .data sidecars into a project index.')
+    parser.add_argument('project', help='project root, the folder holding .projectData')
+    parser.add_argument('--folder', help='only import sidecars under this folder')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = MetadataIndex(args.project)
+    count = index.importSidecars(args.folder)
+    print('imported %s sidecars into %s (%s journal) in %.2fs'
+          % (count, index.path, index.journalMode, time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+import ast
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import baseIO.loadSave as IO
+
+# seconds before the cached pool list is refreshed from smedge
+POOL_TTL = 60 * 60
+# seconds to wait for PoolManager before giving up
+POOL_TIMEOUT = 30
+DEFAULT_CACHE = '%s/config/globalPrefs.json' % os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# when the pools were last fetched is kept in each user's own prefs, the shared prefs only change with the pools
+DEFAULT_CHECKED = '%s/localPrefs.json' % os.path.expanduser('~/maya/prefs')
+
+# a single thread so only one PoolManager call runs at a time
+_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def parsePools(value):
+    """
+    Returns the pool list stored in the prefs. Older prefs stored the list as a
+    quoted python string e.g. "'['a', 'b']'" so those are converted.
+    """
+    if isinstance(value, list):
+        return [str(p) for p in value]
+    if isinstance(value, str):
+        try:
+            pools = ast.literal_eval(value.strip()[1:-1])
+            if isinstance(pools, (list, tuple)):
+                return [str(p) for p in pools]
+        except (ValueError, SyntaxError):
+            pass
+    return []
+
+
+def poolManagerPath(submitExe):
+    """
+    Returns PoolManager next to the given Submit.exe.
+    """
+    folder = os.path.dirname(submitExe.strip('\'"'))
+    name = 'PoolManager.exe' if os.name == 'nt' else 'PoolManager'
+    return os.path.join(folder, name)
+
+
+class PoolRegistry():
+    """
+    The list of Smedge pools cached on disk. Reading the cache never calls
+    PoolManager, refresh() fetches the list on a background thread and
+    returns a future. The pools are shared by everyone using the toolbox
+    and only written when they change, the time they were last fetched is
+    written to checkedFile in the user's own prefs.
+    """
+
+    def __init__(self, submitExe, cacheFile=DEFAULT_CACHE, ttl=POOL_TTL, checkedFile=DEFAULT_CHECKED):
+        self.submitExe = submitExe
+        self.cacheFile = cacheFile
+        self.checkedFile = checkedFile
+        self.ttl = ttl
+        self.future = None
+
+    def cached(self):
+        """
+        Returns the cached pools and the time this user last fetched them.
+        """
+        pools = parsePools(IO.loadDictionary(self.cacheFile).get('pools', {}).get('value'))
+        checked = IO.loadDictionary(self.checkedFile).get('poolsChecked', {}).get('value', 0)
+        return pools, checked
+
+    def pools(self):
+        return self.cached()[0]
+
+    def isStale(self):
+        pools, updated = self.cached()
+        return not pools or time.time() - updated > self.ttl
+
+    def fetch(self):
+        """
+        Asks PoolManager for the pool names and saves them to the cache if
+        they changed.
+        """
+        si = None
+        if os.name == 'nt':
+            si = subprocess.STARTUPINFO()
+            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        output = subprocess.check_output([poolManagerPath(self.submitExe), 'list', 'NAME'], startupinfo=si,
+                                         text=True, timeout=POOL_TIMEOUT)
+        pools = [p.strip() for p in output.splitlines() if p.strip()]
+        if pools != self.pools():
+            IO.writePrefsToFile([['pools', 'value', pools]], self.cacheFile)
+        IO.writePrefsToFile([['poolsChecked', 'value', time.time()]], self.checkedFile)
+        return pools
+
+    def refresh(self, force=False):
+        """
+        Starts fetching the pools in the background if the cache is stale.
+        Returns the future of the running fetch, or None if the cache is
+        still fresh.
+        """
+        if self.future is not None and not self.future.done():
+            return self.future
+        if not force and not self.isStale():
+            return None
+        self.future = _executor.submit(self.fetch)
+        return self.future
@@ -0,0 +1,234 @@
+"""
+Watches the image folders of recently submitted layers and works out how far
+each render has got.
+
+Layers are found from the sidecars the submitter writes in .data. Folders
+are only listed again when their modification time changes and files already
+seen keep their cached times, so a poll where nothing was written costs one
+stat per folder. Other sidecars in .data are only read again once they
+change and finished layers are no longer polled.
+"""
+import copy
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+from pipelime.lm_frameScheduler import parseRange
+
+# seconds between polls
+POLL_SECONDS = 10
+# sidecars older than this are not watched
+WATCH_DAYS = 3
+# frames finished in this many seconds before the newest frame give the frames per hour
+RATE_WINDOW = 60 * 60
+_FRAME_FILE = re.compile(r'^(?P<prefix>.*?)(?P<frame>\d+)(?P<ext>\.[^.]+)$')
+
+
+@dataclass
+class LayerProgress:
+    sidecar: str
+    label: str
+    imagePath: str
+    prefix: str
+    ext: str
+    frames: set = field(default_factory=set)
+    done: int = 0
+    framesPerHour: float = 0.0
+    # seconds until the layer is finished, None until it can be estimated
+    eta: float = None
+    lastFrameTime: float = 0.0
+    # sidecar and folder modification times the progress was worked out from
+    sidecarTime: float = 0.0
+    folderTime: float = 0.0
+
+    @property
+    def total(self):
+        return len(self.frames)
+
+    @property
+    def finished(self):
+        return self.total > 0 and self.done >= self.total
+
+
+class FolderCache():
+    """
+    Folder listings kept between polls as {name: modification time}.
+    """
+
+    def __init__(self):
+        # folder: (folder mtime, {name: mtime})
+        self.folders = {}
+
+    def listing(self, folder):
+        """
+        Returns (folder mtime, {name: mtime}). Only folders that changed are
+        listed and only new files are stat'ed.
+        """
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            self.folders.pop(folder, None)
+            return 0.0, {}
+        cached = self.folders.get(folder)
+        if cached and cached[0] == mtime:
+            return cached
+        previous = cached[1] if cached else {}
+        names = {}
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.name in previous:
+                        names[entry.name] = previous[entry.name]
+                        continue
+                    try:
+                        names[entry.name] = entry.stat().st_mtime
+                    except OSError:
+                        pass
+        except OSError:
+            return 0.0, {}
+        self.folders[folder] = (mtime, names)
+        return self.folders[folder]
+
+
+def loadLayer(sidecar, sidecarTime):
+    """
+    Returns the LayerProgress of a submit sidecar, or None if it doesn't
+    describe a rendered sequence.
+    """
+    try:
+        with open(sidecar) as f:
+            data = json.load(f)
+        imagePath = data['img']['imgpath'].rstrip('/\\')
+        match = _FRAME_FILE.match(data['img']['imgname'])
+        frames = set(parseRange(data['job']['range']))
+    except (OSError, ValueError, KeyError):
+        return None
+    if not match:
+        return None
+    label = data['job'].get('spec', {}).get('label') \
+        or os.path.basename(sidecar).rsplit('.json', 1)[0]
+    return LayerProgress(sidecar, label, imagePath, match['prefix'], match['ext'], frames, sidecarTime=sidecarTime)
+
+
+def updateLayer(layer, folderTime, listing, now=None):
+    """
+    Counts the rendered frames of a layer and estimates when it will finish.
+    """
+    times = []
+    for name, mtime in listing.items():
+        match = _FRAME_FILE.match(name)
+        if match and match['prefix'] == layer.prefix and match['ext'] == layer.ext \
+                and int(match['frame']) in layer.frames:
+            times.append(mtime)
+    times.sort()
+    layer.folderTime = folderTime
+    layer.done = len(times)
+    layer.lastFrameTime = times[-1] if times else 0.0
+    recent = [t for t in times if t >= layer.lastFrameTime - RATE_WINDOW]
+    if len(recent) > 1 and recent[-1] > recent[0]:
+        layer.framesPerHour = (len(recent) - 1) / (recent[-1] - recent[0]) * 3600
+        layer.eta = (layer.total - layer.done) / layer.framesPerHour * 3600
+    else:
+        layer.framesPerHour = 0.0
+        layer.eta = None
+    if layer.finished:
+        layer.eta = 0.0
+    return layer
+
+
+class RenderWatcher():
+    """
+    Polls the layers submitted from some .data folders on a background
+    thread. Use snapshot() to read the progress from another thread.
+
+        watcher = RenderWatcher(['P:/project/scenes/sh010/.data'])
+        watcher.start()
+        for layer in watcher.snapshot():
+            print(layer.label, layer.done, layer.total)
+    """
+
+    def __init__(self, dataFolders, pollSeconds=POLL_SECONDS, days=WATCH_DAYS):
+        self.dataFolders = list(dataFolders)
+        self.pollSeconds = pollSeconds
+        self.days = days
+        self.cache = FolderCache()
+        # sidecar: LayerProgress
+        self.layers = {}
+        # sidecar: mtime of sidecars that aren't rendered layers, skipped until they change
+        self.rejected = {}
+        self.pollTime = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def addFolder(self, folder):
+        with self._lock:
+            if folder not in self.dataFolders:
+                self.dataFolders.append(folder)
+
+    def discover(self):
+        """
+        Adds sidecars written in the last few days and reloads resubmitted ones.
+        """
+        oldest = time.time() - self.days * 24 * 60 * 60
+        with self._lock:
+            dataFolders = list(self.dataFolders)
+        for folder in dataFolders:
+            _, names = self.cache.listing(folder)
+            for name, mtime in names.items():
+                if not name.endswith('.json') or name.endswith('.times.json') or mtime < oldest:
+                    continue
+                sidecar = f'{folder}/{name}'
+                layer = self.layers.get(sidecar)
+                if layer is not None and layer.sidecarTime == mtime or self.rejected.get(sidecar) == mtime:
+                    continue
+                layer = loadLayer(sidecar, mtime)
+                if layer is None:
+                    # scene notes, prefs and sidecars of other job types
+                    self.rejected[sidecar] = mtime
+                    continue
+                self.rejected.pop(sidecar, None)
+                with self._lock:
+                    self.layers[sidecar] = layer
+
+    def poll(self):
+        start = time.perf_counter()
+        self.discover()
+        for layer in list(self.layers.values()):
+            if layer.finished:
+                continue
+            folderTime, listing = self.cache.listing(layer.imagePath)
+            if folderTime == layer.folderTime and folderTime:
+                continue
+            with self._lock:
+                updateLayer(layer, folderTime, listing)
+        self.pollTime = time.perf_counter() - start
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print('render watcher failed to poll: %s' % e)
+            self._stop.wait(self.pollSeconds)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='renderWatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """
+        Returns copies of the layers sorted by label.
+        """
+        with self._lock:
+            layers = [copy.copy(layer) for layer in self.layers.values()]
+        return sorted(layers, key=lambda layer: layer.label)
@@ -0,0 +1,248 @@
+"""
+Finds missing, empty and truncated frames of rendered layers and resubmits
+only those frames.
+
+Each layer is checked from the sidecar the submitter writes in .data, or the
+same record in the project index, which holds the image folder, the
+submitted range and the job that rendered it.
+Every image folder is listed once and layers are checked at the same time.
+
+    python -m pipelime.lm_sequenceCheck P:/project/scenes/sh010/.data/sh010_v003.*.json --resubmit
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+
+from pipelime.lm_frameScheduler import formatRange, parseRange
+from pipelime.lm_jobSpec import JobSpec
+from pipelime.lm_submitUtil import submit_job
+
+# layers checked at the same time
+MAX_CHECKS = 8
+EXR_MAGIC = 20000630
+# bytes read at first to find the end of an exr header, most headers fit
+EXR_FIRST_READ = 4 * 1024
+# headers bigger than this only have their magic number checked
+EXR_HEADER_SIZE = 64 * 1024
+# scanlines per chunk for each exr compression
+EXR_LINES_PER_CHUNK = {0: 1, 1: 1, 2: 1, 3: 16, 4: 32, 5: 16, 6: 32, 7: 32, 8: 32, 9: 256}
+_FRAME_FILE = re.compile(r'^(?P<prefix>.*?)(?P<frame>\d+)(?P<ext>\.[^.]+)$')
+
+
+@dataclass
+class SequenceReport:
+    sidecar: str
+    label: str
+    frames: list = field(default_factory=list)
+    missing: list = field(default_factory=list)
+    empty: list = field(default_factory=list)
+    truncated: list = field(default_factory=list)
+    error: str = ''
+    # the job that rendered the layer
+    spec: dict = None
+
+    @property
+    def badFrames(self):
+        return sorted(set(self.missing + self.empty + self.truncated))
+
+    @property
+    def badRange(self):
+        return formatRange(self.badFrames)
+
+
+def _readExrHeader(data):
+    # returns ({attribute: (type, value bytes)}, header end) of a single part exr
+    attributes = {}
+    pos = 8
+    while True:
+        end = data.index(b'\0', pos)
+        name = data[pos:end]
+        pos = end + 1
+        if not name:
+            return attributes, pos
+        end = data.index(b'\0', pos)
+        attrType = data[pos:end]
+        size = struct.unpack_from('<i', data, end + 1)[0]
+        pos = end + 5
+        attributes[name.decode()] = (attrType, data[pos:pos + size])
+        pos += size
+
+
+def exrIsComplete(path, size):
+    """
+    Checks an exr was written to the end. The offset table of a scanline exr
+    is filled in when the file is closed, so an unfinished file has empty
+    offsets or a last chunk that runs past the end of the file. Tiled, deep
+    and multi-part files only have their magic number checked.
+
+    Only the first few KB are read unless the header or offset table is
+    bigger, so checking a long sequence over the network stays quick.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(EXR_FIRST_READ)
+            if len(data) < 8 or struct.unpack_from('<i', data)[0] != EXR_MAGIC:
+                return False
+            flags = struct.unpack_from('<i', data, 4)[0]
+            if flags & 0x1a00:
+                return True
+            while True:
+                try:
+                    attributes, headerEnd = _readExrHeader(data)
+                    break
+                except (ValueError, struct.error):
+                    # the header doesn't fit in what was read yet
+                    more = f.read(min(len(data), EXR_HEADER_SIZE - len(data)))
+                    if not more:
+                        # the file ends in the header, or the header is too big and the magic number has to do
+                        return len(data) >= EXR_HEADER_SIZE
+                    data += more
+            xMin, yMin, xMax, yMax = struct.unpack('<4i', attributes['dataWindow'][1])
+            compression = attributes['compression'][1][0]
+            linesPerChunk = EXR_LINES_PER_CHUNK.get(compression, 1)
+            chunks = (yMax - yMin + linesPerChunk) // linesPerChunk
+            # the offset table follows the header and is usually in what was already read
+            table = data[headerEnd:headerEnd + 8 * chunks]
+            if len(table) < 8 * chunks:
+                f.seek(headerEnd + len(table))
+                table += f.read(8 * chunks - len(table))
+            offsets = struct.unpack(f'<{chunks}Q', table)
+            last = max(offsets)
+            if min(offsets) == 0 or last + 8 > size:
+                return False
+            f.seek(last)
+            y, dataSize = struct.unpack('<2i', f.read(8))
+            return last + 8 + dataSize <= size
+    except (OSError, KeyError, ValueError, IndexError, struct.error):
+        return False
+
+
+def checkSequence(imagePath, imageName, frames):
+    """
+    Returns the missing, empty and truncated frames of a rendered sequence.
+    """
+    match = _FRAME_FILE.match(imageName)
+    missing, empty, truncated = [], [], []
+    if not match:
+        return list(frames), empty, truncated
+    found = {}
+    try:
+        with os.scandir(imagePath) as entries:
+            for entry in entries:
+                fileMatch = _FRAME_FILE.match(entry.name)
+                if fileMatch and fileMatch['prefix'] == match['prefix'] and fileMatch['ext'] == match['ext']:
+                    found[int(fileMatch['frame'])] = entry
+    except OSError:
+        return list(frames), empty, truncated
+
+    isExr = match['ext'].lower() == '.exr'
+    for frame in frames:
+        entry = found.get(frame)
+        if entry is None:
+            missing.append(frame)
+            continue
+        size = entry.stat().st_size
+        if size == 0:
+            empty.append(frame)
+        elif isExr and not exrIsComplete(entry.path, size):
+            truncated.append(frame)
+    return missing, empty, truncated
+
+
+def checkRecord(sidecar, data):
+    """
+    Checks the frames of a layer from what was saved in its sidecar.
+    """
+    label = os.path.basename(sidecar).rsplit('.json', 1)[0]
+    try:
+        imagePath = data['img']['imgpath']
+        imageName = data['img']['imgname']
+        frames = parseRange(data['job']['range'])
+        spec = data['job'].get('spec')
+        label = (spec or {}).get('label') or label
+    except (ValueError, KeyError, TypeError) as e:
+        return SequenceReport(sidecar, label, error=f'can\'t read sidecar: {e}')
+    missing, empty, truncated = checkSequence(imagePath, imageName, frames)
+    return SequenceReport(sidecar, label, frames, missing, empty, truncated, spec=spec)
+
+
+def checkLayer(sidecar):
+    """
+    Checks the frames of the layer a sidecar was written for.
+    """
+    try:
+        with open(sidecar) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        label = os.path.basename(sidecar).rsplit('.json', 1)[0]
+        return SequenceReport(sidecar, label, error=f'can\'t read sidecar: {e}')
+    return checkRecord(sidecar, data)
+
+
+def checkLayers(sidecars, maxWorkers=MAX_CHECKS):
+    with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+        return list(pool.map(checkLayer, sidecars))
+
+
+def checkRecords(records, maxWorkers=MAX_CHECKS):
+    """
+    Checks {sidecar: data} of layers already read, like the project index
+    records of a scene.
+    """
+    with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+        return list(pool.map(checkRecord, records, records.values()))
+
+
+def resubmitJob(report):
+    """
+    Returns the job that rendered a layer with its range set to the bad
+    frames, or None if there is nothing to resubmit.
+    """
+    if not report.badFrames or not report.spec:
+        return None
+    job = JobSpec(**report.spec)
+    options = dict(job.options)
+    options['-Range'] = report.badRange
+    options['-Name'] = '%s (frames)' % options.get('-Name', report.label)
+    return replace(job, options=options)
+
+
+def formatReports(reports):
+    lines = []
+    for r in reports:
+        if r.error:
+            lines.append(f'{r.label}: {r.error}')
+        elif r.badFrames:
+            lines.append(f'{r.label}: {len(r.badFrames)} of {len(r.frames)} frames bad ({r.badRange}) - '
+                         f'{len(r.missing)} missing, {len(r.empty)} empty, {len(r.truncated)} truncated')
+        else:
+            lines.append(f'{r.label}: all {len(r.frames)} frames ok')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lm_sequenceCheck', description='Check rendered frames.')
+    parser.add_argument('sidecars', nargs='+', help='layer sidecars in the scene .data folder')
+    parser.add_argument('--resubmit', action='store_true', help='resubmit the bad frames')
+    args = parser.parse_args(argv)
+
+    sidecars = sorted({s for pattern in args.sidecars for s in glob.glob(pattern)
+                       if not s.endswith('.times.json')})
+    reports = checkLayers(sidecars)
+    print(formatReports(reports))
+    if args.resubmit:
+        for r in reports:
+            job = resubmitJob(r)
+            if job is None:
+                continue
+            print(f'resubmitted {r.label} frames {r.badRange}: {submit_job(job.toCommand())}')
+    return 1 if [r for r in reports if r.badFrames or r.error] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""
+Times sending render jobs to a stand-in for Smedge's Submit.exe, to compare
+the old serial submission, which sent every job paused and then again to
+unpause it, with the jobs sent once from a pool of threads.
+
+The stand-in waits as long as Submit.exe takes to reach the master and
+prints a job ID, so no jobs reach the farm.
+
+    python -m pipelime.lm_submitBenchmark --jobs 120 --latency 0.5 --workers 1 4 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import shlex
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+from pipelime.lm_jobGraph import MAX_SUBMISSIONS, JobGraph
+from pipelime.lm_jobSpec import LayerSettings, SceneInfo, SubmitSettings, renderJob
+from pipelime.lm_submitUtil import submit_job
+
+# seconds Submit.exe takes for a job, about what it takes on the studio network
+LATENCY = 0.5
+_STUB = """import sys, time, uuid
+time.sleep(%r)
+print('Submitted job %%s' %% uuid.uuid4())
+"""
+
+
+def writeStub(folder, latency=LATENCY):
+    """
+    Writes the stand-in Submit.exe to a folder and returns its path.
+    """
+    script = os.path.join(folder, 'Submit.py')
+    with open(script, 'w') as f:
+        f.write(_STUB % latency)
+    if os.name == 'nt':
+        path = os.path.join(folder, 'Submit.bat')
+        with open(path, 'w') as f:
+            f.write('@"%s" "%s" %%*\n' % (sys.executable, script))
+    else:
+        path = os.path.join(folder, 'Submit')
+        with open(path, 'w') as f:
+            f.write('#!%s\n' % sys.executable)
+            with open(script) as s:
+                f.write(s.read())
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+def runCommand(command):
+    # submit_job hands the command line to CreateProcess, elsewhere it needs splitting
+    if os.name == 'nt':
+        return submit_job(command)
+    output = subprocess.check_output(shlex.split(command), text=True)
+    return output.rsplit(' ', 1)[-1].strip()
+
+
+def benchmarkJobs(submitExe, count):
+    """Returns a JobGraph of count render layers submitted with submitExe."""
+    scene = SceneInfo('P:/project/scenes/sh010/sh010_v003.mb', 'P:/project/', 'sh010_v003')
+    settings = SubmitSettings(submitExe, 'C:/Program Files/Autodesk/Maya2022/bin/Render.exe')
+    graph = JobGraph()
+    for i in range(count):
+        layer = LayerSettings('layer%03d' % i, 'shotCam', 'layer%03d shotCam' % i, range='1-100')
+        graph.add(layer.label, renderJob(scene, settings, layer))
+    return graph
+
+
+def timeSerialTwoPasses(graph, submit=runCommand):
+    # how submitButton used to submit, one job after another paused and then again to unpause it
+    start = time.perf_counter()
+    jobIDs = {name: submit(graph.command(name, {})) for name in graph.order()}
+    for name, jobID in jobIDs.items():
+        submit('%s -ID %s' % (graph.command(name, {}), jobID))
+    return time.perf_counter() - start
+
+
+def timeGraph(graph, workers, submit=runCommand):
+    start = time.perf_counter()
+    jobIDs = graph.submit(workers, submit)
+    seconds = time.perf_counter() - start
+    if not all(jobIDs.values()):
+        raise RuntimeError('%s jobs failed to submit' % len([j for j in jobIDs.values() if not j]))
+    return seconds
+
+
+def benchmarkSubmission(jobs=30, workers=None, latency=LATENCY):
+    """
+    Returns {'serial two passes': seconds, workers: seconds} to send jobs
+    to the stand-in, serially in two passes and once per job from each
+    number of threads.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        graph = benchmarkJobs(writeStub(folder, latency), jobs)
+        # the graph prints every command it sends
+        with contextlib.redirect_stdout(io.StringIO()):
+            results['serial two passes'] = timeSerialTwoPasses(graph)
+            for count in workers or [1, MAX_SUBMISSIONS]:
+                results[count] = timeGraph(graph, count)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lm_submitBenchmark',
+                                     description='Time farm submission against a stand-in Submit.exe.')
+    parser.add_argument('--jobs', type=int, default=30, help='render layers to submit')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, MAX_SUBMISSIONS],
+                        help='numbers of jobs sent at the same time to compare')
+    parser.add_argument('--latency', type=float, default=LATENCY, help='seconds the stand-in takes per job')
+    args = parser.parse_args(argv)
+
+    results = benchmarkSubmission(args.jobs, args.workers, args.latency)
+    serial = results['serial two passes']
+    for mode, seconds in results.items():
+        label = mode if isinstance(mode, str) else '%s at a time' % mode
+        print('%s: %.2fs for %s jobs, %.1f jobs/s (%.1fx)' % (label, seconds, args.jobs, args.jobs / seconds,
+                                                              serial / seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,3 +1,7 @@
+import os
+import subprocess
+
+
 def build_submit(smedge_submit=None, script=True, *args, **kwargs) -> str:
     """
     Creates a submission command from all the given input values. Keys are case-sensitive so
@@ -51,3 +55,18 @@ def build_submit(smedge_submit=None, script=True, *args, **kwargs) -> str:
             continue
         _construct += _input(name, val)
     return _construct
+
+
+def submit_job(command: str) -> str:
+    """
+    Runs a submission command without opening a console window and returns the
+    job ID that Smedge printed.
+
+    :command:   :str:   Command created by build_submit.
+    """
+    si = None
+    if os.name == 'nt':
+        si = subprocess.STARTUPINFO()
+        si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    send = subprocess.check_output(command, startupinfo=si, text=True)
+    return send.rsplit(' ', 1)[-1].strip()
@@ -0,0 +1,106 @@
+import os
+import time
+
+from PySide2 import QtCore
+from PySide2 import QtWidgets
+
+import baseIO.getProj as getProj
+import baseIO.qtBase as qtBase
+import pipelime.lm_renderProgress as renderProgress
+
+# milliseconds between updates of the panel
+REFRESH_INTERVAL = 2000
+
+watcher = None
+refreshTimer = None
+# sidecar: [QTreeWidgetItem, QProgressBar]
+layerItems = {}
+
+
+def formatDuration(seconds):
+    if seconds is None:
+        return '-'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '%sh %02dm' % (hours, minutes)
+    return '%sm %02ds' % (minutes, seconds)
+
+
+def updatePanel():
+    """
+    Shows the latest progress of the watcher. Runs on Maya's main thread, the
+    folders are read by the watcher's own thread.
+    """
+    global rw_window
+    tree = rw_window.mainWidget.treeWidget_layers
+    tree.setSortingEnabled(False)
+    now = time.time()
+    for layer in watcher.snapshot():
+        if layer.sidecar not in layerItems:
+            item = QtWidgets.QTreeWidgetItem(tree)
+            item.setToolTip(0, layer.imagePath)
+            progressBar = QtWidgets.QProgressBar()
+            tree.setItemWidget(item, 1, progressBar)
+            layerItems[layer.sidecar] = [item, progressBar]
+        item, progressBar = layerItems[layer.sidecar]
+        item.setText(0, layer.label)
+        progressBar.setMaximum(max(layer.total, 1))
+        progressBar.setValue(layer.done)
+        item.setText(2, '%s / %s' % (layer.done, layer.total))
+        item.setText(3, '%.1f' % layer.framesPerHour if layer.framesPerHour else '-')
+        item.setText(4, 'done' if layer.finished else formatDuration(layer.eta))
+        item.setText(5, '%s ago' % formatDuration(now - layer.lastFrameTime) if layer.lastFrameTime else '-')
+    tree.setSortingEnabled(True)
+    rw_window.mainWidget.label_status.setText('Watching %s layers, last check took %.0fms'
+                                              % (len(layerItems), watcher.pollTime * 1000))
+
+
+def addFolder():
+    global rw_window
+    folder = QtWidgets.QFileDialog.getExistingDirectory(rw_window, 'Scene Folder', getProj.sceneFolder())
+    if not folder:
+        return
+    if os.path.basename(folder) != '.data':
+        folder = '%s/.data' % folder
+    watcher.addFolder(folder.replace('\\', '/'))
+
+
+def stopWatcher():
+    global watcher
+    global refreshTimer
+    if refreshTimer is not None:
+        refreshTimer.stop()
+    if watcher is not None:
+        watcher.stop()
+
+
+def openWatcherWindow(dataFolders=None):
+    """
+    Opens a dockable panel showing the progress of the layers submitted from
+    the open scene's folder.
+    """
+    global rw_window
+    global watcher
+    global refreshTimer
+
+    stopWatcher()
+    layerItems.clear()
+    if not dataFolders:
+        dataFolders = ['%s/.data' % getProj.sceneFolder()]
+
+    rw_window = qtBase.BaseWindow(qtBase.GetMayaWindow(), 'renderWatcher.ui')
+    rw_window._windowTitle = 'Render Watcher'
+    rw_window._windowName = 'RenderWatcher'
+    rw_window.pathModify = 'pipelime/'
+    rw_window.BuildUI()
+    rw_window.show(dockable=True)
+    rw_window.mainWidget.pushButton_addFolder.clicked.connect(addFolder)
+    rw_window.mainWidget.destroyed.connect(stopWatcher)
+
+    watcher = renderProgress.RenderWatcher(dataFolders)
+    watcher.start()
+    refreshTimer = QtCore.QTimer()
+    refreshTimer.timeout.connect(updatePanel)
+    refreshTimer.start(REFRESH_INTERVAL)
+    return rw_window
@@ -1,25 +1,26 @@
 import os
 import maya.cmds as cmds
-import subprocess
-from textwrap import dedent
+
+from pipelime.lm_jobGraph import JobGraph
+from pipelime.lm_jobSpec import JobSpec
 
 
 def _maya_batch_exe() -> str:
     """Returns the location of the maya batch executable"""
-    return f'{os.getenv("MAYA_LOCATION")}\\bin\\mayabtach.exe'
+    return f'{os.getenv("MAYA_LOCATION")}\\bin\\mayabatch.exe'
+
+
+def _bifrost_command(scene: str, sim: bool, foam: bool, mesh: bool) -> str:
+    return f'-Command "{_maya_batch_exe()}" "{scene}" "-command" ' \
+           f'"MeshBifrost($(SubRange.Start),$(SubRange.End),{int(sim)},{int(foam)},{int(mesh)})"'
 
 
 def submitToSmedge(packetSize: int, priority: int, sim: bool, foam: bool, mesh: bool):
     # Query values from UI
 
     submit = 'C:/Program Files/Smedge/Submit.exe'
-    working_dir = submit.rsplit('/', 1)[0]
-
-    # set the working dir and PATH to the directory
-    os.chdir(working_dir)
-    os.putenv("PATH", working_dir)
-    # now set submit to just the basename of the executable
-    submit = submit.rsplit('/', 1)[1]
+    # the mesh job starts on each frame as soon as the sim has finished it
+    graph = JobGraph()
 
     # get start and end frames from timeline
     startFrameFloat = cmds.playbackOptions(q=True, minTime=True)
@@ -31,8 +32,6 @@ def submitToSmedge(packetSize: int, priority: int, sim: bool, foam: bool, mesh:
     filename: str = cmds.file(q=True, sn=True)
     shortname: str = cmds.file(q=True, sn=True, shn=True)
     smedgeName: str = f'bifrost: {shortname.split(".")[0]}'
-    extra: str = ''
-    jobID: str = ''
     bifrostLiquidContainer = ''  # TODO get the bifrost container to set it's attributes
 
     # mesh cache
@@ -43,7 +42,6 @@ def submitToSmedge(packetSize: int, priority: int, sim: bool, foam: bool, mesh:
 
     # check what to do
     if sim:
-        extra = '-UsageLimit 1 -DistributeMode \"Forward\"'
         # clear cache inputs
         if mesh == 1:
             # liquid cache
@@ -66,54 +64,46 @@ def submitToSmedge(packetSize: int, priority: int, sim: bool, foam: bool, mesh:
         # save file
         cmds.file(rename='%s.sim' % (filename.rsplit('.', 1)[0]))
         cmds.file(save=True)
-        # submit string
-
-        cmd = dedent(f'''
-        {submit} Script
-        -Type "Generic Script"
-        -Name "{smedgeName} - SIM"
-        -Priority {priority} {extra}
-        -Pool "Redshift"
-        -ErrorStarts "Failed"
-        -Range "{startFrame}-{endFrame}"
-        -PacketSize {packetSize}
-        -Command "{_maya_batch_exe()}" "{filename.split('.', 1)[0]}"
-        "-command" "MeshBifrost($(SubRange.Start),$(SubRange.End),{int(sim)},{int(foam)},{int(mesh)})"
-        ''').replace('\n', ' ')
-
-        print(cmd)
-        # do it
-        jobID = subprocess.check_output(cmd, stdin=None, stderr=None, shell=False)
-        print(str(jobID).split(' ')[-1])
+
+        graph.add('sim', JobSpec(submit, {
+            '-Type': 'Generic Script',
+            '-Name': f'{smedgeName} - SIM',
+            '-Priority': priority,
+            '-UsageLimit': 1,
+            '-DistributeMode': 'Forward',
+            '-Pool': 'Redshift',
+            '-ErrorStarts': 'Failed',
+            '-Range': f'{startFrame}-{endFrame}',
+            '-PacketSize': packetSize,
+            '_Command': _bifrost_command(filename.split('.', 1)[0], sim, foam, mesh)
+        }, 'SIM'))
 
     if mesh:
-        extra = f'-WaitForJobID {jobID.split(" ")[-1]} -WaitForWholeJob 0'
         if sim == 1:
             print('wait for sim to finish')
-            # extra = 'wait for sim to finish'
         cmds.file(rename=f'{filename.rsplit(".", 1)[0]}.mesh')
         cmds.file(save=True)
-        # submit string
-        cmd = dedent(f'''
-        {submit} Script
-        -type "Generic Script"
-        -Paused
-        -Name "{smedgeName} - MESH"
-        -Priority {priority} {extra}
-        -Pool "Redshift"
-        -ErrorStarts "Failed"
-        -Range "{startFrame}-{endFrame}"
-        -Command "{_maya_batch_exe()}" "{filename.rsplit('.', 1)[0]}"
-        "-command" "MeshBifrost($(SubRange.Start),$(SubRange.End),{int(sim)},{int(foam)},{int(mesh)})"
-        ''').replace('\n', ' ')
-
-        print(cmd)
-        # do it
-        result = subprocess.check_output(cmd, stdin=None, stderr=None, shell=False)
+
+        graph.add('mesh', JobSpec(submit, {
+            '-Type': 'Generic Script',
+            '_Paused': '-Paused',
+            '-Name': f'{smedgeName} - MESH',
+            '-Priority': priority,
+            '-Pool': 'Redshift',
+            '-ErrorStarts': 'Failed',
+            '-Range': f'{startFrame}-{endFrame}',
+            '_Command': _bifrost_command(filename.rsplit('.', 1)[0], sim, foam, mesh)
+        }, 'MESH'), after=['sim'] if sim else None, wholeJob=False)
+
+    # do it
+    jobIDs = graph.submit()
+    print(jobIDs)
 
     # set filename back
     cmds.file(rename=filename)
     cmds.file(save=True)
+    return jobIDs
 
 
-submitToSmedge(4, 100, True, False, True)
+if __name__ == '__main__':
+    submitToSmedge(4, 100, True, False, True)
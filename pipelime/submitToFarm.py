@@ -1,8 +1,10 @@
 import os
-import subprocess
+import time
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
 
 import maya.cmds as cmds
+from PySide2 import QtCore
 from PySide2 import QtGui
 from PySide2 import QtWidgets
 
@@ -10,130 +12,216 @@ import baseIO.getProj as getProj
 import baseIO.loadSave as IO
 import baseIO.qtBase as qtBase
 import baseIO.sceneVar as sceneVar
+import pipelime.lm_dependencyScan as dependencyScan
+import pipelime.lm_frameScheduler as frameScheduler
+import pipelime.lm_jobGraph as jobGraph
+import pipelime.lm_jobSpec as jobSpec
+import pipelime.lm_layerStore as layerStore
+import pipelime.lm_layerTable as layerTable
+import pipelime.lm_metadataIndex as metadataIndex
+import pipelime.lm_sequenceCheck as sequenceCheck
+import pipelime.lm_poolRegistry as smedgePools
+from pipelime.lm_submitUtil import submit_job
+
+# the running submission, kept so it isn't garbage collected while in progress
+activeSubmission = None
+# cache jobs submitted this session {scenePath: {cache node: jobID}}, renders of the layers using them wait for them
+cacheJobs = {}
+# smedge pools cached on disk and the timer waiting for them to refresh
+poolRegistry = smedgePools.PoolRegistry('')
+poolTimer = None
+# layers shown in the submit window and the priority slider value they were last moved from
+layerModel = None
+previousPriority = 0
+# thread reading the frame times of earlier renders and the timer waiting for them
+historyPool = ThreadPoolExecutor(max_workers=1)
+suggestionTimer = None
+
+
+def applySavedSettings(layer, saved):
+    """
+    Sets a layer's settings from the values saved on its render layer node.
+    The job type always comes from the window.
+    """
+    for field, value in saved.items():
+        if field == 'jobType' or field not in layerStore.SETTINGS:
+            continue
+        try:
+            setattr(layer, field, type(getattr(layer, field))(value))
+        except ValueError:
+            pass
+
+
+def setLayers(layers, cameras):
+    """
+    Shows a row for each layer and camera, starting from the global controls
+    and the values saved on the layer.
+    """
+    global stf_window
+    global previousPriority
+    mainWidget = stf_window.mainWidget
+    previousPriority = mainWidget.prioritySlider.value()
+    rows = []
+    # [row, LayerSettings, packet size] of the rows waiting for a suggested packet size
+    suggestions = []
+    for l in layers:
+        # everything saved on the layer is read in one go
+        saved = layerStore.readSettings(l[0])
+        for c in cameras:
+            layerName = l[0]
+            if len(cameras) > 1:
+                layerName = '%s - %s' % (l[0], c.split('|')[-2])
+            layer = jobSpec.LayerSettings(
+                layer=l[0],
+                camera=c.split('|')[-1],
+                label=layerName,
+                jobType=mainWidget.comboBox_jobType.currentText(),
+                priority=mainWidget.prioritySlider.value(),
+                packetSize=mainWidget.spinBox_packetSize.value(),
+                pool=mainWidget.comboBox_pool.currentText(),
+                range=mainWidget.lineEdit_range.text(),
+                enabled=bool(l[1])
+            )
+            applySavedSettings(layer, saved)
+            # suggest a packet size from earlier renders unless one was saved on the layer
+            if 'packetSize' not in saved:
+                suggestions.append([len(rows), layer, layer.packetSize])
+            rows.append(layer)
+    layerModel.setLayers(rows)
+    suggestPacketSizes(suggestions)
+
+
+def shiftPriority(value):
+    global previousPriority
+    layerModel.shiftPriority(value - previousPriority)
+    previousPriority = value
+
+
+def layerHistories(sceneFolder, sceneName, layers):
+    # runs on the history thread, it reads sidecars and image folders on the server
+    return [frameScheduler.layerHistory(sceneFolder, sceneName, l.layer, l.camera) for l in layers]
+
+
+def suggestPacketSizes(suggestions):
+    """
+    Reads the frame times of earlier renders in the background and suggests
+    packet sizes once they arrive, so opening the window doesn't wait on
+    the server. Suggestions still on their way for older rows are dropped.
+    """
+    global suggestionTimer
+    if suggestionTimer is not None:
+        suggestionTimer.stop()
+        suggestionTimer = None
+    if not suggestions:
+        return
+    future = historyPool.submit(layerHistories, getProj.sceneFolder(), getProj.sceneName(),
+                                [layer for row, layer, packetSize in suggestions])
+    suggestionTimer = QtCore.QTimer()
+    suggestionTimer.timeout.connect(lambda: pollSuggestions(future, suggestions))
+    suggestionTimer.start(200)
 
 
-class LayerWidget(qtBase.BaseWidget):
-    layerWidgets = []
-    previousValue = ''
-
-    def __init__(self, layers, cameras, parentWindow):
-        self.uiFile = 'submitToFarmWidget.ui'
-        self.pathModify = 'pipelime/'
-        self.parent = parentWindow.mainWidget.verticalLayout_3
-        self.previousValue = parentWindow.mainWidget.prioritySlider.value()
-
-        for l in layers:
-            for c in cameras:
-                self.BuildUI()
-                layerName = l[0]
-                if len(cameras) > 1:
-                    layerName = '%s - %s' % (l[0], c.split('|')[-2])
-                self.aWidget.renderLayerName = l[0]
-                self.aWidget.camName = c.split('|')[-1]
-                self.aWidget.checkBox_layerEnable.setText(layerName)
-                self.aWidget.checkBox_layerEnable.setChecked(l[1])
-                self.layerWidgets.append(self.aWidget)
-                # set attributes from global controls
-                self.aWidget.spinBox_layerPacketSize.setValue(parentWindow.mainWidget.spinBox_packetSize.value())
-                # set pools from global pools
-                allPools = [parentWindow.mainWidget.comboBox_pool.itemText(i) for i in
-                            range(parentWindow.mainWidget.comboBox_pool.count())]
-                self.aWidget.comboBox_layerPool.clear()
-                self.aWidget.comboBox_layerPool.addItems(allPools)
-                self.aWidget.comboBox_layerPool.setCurrentText(parentWindow.mainWidget.comboBox_pool.currentText())
-                self.aWidget.lineEdit_layerRange.setText(parentWindow.mainWidget.lineEdit_range.text())
-                self.aWidget.layerPrioritySlider.setValue(parentWindow.mainWidget.prioritySlider.value())
-
-                # read attributes from layer
-                widgets = self.aWidget.findChildren(QtWidgets.QWidget)
-                for w in widgets:
-                    try:
-                        if w.parent() == self.aWidget:
-                            value = cmds.getAttr('%s.%s' % (l[0], w.objectName()))
-                            type = w.metaObject().className()
-                            if type == 'QLineEdit':
-                                w.setText(value)
-                            if type == 'QComboBox':
-                                w.setCurrentText(value)
-                            if type == 'QSpinBox':
-                                w.setValue(int(value))
-                    except:
-                        pass
-
-        jobTypeText = parentWindow.mainWidget.comboBox_jobType.currentText()
-        self.jobType(jobTypeText)
-
-        # connect main controls to layer controls
-        parentWindow.mainWidget.comboBox_jobType.currentTextChanged.connect(self.jobType)
-        parentWindow.mainWidget.prioritySlider.valueChanged.connect(self.slide01)
-        parentWindow.mainWidget.spinBox_packetSize.valueChanged.connect(self.packetSize)
-        parentWindow.mainWidget.comboBox_pool.currentTextChanged.connect(self.pool)
-        parentWindow.mainWidget.lineEdit_range.textChanged.connect(self.range)
-        parentWindow.mainWidget.checkBox_enable.stateChanged.connect(self.enabled)
-        height = 50 * (len(layers) * len(cameras))
-        parentWindow.mainWidget.scrollAreaWidgetContents.setMaximumHeight(height)
-        parentWindow.mainWidget.scrollAreaWidgetContents.setMinimumHeight(height)
-
-    # widget functions
-    def jobType(self, value):
-        for layer in self.layerWidgets:
-            layer.comboBox_jobType.setCurrentText(value)
-            # add text if it doesn't exist in the layer combobox
-            if layer.comboBox_jobType.currentText() != value:
-                layer.comboBox_jobType.addItem(value)
-                layer.comboBox_jobType.setCurrentText(value)
-                layer.comboBox_jobType.setEnabled(False)
-
-    def slide01(self, value):
-        difference = self.previousValue - value
-        for layer in self.layerWidgets:
-            layer.layerPrioritySlider.setValue(layer.layerPrioritySlider.value() - difference)
-        self.previousValue = value
-
-    def packetSize(self, value):
-        for layer in self.layerWidgets:
-            layer.spinBox_layerPacketSize.setValue(value)
-
-    def pool(self, value):
-        for layer in self.layerWidgets:
-            layer.comboBox_layerPool.setCurrentText(value)
-
-    def range(self, value):
-        for layer in self.layerWidgets:
-            layer.lineEdit_layerRange.setText(value)
-
-    def enabled(self, value):
-        for layer in self.layerWidgets:
-            layer.checkBox_layerEnable.setChecked(value)
+def pollSuggestions(future, suggestions):
+    global suggestionTimer
+    if not future.done():
+        return
+    suggestionTimer.stop()
+    try:
+        histories = future.result()
+    except Exception as e:
+        print('could not read the frame times of earlier renders: %s' % e)
+        return
+    try:
+        for (row, layer, packetSize), frameTimes in zip(suggestions, histories):
+            # skip rows that were replaced or given a packet size while the times were read
+            if row >= len(layerModel.layers) or layerModel.layers[row] is not layer or layer.packetSize != packetSize:
+                continue
+            toolTip = suggestPacketSize(layer, frameTimes)
+            if toolTip:
+                layerModel.setToolTip(row, layerTable.PACKET_SIZE, toolTip)
+    except RuntimeError:
+        # window was closed before the times arrived
+        pass
+
+
+def suggestPacketSize(layer, frameTimes):
+    """
+    Sets the packet size of a layer so packets take about the same time, using
+    the frame times recorded from its earlier renders. Returns a tool tip
+    saying where the size came from, or None if there's nothing to go on.
+    """
+    if not frameTimes:
+        return None
+    try:
+        frames = frameScheduler.parseRange(layer.range)
+    except ValueError:
+        return None
+    costs = frameScheduler.estimateCosts(frames, frameTimes)
+    layer.packetSize = frameScheduler.suggestPacketSize(frames, costs)
+    return 'Suggested from %s rendered frames, about %.0fs per frame' \
+        % (len(frameTimes), sum(costs.values()) / max(len(costs), 1))
 
 
 def listCameras():
     # list renderable cameras
-    cameraSel = cmds.ls(type=('camera'), l=True)
-    renderableCameras = []
-    for cam in cameraSel:
-        if cmds.getAttr("%s.renderable" % cam) == 1:
-            renderableCameras.append(cam)
-    return renderableCameras
+    return sceneVar.getRenderableCameras()
 
 
-def fetchPools():
+def setPools(pools):
+    """
+    Replaces the pools of the window and the pools the layers can pick from,
+    keeping the pools that are selected.
+    """
     global stf_window
-    # use submit path to get poolManager
-    submitPath = stf_window.mainWidget.lineEdit_submitExe.text()
-    updatePools = submitPath.replace('submit.exe', 'PoolManager list NAME')
-    si = subprocess.STARTUPINFO()
-    si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-    upd: str = subprocess.check_output(updatePools, startupinfo=si)
-    pools = (upd.replace('\r', '')).split('\n')
-    pools = filter(None, pools)
-    prefData = []
-    prefData.append(['pools', 'value', '\'%s\'' % pools])
-    IO.writePrefsToFile(prefData, '%s/config/globalPrefs.json' % qtBase.self_path())
-    stf_window.mainWidget.comboBox_pool.addItems(pools)
-    for l in layerWidget.layerWidgets:
-        l.comboBox_layerPool.addItems(pools)
-    # return pools
+    comboBox = stf_window.mainWidget.comboBox_pool
+    current = comboBox.currentText()
+    # don't let the global pool overwrite the layer pools while updating
+    comboBox.blockSignals(True)
+    comboBox.clear()
+    comboBox.addItems(pools)
+    if current and current not in pools:
+        comboBox.addItem(current)
+    comboBox.setCurrentText(current)
+    comboBox.blockSignals(False)
+    layerModel.setPools(pools)
+
+
+def pollPools(future):
+    global poolTimer
+    if not future.done():
+        return
+    poolTimer.stop()
+    try:
+        setPools(future.result())
+    except RuntimeError:
+        # window was closed before the pools arrived
+        pass
+    except Exception as e:
+        print('could not fetch pools from smedge: %s' % e)
+
+
+def refreshPools(force=False):
+    """
+    Fetches the pools from smedge in the background if the cached pools are
+    out of date, or always if force is True. The window is updated when
+    they arrive.
+    """
+    global stf_window
+    global poolRegistry
+    global poolTimer
+    poolRegistry.submitExe = stf_window.mainWidget.lineEdit_submitExe.text()
+    future = poolRegistry.refresh(force)
+    if future is None:
+        return
+    if poolTimer is not None:
+        poolTimer.stop()
+    poolTimer = QtCore.QTimer()
+    poolTimer.timeout.connect(lambda: pollPools(future))
+    poolTimer.start(200)
+
+
+def fetchPools():
+    refreshPools(force=True)
 
 
 def openSceneFolder():
@@ -183,13 +271,12 @@ def fileDict():
     IO.writePrefsToFile(prefData, '%s/.data/%s.json' % (getProj.sceneFolder(), versionlessSceneName))
 
 
-def layerDict(l):
+def layerDict(l, job):
     global stf_window
-    # niceLayerName = l.checkBox_layerEnable.text().replace(':','_')
-    niceLayerName = '%s.%s' % (l.renderLayerName, l.camName.replace(':', '_'))
+    niceLayerName = '%s.%s' % (l.layer, l.camera.replace(':', '_'))
     prefData = []
     # get image path for the render layer
-    rendeFilePath = cmds.renderSettings(fin=True, fp=True, cts=True, lyr=l.renderLayerName)
+    rendeFilePath = cmds.renderSettings(fin=True, fp=True, cts=True, lyr=l.layer)
     path = rendeFilePath[0].rsplit('/', 1)[0]
     filename = rendeFilePath[0].split('/')[-1]
 
@@ -199,8 +286,15 @@ def layerDict(l):
     prefData.append(['user', 'trelloAddress', 'name'])
     prefData.append(['user', 'name', stf_window.mainWidget.lineEdit_name.text()])
     prefData.append(['user', 'slackID', stf_window.mainWidget.lineEdit_slack.text()])
+    # used to measure frame times once the layer has rendered
+    prefData.append(['job', 'range', job.options['-Range']])
+    prefData.append(['job', 'packetSize', l.packetSize])
+    # used to resubmit frames that didn't render
+    prefData.append(['job', 'spec', job.toDict()])
 
+    # the sidecar is what the render watcher reads, and what frame checks fall back to without an index
     IO.writePrefsToFile(prefData, '%s/.data/%s.%s.json' % (getProj.sceneFolder(), getProj.sceneName(), niceLayerName))
+    return [getProj.filepath(), metadataIndex.LAYER, niceLayerName, prefData]
 
 
 # button functions
@@ -216,234 +310,220 @@ def selectRenderExe():
     stf_window.mainWidget.lineEdit_render.setText(filename[0])
 
 
-def bifrostCacheString(l):
-    global stf_window
-    # yeti cache string
-    renderLayerName = l.renderLayerName.replace(':', '_')
-    filename = '%s/%s_%s' % (getProj.sceneName(), getProj.sceneName(), renderLayerName)
-
-    pbString = ''
-    pbString += f'{stf_window.mainWidget.lineEdit_submitExe.text()} Script '
-    pbString += ' -Type Generic Script'
-    pbString += f' -Name maya: {getProj.sceneName()} ({l.checkBox_layerEnable.text()})'
-    pbString += ' -UsageLimit 1'
-    pbString += ' -DistributeMode \"Forward\"'
-    pbString += f' -Priority {l.layerPrioritySlider.value()}'
-    pbString += f' -PacketSize {l.spinBox_layerPacketSize.value()}'
-    pbString += f' -Pool {l.comboBox_layerPool.currentText()}'
-    pbString += f' -Range {l.lineEdit_layerRange.text()}'
-    pbString += f' -Executable {stf_window.mainWidget.lineEdit_render.text()}'
-    if stf_window.mainWidget.checkBox_paused.isChecked():
-        pbString += ' -Paused'
-    pbString += f' -Creator {stf_window.mainWidget.lineEdit_name.text()}'
-    pbString += f' -StaggerStart {stf_window.mainWidget.lineEdit_stagger.text()}'
-    pbString += f' -Note {stf_window.mainWidget.lineEdit_note.text()}'
-    mayaBatchPath = stf_window.mainWidget.lineEdit_render.text().replace('Render', 'mayaBatch')
-    # imgDir = cmds.workspace(fileRuleEntry="images")
-    cacheFile = '%scache/yeti/%s.%%04d.fur' % (getProj.getProject(), filename)
-    cacheFolder = cacheFile.rsplit('/', 1)[0]
-    if not os.path.exists(cacheFolder):
-        os.makedirs(cacheFolder)
-    pbString += f' -Command "{mayaBatchPath} -file \\\"{getProj.filepath()}\\\" -command \\\"pgYetiCommand ' \
-                f'-writeCache \\\"\\\"{cacheFile}\\\"\\\" -range $(SubRange.Start) $(SubRange.End)' \
-                f' -samples 5 {l.renderLayerName};\\\" '
-    return pbString
-
-
-def yetiCacheString(l):
-    global stf_window
-    # yeti cache string
-    renderLayerName = l.renderLayerName.replace(':', '_')
-    filename = '%s/%s_%s' % (getProj.sceneName(), getProj.sceneName(), renderLayerName)
-
-    pbString = ''
-    pbString += f'{stf_window.mainWidget.lineEdit_submitExe.text()} Script '
-    pbString += ' -Type Generic Script'
-    pbString += f' -Name maya: {getProj.sceneName()} ({l.checkBox_layerEnable.text()})'
-    pbString += ' -UsageLimit 1'
-    pbString += ' -DistributeMode \"Forward\"'
-    pbString += f' -Priority {l.layerPrioritySlider.value()}'
-    pbString += f' -PacketSize {l.spinBox_layerPacketSize.value()}'
-    pbString += f' -Pool {l.comboBox_layerPool.currentText()}'
-    pbString += f' -Range {l.lineEdit_layerRange.text()}'
-    pbString += f' -Executable {stf_window.mainWidget.lineEdit_render.text()}'
-    if stf_window.mainWidget.checkBox_paused.isChecked():
-        pbString += ' -Paused'
-    pbString += f' -Creator {stf_window.mainWidget.lineEdit_name.text()}'
-    pbString += f' -StaggerStart {stf_window.mainWidget.lineEdit_stagger.text()}'
-    pbString += f' -Note {stf_window.mainWidget.lineEdit_note.text()}'
-    mayaBatchPath = stf_window.mainWidget.lineEdit_render.text().replace('Render', 'mayaBatch')
-    # imgDir = cmds.workspace(fileRuleEntry="images")
-    cacheFile = f'{getProj.getProject()}cache/yeti/{filename}.%04d.fur'
-    cacheFolder = cacheFile.rsplit('/', 1)[0]
-    if not os.path.exists(cacheFolder):
-        os.makedirs(cacheFolder)
-    pbString += f' -Command "{mayaBatchPath} -file \\\"{getProj.filepath()}\\\" -command \\\"pgYetiCommand ' \
-                f'-writeCache \\\"\\\"{cacheFile}\\\"\\\" -range $(SubRange.Start) $(SubRange.End)' \
-                f' -samples 5 {l.renderLayerName};\\\" '
-    return pbString
-
-
-def playblastString(l):
+def submitSettings():
+    """
+    Reads the settings shared by every job from the submit window.
+    """
     global stf_window
-    # playblast string
-    filename = f'{getProj.sceneName()}/{getProj.sceneName()}_{l.renderLayerName}_{l.camName.rsplit("|", 1)[0].replace("|", "_")}'
-
-    pbString = ''
-    pbString += f'{stf_window.mainWidget.lineEdit_submitExe.text()} Script '
-    pbString += ' -Type Generic Script'
-    pbString += f' -Name maya: {getProj.sceneName()} ({l.checkBox_layerEnable.text()})'
-    pbString += f' -Priority {l.layerPrioritySlider.value()}'
-    pbString += f' -PacketSize {l.spinBox_layerPacketSize.value()}'
-    pbString += f' -Pool {l.comboBox_layerPool.currentText()}'
-    pbString += f' -Range {l.lineEdit_layerRange.text()}'
-    pbString += f' -Executable {stf_window.mainWidget.lineEdit_render.text()}'
-    if stf_window.mainWidget.checkBox_paused.isChecked():
-        pbString += ' -Paused'
-    pbString += f' -Creator {stf_window.mainWidget.lineEdit_name.text()}'
-    pbString += f' -StaggerStart {stf_window.mainWidget.lineEdit_stagger.text()}'
-    pbString += f' -Note {stf_window.mainWidget.lineEdit_note.text()}'
-    mayaBatchPath = stf_window.mainWidget.lineEdit_render.text().replace('Render', 'mayaBatch')
-    # imgDir = cmds.workspace(fileRuleEntry="images")
-    playblastFolder = f'{getProj.getProject()}images/playblasts/{filename}'
-    pbString += f' -Command "{mayaBatchPath} -file \\\"{getProj.filepath()}\\\" -command \\\"setPlayblastOptions(' \
-                f'\\\"\\\"{l.camName}\\\"\\\",\\\"\\\"{l.renderLayerName}\\\"\\\");playblast -format image -startTime ' \
-                f'$(SubRange.Start) -endTime $(SubRange.End) -filename (\\\"\\\"{playblastFolder}\\\"\\\") ' \
-                f'-sequenceTime 0 -clearCache 1 -viewer 0 -showOrnaments 0 -fp 4 -percent 100 -quality 70 ' \
-                f'-widthHeight 1920 1080;\\\" '
-    return pbString
-
-
-def renderString(l):
+    mainWidget = stf_window.mainWidget
+    return jobSpec.SubmitSettings(
+        submitExe=mainWidget.lineEdit_submitExe.text(),
+        renderExe=mainWidget.lineEdit_render.text(),
+        creator=mainWidget.lineEdit_name.text(),
+        note=mainWidget.lineEdit_note.text(),
+        staggerStart=mainWidget.lineEdit_stagger.text(),
+        paused=mainWidget.checkBox_paused.isChecked(),
+        halfResolution=mainWidget.checkBox.isChecked(),
+        detectErrors=not mainWidget.checkBox_errors.isChecked(),
+        gpu=mainWidget.comboBox_resourceAllocation.currentText() == 'GPU',
+        progressive=mainWidget.checkBox_progressive.isChecked()
+    )
+
+
+def submitJob(submitString):
+    """
+    Sends a single job to Smedge and returns the job ID it was given.
+    """
+    return submit_job(submitString)
+
+
+class FarmSubmission():
+    """
+    Shows the progress of a JobGraph being sent to Smedge. The jobs are sent
+    by a GraphSubmission from its own threads and collected by a timer on
+    Maya's main thread, so the progress window keeps updating without Maya
+    freezing while jobs are sent.
+    """
+
+    def __init__(self, graph, onFinished=None, maxWorkers=jobGraph.MAX_SUBMISSIONS):
+        self.graph = graph
+        self.onFinished = onFinished
+        self.maxWorkers = maxWorkers
+        self.startTime = 0
+
+    def start(self):
+        self.startTime = time.perf_counter()
+        jobCount = len(self.graph.jobs)
+        self.progressWindow = cmds.window(title='Submit Progress')
+        cmds.columnLayout(adjustableColumn=True)
+        self.progressControl = cmds.progressBar(maxValue=max(jobCount, 1), width=500, height=40)
+        self.progressLabel = cmds.text(label='Submitting %s jobs' % jobCount, width=100, height=40,
+                                       align='center')
+        cmds.showWindow(self.progressWindow)
+
+        self.submission = jobGraph.GraphSubmission(self.graph, self.maxWorkers, submitJob)
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(100)
+
+    def poll(self):
+        for label, jobID, error in self.submission.poll():
+            if error is None:
+                cmds.text(self.progressLabel, edit=True, label='Submitted Layer - %s' % label)
+            else:
+                print('failed to submit %s, check path to submit.exe exists: %s' % (label, error))
+            cmds.progressBar(self.progressControl, edit=True, step=1)
+
+        if not self.submission.finished:
+            return
+
+        self.timer.stop()
+        cmds.deleteUI(self.progressWindow)
+        results = self.submission.results
+        failed = len([r for r in results if r[2] is not None])
+        print('Submitted %s jobs in %.2fs (%s failed)' % (len(results) - failed,
+                                                         time.perf_counter() - self.startTime, failed))
+        if self.onFinished:
+            self.onFinished(results)
+
+
+def jobTypeWaitsForCaches():
     global stf_window
-    # render string
-    submitString = ''
-    submitString += f'\"{stf_window.mainWidget.lineEdit_submitExe.text()}\" Script '
-    submitString += ' -Type \"Redshift for Maya\"'
-    submitString += f' -Scene \"{getProj.filepath()}\"'
-    submitString += f' -Project \"{getProj.getProject()}\"'
-    submitString += f' -Name \"maya: {getProj.sceneName()} ({l.checkBox_layerEnable.text()})\"'
-    submitString += f' -Extra \"-rl {l.renderLayerName}\"'
-    submitString += f' -Extra \"-cam {l.camName}\"'
-    submitString += f' -Priority {l.layerPrioritySlider.value()}'
-    submitString += f' -PacketSize {l.spinBox_layerPacketSize.value()}'
-    submitString += f' -Pool {l.comboBox_layerPool.currentText()}'
-    submitString += f' -Range {l.lineEdit_layerRange.text()}'
-    submitString += f' -Executable \"{stf_window.mainWidget.lineEdit_render.text()}\"'
-    if stf_window.mainWidget.checkBox_paused.isChecked():
-        submitString += ' -Paused'
-    submitString += f' -Creator \"{stf_window.mainWidget.lineEdit_name.text()}\"'
-    submitString += f' -StaggerStart {stf_window.mainWidget.lineEdit_stagger.text()}'
-    submitString += f' -Note \"{stf_window.mainWidget.lineEdit_note.text()}\"'
-    if stf_window.mainWidget.checkBox.isChecked() == 1:
-        width = cmds.getAttr("defaultResolution.width") / 2
-        height = cmds.getAttr("defaultResolution.height") / 2
-        submitString += f' -Extra \"-x {width} -y {height} -preRender \"setAttr \\\"redshiftOptions.unifiedMaxSamples' \
-                        f'\\\" 16; setAttr \\\"redshiftOptions.unifiedMinSamples\\\" 4;\"\" '
-    if stf_window.mainWidget.checkBox_errors.isChecked() == 1:
-        submitString += ' -DetectErrors 0'
-    if stf_window.mainWidget.comboBox_resourceAllocation.currentText() == "GPU":
-        submitString += ' -CPUs -1 -GPUs 1 -RAM -1'
-    else:
-        submitString += ' -CPUs 0 -GPUs 0 -RAM 0'
-    submitString += ' -DistributeMode 0 -StaggerCount 1 -StaggerMode 1'
-
-    return submitString
+    return stf_window.mainWidget.comboBox_jobType.currentText() in ['Render', 'Playblast']
+
+
+def rememberCacheJobs(scene, results):
+    """
+    Keeps the IDs of submitted cache jobs so renders of the same scene
+    submitted later wait for them. Cache jobs are labelled with their Yeti or
+    Bifrost node.
+    """
+    jobIDs = cacheJobs.setdefault(scene.filepath, {})
+    for label, jobID, error in results:
+        if jobID:
+            jobIDs[label] = jobID
+
+
+def confirmDependencies():
+    """
+    Checks the files the enabled layers need exist before submitting. Returns
+    False if some are missing and the submission is cancelled.
+    """
+    layers = []
+    frames = set()
+    for l in layerModel.enabledLayers():
+        layers.append(l.layer)
+        try:
+            frames.update(frameScheduler.parseRange(l.range))
+        except ValueError:
+            pass
+    problems, seconds = dependencyScan.scanScene(sorted(set(layers)), sorted(frames))
+    print('Checked scene dependencies in %.2fs' % seconds)
+    if not problems:
+        return True
+    message = dependencyScan.formatProblems(problems)
+    print(message)
+    result = cmds.confirmDialog(title='Missing Files', message='Files the render needs are missing:\n\n%s' % message,
+                                button=['Submit Anyway', 'Cancel'], defaultButton='Cancel', cancelButton='Cancel',
+                                dismissString='Cancel')
+    return result == 'Submit Anyway'
 
 
 def submitButton():
-    global layerWidget
     global stf_window
-    
-    # progress bar
-    countActiveLayers = 0
-    for l in layerWidget.layerWidgets:
-        if l.checkBox_layerEnable.isChecked() == 1:
-            countActiveLayers += 1
-    if stf_window.mainWidget.checkBox_paused.isChecked() == 0:
-        countActiveLayers *= 2
-    countActiveLayers += 2
-    progressWindow = cmds.window(title='Submit Progress')
-    cmds.columnLayout(adjustableColumn=True)
-    progressControl = cmds.progressBar(maxValue=countActiveLayers, width=500, height=40)
-    progressLabel = cmds.text(label='', width=100, height=40, align='center')
-    cmds.showWindow(progressWindow)
-
-    # save file
-    cmds.text(progressLabel, edit=True, label='Saving File')
-    cmds.file(save=True)
-    cmds.progressBar(progressControl, edit=True, step=1)
-
-    updateStrings = []
-
-    # loop through layers in layerWidget
-    for l in layerWidget.layerWidgets:
-
-        if l.checkBox_layerEnable.isChecked() == 1:
-            widgets = l.findChildren(QtWidgets.QWidget)
-            for w in widgets:
-                try:
-                    value = ''
-                    type = w.metaObject().className()
-                    if type == 'QLineEdit':
-                        value = w.text()
-                    if type == 'QComboBox':
-                        value = w.currentText()
-                    if type == 'QSpinBox':
-                        value = w.value()
-                    if value and w.parent() == l:
-
-                        if cmds.attributeQuery(w.objectName(), node=l.renderLayerName, ex=True) == False:
-                            cmds.addAttr(l.renderLayerName, ln=w.objectName(), dt='string')
-                        cmds.setAttr('%s.%s' % (l.renderLayerName, w.objectName()), value, type="string")
-                except:
-                    pass
-
-            submitString = renderString(l)
-            if l.comboBox_jobType.currentText() == 'Playblast':
-                submitString = playblastString(l)
-            if l.comboBox_jobType.currentText() == 'Yeti Cache':
-                submitString = yetiCacheString(l)
-            if l.comboBox_jobType.currentText() == 'Bifrost Cache':
-                submitString = bifrostCacheString(l)
-
-            try:
-                # que the files paused
-                # send = subprocess.check_output(submitString, stdin=None, stderr=None, shell=False)
-                cmds.text(progressLabel, edit=True, label='Submitting Layer - %s' % l.checkBox_layerEnable.text())
-                si = subprocess.STARTUPINFO()
-
-                si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                send = subprocess.check_output(submitString, startupinfo=si)
-                jobID = send.rsplit(' ', 1)[-1]
-                jobID = jobID.replace('\n', '').replace('\r', '')
-                updateString = submitString.replace("-Paused", "-ID %s" % jobID)
-                updateStrings.append(updateString)
-
-                cmds.progressBar(progressControl, edit=True, step=1)
-
-            except:
-                print('failed to submit, check path to submit.exe exists')
-            print(submitString)
-            layerDict(l)
-
-    # save file with added metadata
-    cmds.text(progressLabel, edit=True, label='Writing Metadata')
+    global activeSubmission
+
+    # check textures and caches exist before saving and submitting renders
+    if stf_window.mainWidget.comboBox_jobType.currentText() == 'Render' and not confirmDependencies():
+        return
+
+    # scene and window settings are read once for all the layers
+    scene = jobSpec.SceneInfo.fromScene()
+    settings = submitSettings()
+
+    graph = jobGraph.JobGraph()
+    # renders wait for the caches submitted earlier of the nodes in their layer
+    layerCaches = {}
+    waitsForCaches = jobTypeWaitsForCaches()
+    submittedCaches = cacheJobs.get(scene.filepath, {}) if waitsForCaches else {}
+    if submittedCaches:
+        for node, jobID in submittedCaches.items():
+            graph.addSubmitted('%s cache' % node, jobID)
+        layers = sorted(set(l.layer for l in layerModel.enabledLayers()))
+        for layer, nodes in dependencyScan.cacheNodesByLayer(layers, list(submittedCaches)).items():
+            layerCaches[layer] = ['%s cache' % n for n in nodes]
+    # save the layer settings on the layer nodes, one attribute per layer
+    layerStore.writeLayers(layerModel.enabledLayers())
+    # loop through the enabled layers, the sidecars are written together at the end
+    layerRecords = []
+    with IO.transaction():
+        for l in layerModel.enabledLayers():
+            job = jobSpec.buildJob(scene, settings, l)
+            if job.outputFolder and not os.path.exists(job.outputFolder):
+                os.makedirs(job.outputFolder)
+
+            # each frame only waits for the same frame of the caches
+            graph.add(job.label, job, after=layerCaches.get(l.layer), wholeJob=False)
+            layerRecords.append(layerDict(l, job))
+    # and added to the project index in one transaction
+    metadataIndex.writeRecords(getProj.sceneFolder(), layerRecords)
+
+    # save file with the added metadata before the farm reads it
     cmds.file(save=True)
-    cmds.progressBar(progressControl, edit=True, step=1)
-
-    if stf_window.mainWidget.checkBox_paused.isChecked() == 0:
-        for updateLayer in updateStrings:
-            cmds.text(progressLabel, edit=True, label='Updating Layer Status')
-            si = subprocess.STARTUPINFO()
-            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            subprocess.check_output(updateLayer, startupinfo=si)
-            cmds.progressBar(progressControl, edit=True, step=1)
-    cmds.text(progressLabel, edit=True, label='DONE!')
-    cmds.deleteUI(progressWindow)
+
+    # jobs are created paused only if it's checked so they don't need updating after
+    onFinished = None
+    if not waitsForCaches:
+        onFinished = lambda results: rememberCacheJobs(scene, results)
+    activeSubmission = FarmSubmission(graph, onFinished)
+    activeSubmission.start()
     # projectDict()
-    localDict()
-    fileDict()
+    with IO.transaction():
+        localDict()
+        fileDict()
+
+
+def watchButton():
+    import pipelime.renderWatcher as renderWatcher
+    renderWatcher.openWatcherWindow()
+
+
+def verifyButton():
+    """
+    Checks the rendered frames of every layer submitted from this scene and
+    offers to resubmit the frames that are missing, empty or truncated.
+    """
+    global activeSubmission
+    # the layers are read from the project index in one query, or from their sidecars without one
+    scenePath = getProj.filepath()
+    names = ['%s.%s' % (l.layer, l.camera.replace(':', '_')) for l in layerModel.layers]
+    records = {metadataIndex.sidecarPath(scenePath, name): record
+               for name, record in metadataIndex.readLayers(scenePath, names).items() if record}
+    if not records:
+        cmds.confirmDialog(title='Verify Frames', message='No layers of this scene have been submitted.',
+                           button=['OK'])
+        return
+
+    startTime = time.perf_counter()
+    reports = sequenceCheck.checkRecords(records)
+    message = sequenceCheck.formatReports(reports)
+    print(message)
+    print('Checked %s layers in %.2fs' % (len(reports), time.perf_counter() - startTime))
+
+    graph = jobGraph.JobGraph()
+    for r in reports:
+        job = sequenceCheck.resubmitJob(r)
+        if job is not None:
+            graph.add(r.label, job)
+    if not graph.jobs:
+        cmds.confirmDialog(title='Verify Frames', message=message, button=['OK'])
+        return
+    result = cmds.confirmDialog(title='Verify Frames', message=message,
+                                button=['Resubmit %s Layers' % len(graph.jobs), 'Cancel'],
+                                defaultButton='Cancel', cancelButton='Cancel', dismissString='Cancel')
+    if result != 'Cancel':
+        activeSubmission = FarmSubmission(graph)
+        activeSubmission.start()
 
 
 def setUiValue(uiObject, value, window):
@@ -500,18 +580,13 @@ def mergeDictionaries(dict1, dict2):
 
 
 def clearLayers():
-    global layerWidget
-    if layerWidget is None:
-        return
-    for l in layerWidget.layerWidgets:
-        l.setParent(None)
-    del layerWidget.layerWidgets[:]
+    layerModel.setLayers([])
 
 
 def populateRenderLayers():
     layers = sceneVar.getRenderLayers()
     cameras = listCameras()
-    layerWidget = LayerWidget(layers, cameras, stf_window)
+    setLayers(layers, cameras)
 
 
 def populateYetiLayers():
@@ -520,7 +595,7 @@ def populateYetiLayers():
     for n in yetiNodes:
         yetiLayerData.append([n, 1])
     cameras = listCameras()
-    layerWidget = LayerWidget(yetiLayerData, [''], stf_window)
+    setLayers(yetiLayerData, [''])
 
 
 def populateBifrostLayers():
@@ -530,7 +605,7 @@ def populateBifrostLayers():
         if cmds.attributeQuery("evaluationType", node=n, exists=True):
             if cmds.getAttr("%s.evaluationType" % n) == 0:
                 bifrostLayerData.append([n, 1])
-    layerWidget = LayerWidget(bifrostLayerData, [''], stf_window)
+    setLayers(bifrostLayerData, [''])
 
 
 def submitTypeChanged(currentText):
@@ -550,6 +625,7 @@ def submitTypeChanged(currentText):
 
 
 def submitRenderUI():
+    global layerModel
     stf_window = qtBase.BaseWindow(qtBase.GetMayaWindow(), 'submitToFarm.ui')
     stf_window._windowTitle = 'Submit to Farm'
     stf_window._windowName = 'SubmitToFarm'
@@ -560,6 +636,8 @@ def submitRenderUI():
     stf_window.mainWidget.configPanel.setVisible(False)
     # connect buttons
     stf_window.mainWidget.submitButton.clicked.connect(submitButton)
+    stf_window.mainWidget.pushButton_verify.clicked.connect(verifyButton)
+    stf_window.mainWidget.pushButton_watch.clicked.connect(watchButton)
     stf_window.mainWidget.pushButton_globals.clicked.connect(globalDict)
     stf_window.mainWidget.pushButton_pools.clicked.connect(fetchPools)
     stf_window.mainWidget.pushButton_project.clicked.connect(projectDict)
@@ -568,6 +646,18 @@ def submitRenderUI():
     stf_window.mainWidget.pushButton_submitExe.clicked.connect(selectSubmitExe)
     stf_window.mainWidget.pushButton_dir.clicked.connect(openSceneFolder)
     stf_window.mainWidget.comboBox_jobType.currentTextChanged.connect(submitTypeChanged)
+    # global controls change every layer at once
+    layerModel = layerTable.LayerTableModel(stf_window)
+    layerTable.setupView(stf_window.mainWidget.tableView_layers, layerModel)
+    stf_window.mainWidget.prioritySlider.valueChanged.connect(shiftPriority)
+    stf_window.mainWidget.spinBox_packetSize.valueChanged.connect(
+        lambda value: layerModel.setColumn(layerTable.PACKET_SIZE, value))
+    stf_window.mainWidget.comboBox_pool.currentTextChanged.connect(
+        lambda value: layerModel.setColumn(layerTable.POOL, value))
+    stf_window.mainWidget.lineEdit_range.textChanged.connect(
+        lambda value: layerModel.setColumn(layerTable.RANGE, value))
+    stf_window.mainWidget.checkBox_enable.stateChanged.connect(
+        lambda value: layerModel.setColumn(layerTable.LAYER, bool(value)))
     # icon on button
     try:
         buttonIcon = QtGui.QIcon(f"{qtBase.self_path()}/icons/{'gear'}.png")
@@ -584,10 +674,11 @@ def submitRenderUI():
     versionlessSceneName = ''.join([c for c in getProj.sceneName() if c not in "1234567890"])
     comboDict = mergeDictionaries(comboDict,
                                   IO.loadDictionary(f'{getProj.sceneFolder()}/.data/{versionlessSceneName}.json'))
-    # populate pool comboBox from /config/globalPrefs.json
+    # populate pool comboBox from the cached pools in /config/globalPrefs.json
     try:
-        poolsList = ((comboDict["pools"]["value"])[2:-2]).replace('\'', '').split(',')
-        stf_window.mainWidget.comboBox_pool.addItems(poolsList)
+        pools = smedgePools.parsePools(comboDict["pools"]["value"])
+        stf_window.mainWidget.comboBox_pool.addItems(pools)
+        layerModel.setPools(pools)
     except:
         pass
 
@@ -598,16 +689,13 @@ def submitRenderUI():
 def openSubmitWindow():
     global stf_window
     global layers
-    global layerWidget
-    
+
     stf_window = submitRenderUI()
     # get render layers from scene
     layers = sceneVar.getRenderLayers()
-    cameras = listCameras()
-
-    layerWidget = LayerWidget([['', '']], [], stf_window)
-    # layerWidget = LayerWidget(layers,cameras,stf_window)
 
     currentText = stf_window.mainWidget.comboBox_jobType.currentText()
     submitTypeChanged(currentText)
+    # update the cached pools without waiting for smedge
+    refreshPools()
 
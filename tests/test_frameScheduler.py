@@ -0,0 +1,106 @@
+"""
+Tests the frame ranges sent to Smedge. Run from the root of the toolbox with:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipelime.lm_frameScheduler import (formatRange, formatSteppedRange, parseRange, progressivePasses,  # noqa: E402
+                                        progressiveRange, rangeFrames)
+
+
+class ParseRangeTests(unittest.TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(parseRange('1-5'), [1, 2, 3, 4, 5])
+        self.assertEqual(parseRange('7'), [7])
+        self.assertEqual(parseRange('1-3,10,20-21'), [1, 2, 3, 10, 20, 21])
+        self.assertEqual(parseRange('1-10x3'), [1, 4, 7, 10])
+        self.assertEqual(parseRange('1-10x4'), [1, 5, 9])
+
+    def test_odd_ranges(self):
+        # backwards, frames given as floats, spaces, empty and overlapping parts
+        self.assertEqual(parseRange('5-1'), [1, 2, 3, 4, 5])
+        self.assertEqual(parseRange('1.0-3.0'), [1, 2, 3])
+        self.assertEqual(parseRange(' 1 - 3 , 5 ,'), [1, 2, 3, 5])
+        self.assertEqual(parseRange('1-5,3-7'), [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(parseRange('-2-2'), [-2, -1, 0, 1, 2])
+        self.assertEqual(parseRange('1-5x0'), [1, 2, 3, 4, 5])
+        self.assertEqual(parseRange(''), [])
+
+    def test_invalid_ranges_raise(self):
+        for frameRange in ('a-b', '1-', '1-5y2', '1--'):
+            with self.assertRaises(ValueError):
+                parseRange(frameRange)
+
+    def test_range_frames_keep_the_order_they_render_in(self):
+        self.assertEqual(rangeFrames('10,1-3,2'), [10, 1, 2, 3])
+
+
+class FormatRangeTests(unittest.TestCase):
+
+    def test_runs_are_joined(self):
+        self.assertEqual(formatRange([1, 2, 3, 5]), '1-3,5')
+        self.assertEqual(formatRange([1]), '1')
+        self.assertEqual(formatRange([]), '')
+        self.assertEqual(formatRange([-3, -2, -1]), '-3--1')
+
+    def test_order_is_kept(self):
+        self.assertEqual(formatRange([5, 1, 2, 3]), '5,1-3')
+
+    def test_round_trip(self):
+        for frames in ([1, 2, 3, 7, 8, 20], [-3, -2, 0, 4], list(range(1, 101, 2))):
+            self.assertEqual(parseRange(formatRange(frames)), frames)
+
+    def test_stepped_ranges(self):
+        self.assertEqual(formatSteppedRange([1, 9, 17, 25, 30]), '1-25x8,30')
+        self.assertEqual(formatSteppedRange([1, 2, 3]), '1-3')
+        # two frames a step apart are shorter on their own
+        self.assertEqual(formatSteppedRange([1, 3]), '1,3')
+        self.assertEqual(formatSteppedRange([1, 2]), '1-2')
+        self.assertEqual(formatSteppedRange([4]), '4')
+        self.assertEqual(formatSteppedRange([]), '')
+
+
+class ProgressiveRangeTests(unittest.TestCase):
+
+    def assertSameFrames(self, frameRange, step):
+        # every frame once, in the order of the passes
+        progressive = progressiveRange(frameRange, step)
+        frames = rangeFrames(progressive)
+        self.assertEqual(sorted(frames), parseRange(frameRange))
+        self.assertEqual(frames, [f for p in progressivePasses(parseRange(frameRange), step) for f in p])
+        return progressive
+
+    def test_long_shot(self):
+        self.assertEqual(self.assertSameFrames('1-2000', 8), '1-1993x8,2000,5-1997x8,3-1999x4,2-1998x2')
+
+    def test_passes_halve_the_gaps(self):
+        self.assertEqual(progressivePasses(parseRange('1-9'), 4), [[1, 5, 9], [3, 7], [2, 4, 6, 8]])
+        self.assertEqual(self.assertSameFrames('1-9', 4), '1-9x4,3,7,2-8x2')
+
+    def test_step_edges(self):
+        # a step of one or less is every frame in order
+        self.assertEqual(self.assertSameFrames('1-20', 1), '1-20')
+        self.assertEqual(self.assertSameFrames('1-20', 0), '1-20')
+        # steps longer than the range only pull the last frame forward
+        self.assertEqual(self.assertSameFrames('1-7', 8), '1,7,5,3,2-6x2')
+        self.assertEqual(self.assertSameFrames('1', 8), '1')
+        self.assertEqual(self.assertSameFrames('1-2', 8), '1-2')
+        # a step that isn't a power of two
+        self.assertSameFrames('1-100', 6)
+
+    def test_odd_ranges(self):
+        self.assertEqual(self.assertSameFrames('10-1', 2), '1-9x2,10,2-8x2')
+        self.assertSameFrames('1-10,15,20-30', 4)
+        self.assertSameFrames('-5-5', 2)
+        self.assertSameFrames('1001-1240x2', 8)
+        self.assertEqual(progressiveRange('', 8), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
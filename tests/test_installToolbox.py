@@ -0,0 +1,224 @@
+"""
+Tests the installer's downloads against a local http server standing in for
+the repo. Run from the root of the toolbox with:
+
+    python -m unittest discover tests
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import installToolbox  # noqa: E402
+
+# path: body served by the stand-in server
+FILES = {
+    '/data.bin': bytes(range(256)) * 1024,
+    # multibyte characters that are split between download blocks
+    '/text.txt': ('é中\U0001F600' * 40000).encode('utf-8'),
+}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # keep-alive like github
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path == '/always-416':
+            return self._send(416, b'')
+        body = FILES.get(self.path)
+        if body is None:
+            return self._send(404, b'')
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(304, b'', {'ETag': etag})
+
+        start = None
+        ranged = self.headers.get('Range')
+        if ranged and not self.server.ignore_ranges:
+            start = int(ranged.split('=')[1].split('-')[0])
+            if start >= len(body):
+                return self._send(416, b'', {'Content-Range': 'bytes */%s' % len(body)})
+        if start is None:
+            return self._send(200, body, {'ETag': etag})
+        return self._send(206, body[start:], {
+            'ETag': etag,
+            'Content-Range': 'bytes %s-%s/%s' % (start, len(body) - 1, len(body))
+        })
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class DownloadTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.server.daemon_threads = True
+        cls.server.requests = []
+        cls.server.ignore_ranges = False
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.root = 'http://127.0.0.1:%s' % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.server.requests.clear()
+        self.server.ignore_ranges = False
+        # a pool of our own so the connection counts only include this test
+        self.pool = installToolbox._POOL
+        installToolbox._POOL = installToolbox.ConnectionPool()
+
+    def tearDown(self):
+        installToolbox._POOL.close()
+        installToolbox._POOL = self.pool
+        shutil.rmtree(self.folder)
+
+    def test_text_is_decoded_across_blocks(self):
+        text = installToolbox.download_data('%s/text.txt' % self.root)
+        self.assertEqual(text, FILES['/text.txt'].decode('utf-8'))
+
+    def test_file_is_renamed_into_place(self):
+        local = '%s/sub/data.bin' % self.folder
+        installToolbox.download_file('%s/data.bin' % self.root, local)
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), FILES['/data.bin'])
+        self.assertFalse(os.path.exists('%s.part' % local))
+
+    def test_part_file_is_resumed_with_a_range(self):
+        local = '%s/data.bin' % self.folder
+        with open('%s.part' % local, 'wb') as f:
+            f.write(FILES['/data.bin'][:1000])
+        installToolbox.download_file('%s/data.bin' % self.root, local)
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), FILES['/data.bin'])
+        self.assertEqual(self.server.requests[-1][1].get('Range'), 'bytes=1000-')
+
+    def test_ignored_range_rewrites_the_file(self):
+        self.server.ignore_ranges = True
+        local = '%s/data.bin' % self.folder
+        with open('%s.part' % local, 'wb') as f:
+            f.write(b'stale' * 100)
+        installToolbox.download_file('%s/data.bin' % self.root, local)
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), FILES['/data.bin'])
+
+    def test_unsatisfiable_range_starts_again(self):
+        local = '%s/data.bin' % self.folder
+        with open('%s.part' % local, 'wb') as f:
+            f.write(b'x' * (len(FILES['/data.bin']) + 10))
+        installToolbox.download_file('%s/data.bin' % self.root, local)
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), FILES['/data.bin'])
+        self.assertNotIn('Range', self.server.requests[-1][1])
+
+    def test_416_without_a_range_raises(self):
+        with self.assertRaises(HTTPError) as error:
+            installToolbox.download_file('%s/always-416' % self.root, '%s/missing' % self.folder)
+        self.assertEqual(error.exception.code, 416)
+
+    def test_unchanged_file_is_revalidated_with_a_304(self):
+        cache = installToolbox.HttpCache('%s/cache' % self.folder, fresh_seconds=0)
+        first = cache.fetch('%s/data.bin' % self.root)
+        second = cache.fetch('%s/data.bin' % self.root)
+        self.assertEqual(first, second)
+        with open(second, 'rb') as f:
+            self.assertEqual(f.read(), FILES['/data.bin'])
+        self.assertIn('If-None-Match', self.server.requests[-1][1])
+        self.assertEqual(installToolbox._POOL.summary()['size'], len(FILES['/data.bin']))
+
+    def test_fresh_cache_makes_no_request(self):
+        cache = installToolbox.HttpCache('%s/cache' % self.folder)
+        cache.fetch('%s/data.bin' % self.root)
+        cache.fetch('%s/data.bin' % self.root)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            installToolbox.download_data('%s/text.txt' % self.root)
+        summary = installToolbox._POOL.summary()
+        self.assertEqual(summary['requests'], 5)
+        self.assertEqual(summary['connections'], 1)
+
+
+class PrecompileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.modules = []
+        for i in range(5):
+            path = os.path.join(self.folder, 'module%s.py' % i)
+            with open(path, 'w') as f:
+                f.write('VALUE = %s\n' % i + 'def f():\n    return [x * 2 for x in range(10)]\n' * 50)
+            self.modules.append(path)
+        self.broken = os.path.join(self.folder, 'broken.py')
+        with open(self.broken, 'w') as f:
+            f.write('def f(:\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_other_interpreter_reports_its_compile_time(self):
+        report = installToolbox.precompile_modules(self.modules + [self.broken], sys.executable, workers=2)
+        self.assertEqual(report['compiled'], 5)
+        self.assertEqual(report['failed'], [self.broken])
+        # the time spent compiling, not starting the interpreters
+        self.assertGreater(report['saved'], 0)
+        self.assertLess(report['saved'], report['seconds'])
+        cache_tag, magic = installToolbox.python_cache_info(sys.executable)
+        for path in self.modules:
+            self.assertTrue(installToolbox.pyc_is_valid(path, cache_tag, magic))
+
+        report = installToolbox.precompile_modules(self.modules, sys.executable)
+        self.assertEqual((report['compiled'], report['skipped'], report['saved']), (0, 5, 0.0))
+
+
+class CommandLineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_install_prints_only_the_report_to_stdout(self):
+        toolbox = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(toolbox, 'toolboxShelf.json')) as f:
+            tool = next(iter(json.load(f)))
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            code = installToolbox.main(['install', os.path.join(self.folder, 'a'), os.path.join(self.folder, 'b'),
+                                        '--source', toolbox, '--tools', tool, '--no-compile'])
+        self.assertEqual(code, 0)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(len(report['targets']), 2)
+        self.assertIn('Checking for changes', stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
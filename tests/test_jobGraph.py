@@ -0,0 +1,135 @@
+"""
+Tests the order jobs are sent to Smedge in and what happens when one fails,
+with a stand-in for Submit.exe. Run from the root of the toolbox with:
+
+    python -m unittest discover tests
+"""
+import os
+import re
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipelime.lm_jobGraph import GraphSubmission, JobGraph  # noqa: E402
+from pipelime.lm_jobSpec import JobSpec  # noqa: E402
+
+
+def job(name):
+    return JobSpec('Submit.exe', {'-Name': name}, name)
+
+
+class StandInSubmit():
+    """Returns a job ID for every command and records the commands in the order they were sent."""
+
+    def __init__(self, results=None):
+        # name: job ID to return, or an exception to raise
+        self.results = results or {}
+        self.commands = []
+        self._lock = threading.Lock()
+
+    def __call__(self, command):
+        name = re.search(r'-Name "([^"]+)"', command)[1]
+        with self._lock:
+            self.commands.append((name, command))
+        result = self.results.get(name, 'id-%s' % name)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def sent(self):
+        return [name for name, command in self.commands]
+
+    def command(self, name):
+        return dict(self.commands)[name]
+
+
+class OrderTests(unittest.TestCase):
+
+    def test_jobs_come_after_the_jobs_they_wait_for(self):
+        graph = JobGraph()
+        graph.add('render', job('render'), after=['mesh', 'yeti'])
+        graph.add('mesh', job('mesh'), after=['sim'])
+        graph.add('sim', job('sim'))
+        graph.add('yeti', job('yeti'))
+        order = graph.order()
+        self.assertEqual(sorted(order), ['mesh', 'render', 'sim', 'yeti'])
+        for name, upstream in graph.upstream.items():
+            for u in upstream:
+                self.assertLess(order.index(u), order.index(name))
+
+    def test_cycles_are_rejected(self):
+        graph = JobGraph()
+        graph.add('a', job('a'), after=['c'])
+        graph.add('b', job('b'), after=['a'])
+        graph.add('c', job('c'), after=['b'])
+        graph.add('d', job('d'))
+        with self.assertRaisesRegex(ValueError, 'cycle'):
+            graph.order()
+        submit = StandInSubmit()
+        with self.assertRaises(ValueError):
+            GraphSubmission(graph, submit=submit)
+        self.assertEqual(submit.commands, [])
+
+    def test_unknown_upstream_jobs_are_rejected(self):
+        graph = JobGraph()
+        graph.add('a', job('a'), after=['missing'])
+        with self.assertRaisesRegex(ValueError, 'unknown'):
+            graph.order()
+
+    def test_adding_a_job_twice_is_rejected(self):
+        graph = JobGraph()
+        graph.add('a', job('a'))
+        with self.assertRaises(ValueError):
+            graph.add('a', job('a'))
+
+
+class SubmitTests(unittest.TestCase):
+
+    def test_jobs_wait_for_the_ids_of_their_upstream_jobs(self):
+        graph = JobGraph()
+        graph.addSubmitted('cache', 'id-cache')
+        graph.add('sim', job('sim'))
+        graph.add('mesh', job('mesh'), after=['sim', 'cache'], wholeJob=False)
+        submit = StandInSubmit()
+        jobIDs = graph.submit(submit=submit)
+        self.assertEqual(jobIDs, {'sim': 'id-sim', 'mesh': 'id-mesh'})
+        self.assertEqual(submit.sent(), ['sim', 'mesh'])
+        self.assertIn('-WaitForJobID "id-sim,id-cache" -WaitForWholeJob 0', submit.command('mesh'))
+        self.assertNotIn('-WaitForJobID', submit.command('sim'))
+
+    def test_failed_job_blocks_everything_after_it(self):
+        graph = JobGraph()
+        graph.add('sim', job('sim'))
+        graph.add('mesh', job('mesh'), after=['sim'])
+        graph.add('render', job('render'), after=['mesh'])
+        graph.add('other', job('other'))
+        submit = StandInSubmit({'sim': RuntimeError('smedge is down')})
+        submission = GraphSubmission(graph, submit=submit)
+        while not submission.finished:
+            submission.poll(timeout=None)
+        results = {name: (jobID, error) for name, jobID, error in submission.results}
+        self.assertEqual(sorted(results), ['mesh', 'other', 'render', 'sim'])
+        self.assertEqual(results['other'], ('id-other', None))
+        for name in ('sim', 'mesh', 'render'):
+            self.assertIsNone(results[name][0])
+            self.assertIsInstance(results[name][1], Exception)
+        self.assertEqual(sorted(submit.sent()), ['other', 'sim'])
+
+    def test_empty_job_id_is_a_failure(self):
+        for jobID in ('', '   ', None):
+            graph = JobGraph()
+            graph.add('sim', job('sim'))
+            graph.add('mesh', job('mesh'), after=['sim'])
+            jobIDs = graph.submit(submit=StandInSubmit({'sim': jobID}))
+            self.assertEqual(jobIDs, {'sim': None, 'mesh': None})
+
+    def test_empty_graph_is_finished(self):
+        submission = GraphSubmission(JobGraph(), submit=StandInSubmit())
+        self.assertTrue(submission.finished)
+        self.assertEqual(submission.poll(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests the farm job specs without Maya. Run from the root of the toolbox with:
+
+    python -m unittest discover tests
+"""
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipelime import lm_jobSpec as jobSpec  # noqa: E402
+
+SUBMIT = 'C:/Program Files/Smedge/Submit.exe'
+RENDER = 'C:/Program Files/Autodesk/Maya2022/bin/Render.exe'
+
+
+class JobSpecTests(unittest.TestCase):
+
+    def setUp(self):
+        self.scene = jobSpec.SceneInfo('P:/my project/scenes/sh010/sh010_v003.mb', 'P:/my project/', 'sh010_v003')
+        self.settings = jobSpec.SubmitSettings(SUBMIT, RENDER, creator='chris', note='fix the lights')
+
+    def layer(self, jobType='Render', **kwargs):
+        return jobSpec.LayerSettings('beauty', 'shotCam:camShape', 'beauty shotCam', jobType=jobType, **kwargs)
+
+    def test_render_job(self):
+        job = jobSpec.buildJob(self.scene, self.settings, self.layer(range='1-10', packetSize=5))
+        command = job.toCommand()
+        self.assertTrue(command.startswith(f'"{SUBMIT}" Script -Type "Redshift for Maya"'))
+        self.assertIn('-Scene "P:/my project/scenes/sh010/sh010_v003.mb"', command)
+        self.assertIn('-Extra "-rl beauty"', command)
+        self.assertIn('-Range "1-10"', command)
+        self.assertIn('-PacketSize 5', command)
+        self.assertIn('-CPUs 0 -GPUs 0 -RAM 0', command)
+        self.assertNotIn('-Paused', command)
+        self.assertEqual(job.label, 'beauty shotCam')
+        self.assertEqual(job.outputFolder, '')
+
+    def test_render_job_options(self):
+        self.settings.paused = True
+        self.settings.gpu = True
+        self.settings.detectErrors = False
+        self.settings.progressive = True
+        command = jobSpec.buildJob(self.scene, self.settings, self.layer(range='1-20')).toCommand()
+        self.assertIn('-Paused', command)
+        self.assertIn('-CPUs -1 -GPUs 1 -RAM -1', command)
+        self.assertIn('-DetectErrors 0', command)
+        self.assertIn('-Range "1-17x8,20,5,13,3-19x4,2-18x2"', command)
+
+    def test_playblast_job(self):
+        self.settings.progressive = True
+        job = jobSpec.buildJob(self.scene, self.settings, self.layer('Playblast', range='1-20'))
+        command = job.toCommand()
+        self.assertIn('-Type "Generic Script"', command)
+        self.assertIn('mayaBatch.exe', command)
+        self.assertIn('images/playblasts/sh010_v003/sh010_v003_beauty_shotCam', command)
+        # playblasts run every frame of their packets, so they aren't progressive
+        self.assertIn('-Range "1-20"', command)
+
+    def test_cache_jobs(self):
+        for jobType in ('Yeti Cache', 'Bifrost Cache'):
+            job = jobSpec.buildJob(self.scene, self.settings, self.layer(jobType))
+            command = job.toCommand()
+            self.assertIn('-UsageLimit 1', command)
+            self.assertIn('-DistributeMode "Forward"', command)
+            self.assertIn('pgYetiCommand -writeCache', command)
+            self.assertEqual(job.outputFolder, 'P:/my project/cache/yeti/sh010_v003')
+
+    def test_unknown_job_type_is_a_render(self):
+        command = jobSpec.buildJob(self.scene, self.settings, self.layer('Something')).toCommand()
+        self.assertIn('-Type "Redshift for Maya"', command)
+
+    def test_paths_with_spaces_stay_one_argument(self):
+        command = jobSpec.buildJob(self.scene, self.settings, self.layer()).toCommand()
+        arguments = shlex.split(command)
+        self.assertEqual(arguments[0], SUBMIT)
+        self.assertEqual(arguments[arguments.index('-Scene') + 1], self.scene.filepath)
+        self.assertEqual(arguments[arguments.index('-Executable') + 1], RENDER)
+        self.assertEqual(arguments[arguments.index('-Note') + 1], 'fix the lights')
+
+
+class BatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(suffix=' with spaces')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_batch_round_trip(self):
+        scene = jobSpec.SceneInfo('P:/my project/scenes/sh 010/sh010_v003.mb', 'P:/my project/', 'sh010_v003')
+        settings = jobSpec.SubmitSettings(SUBMIT, RENDER, note='say "hi"')
+        jobs = [jobSpec.buildJob(scene, settings, jobSpec.LayerSettings('beauty', 'cam', 'beauty cam', jobType=t))
+                for t in ('Render', 'Playblast', 'Yeti Cache')]
+        path = '%s/batch file.json' % self.folder
+        jobSpec.writeBatch(jobs, path)
+        loaded = jobSpec.readBatch(path)
+        self.assertEqual(loaded, jobs)
+        self.assertEqual([j.toCommand() for j in loaded], [j.toCommand() for j in jobs])
+        # option order is the order they are passed to Submit.exe
+        self.assertEqual(list(loaded[0].options), list(jobs[0].options))
+        self.assertIn('-Scene "P:/my project/scenes/sh 010/sh010_v003.mb"', loaded[0].toCommand())
+
+
+if __name__ == '__main__':
+    unittest.main()
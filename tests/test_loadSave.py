@@ -0,0 +1,187 @@
+"""
+Tests the prefs file lock and the writes made under it. Run from the root of
+the toolbox with:
+
+    python -m unittest discover tests
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import baseIO.loadSave as IO  # noqa: E402
+
+
+def _writeKeys(prefFile, worker, count):
+    # run in other processes, so it has to be importable
+    for i in range(count):
+        IO.writePrefsToFile([['keys', '%s_%s' % (worker, i), i]], prefFile)
+
+
+class FileLockTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.prefFile = '%s/prefs.json' % self.folder
+        self.lockFile = '%s.lock' % self.prefFile
+        self.constants = IO.LOCK_HEARTBEAT, IO.LOCK_STALE
+        IO.LOCK_HEARTBEAT, IO.LOCK_STALE = 0.05, 0.5
+
+    def tearDown(self):
+        IO.LOCK_HEARTBEAT, IO.LOCK_STALE = self.constants
+        shutil.rmtree(self.folder)
+
+    def test_lock_is_held_by_one_thread_at_a_time(self):
+        inside = []
+        overlapped = []
+
+        def work():
+            for _ in range(10):
+                with IO.fileLock(self.prefFile):
+                    inside.append(1)
+                    if len(inside) > 1:
+                        overlapped.append(1)
+                    time.sleep(0.001)
+                    inside.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertFalse(overlapped)
+        self.assertFalse(os.path.exists(self.lockFile))
+
+    def test_lock_left_by_a_dead_process_is_broken(self):
+        with open(self.lockFile, 'w') as f:
+            f.write('otherhost 1 dead\n0000000000')
+        start = time.time()
+        with IO.fileLock(self.prefFile, timeout=5):
+            pass
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_live_lock_is_not_broken(self):
+        held = threading.Event()
+        released = []
+
+        def hold():
+            with IO.fileLock(self.prefFile):
+                held.set()
+                # several times longer than LOCK_STALE
+                time.sleep(IO.LOCK_STALE * 4)
+                released.append(time.time())
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        with IO.fileLock(self.prefFile, timeout=10):
+            acquired = time.time()
+        holder.join()
+        self.assertGreaterEqual(acquired, released[0])
+
+    def test_waiting_too_long_raises(self):
+        held = threading.Event()
+        done = threading.Event()
+
+        def hold():
+            with IO.fileLock(self.prefFile):
+                held.set()
+                done.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        try:
+            with self.assertRaises(TimeoutError):
+                with IO.fileLock(self.prefFile, timeout=0.2):
+                    pass
+        finally:
+            done.set()
+            holder.join()
+
+    def test_someone_elses_lock_is_not_removed(self):
+        with open(self.lockFile, 'w') as f:
+            f.write('otherhost 1 alive\n0000000000')
+        self.assertFalse(IO._removeLock(self.lockFile, 'thishost 2 mine'))
+        with open(self.lockFile) as f:
+            self.assertEqual(f.read(), 'otherhost 1 alive\n0000000000')
+        self.assertEqual(os.listdir(self.folder), ['prefs.json.lock'])
+
+
+class WritePrefsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.prefFile = '%s/prefs.json' % self.folder
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_prefs_are_merged_into_the_file(self):
+        IO.writePrefsToFile([['user', 'name', 'chris']], self.prefFile)
+        IO.writePrefsToFile([['user', 'slackID', '1234'], ['job', 'range', '1-10']], self.prefFile)
+        self.assertEqual(IO.loadJSON(self.prefFile),
+                         {'user': {'name': 'chris', 'slackID': '1234'}, 'job': {'range': '1-10'}})
+
+    def test_write_reads_the_file_not_the_cache(self):
+        IO.writePrefsToFile([['user', 'name', 'chris']], self.prefFile)
+        IO.loadDictionary(self.prefFile)
+        stat = os.stat(self.prefFile)
+        # another machine's write that a network share reports with the same time and size
+        with open(self.prefFile, 'w') as f:
+            json.dump({'user': {'name': 'alex!'}}, f, indent=4, sort_keys=True)
+        os.utime(self.prefFile, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(os.path.getsize(self.prefFile), stat.st_size)
+        IO.writePrefsToFile([['user', 'slackID', '1234']], self.prefFile)
+        self.assertEqual(IO.loadJSON(self.prefFile), {'user': {'name': 'alex!', 'slackID': '1234'}})
+
+    def test_transaction_writes_each_file_once(self):
+        otherFile = '%s/other.json' % self.folder
+        with IO.transaction():
+            IO.writePrefsToFile([['user', 'name', 'chris']], self.prefFile)
+            with IO.transaction():
+                IO.writePrefsToFile([['user', 'slackID', '1234']], self.prefFile)
+            IO.writePrefsToFile([['job', 'range', '1-10']], otherFile)
+            self.assertFalse(os.path.exists(self.prefFile))
+        self.assertEqual(IO.loadJSON(self.prefFile), {'user': {'name': 'chris', 'slackID': '1234'}})
+        self.assertEqual(IO.loadJSON(otherFile), {'job': {'range': '1-10'}})
+
+    def test_transaction_that_raises_writes_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with IO.transaction():
+                IO.writePrefsToFile([['user', 'name', 'chris']], self.prefFile)
+                raise RuntimeError('cancelled')
+        self.assertFalse(os.path.exists(self.prefFile))
+        IO.writePrefsToFile([['user', 'name', 'alex']], self.prefFile)
+        self.assertEqual(IO.loadJSON(self.prefFile), {'user': {'name': 'alex'}})
+
+    def test_writes_from_threads_are_all_kept(self):
+        threads = [threading.Thread(target=_writeKeys, args=(self.prefFile, worker, 20)) for worker in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(IO.loadJSON(self.prefFile)['keys']), 6 * 20)
+
+    def test_writes_from_processes_are_all_kept(self):
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_writeKeys, args=(self.prefFile, worker, 20)) for worker in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        self.assertEqual(len(IO.loadJSON(self.prefFile)['keys']), 4 * 20)
+        self.assertEqual(os.listdir(self.folder), ['prefs.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
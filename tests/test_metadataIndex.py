@@ -0,0 +1,173 @@
+"""
+Tests the project metadata index and its fallback to sidecars in a
+temporary project. Run from the root of the toolbox with:
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import baseIO.loadSave as IO  # noqa: E402
+from pipelime import lm_metadataIndex as metadataIndex  # noqa: E402
+
+
+class IndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp().replace('\\', '/')
+        self.folder = '%s/scenes/sh010' % self.root
+        os.makedirs(self.folder)
+        os.makedirs('%s/.projectData' % self.root)
+        self.scene = '%s/sh010_v001.mb' % self.folder
+        metadataIndex._indexes.clear()
+        metadataIndex._projects.clear()
+        self.busyTimeout = metadataIndex.BUSY_TIMEOUT
+
+    def tearDown(self):
+        metadataIndex.BUSY_TIMEOUT = self.busyTimeout
+        metadataIndex._indexes.clear()
+        metadataIndex._projects.clear()
+        shutil.rmtree(self.root)
+
+    def writeSidecar(self, path, data, modified=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        if modified is not None:
+            os.utime(path, (modified, modified))
+
+
+class RoundTripTests(IndexTestCase):
+
+    def test_metadata_round_trip(self):
+        metadataIndex.writeMetadata(self.scene, [['user', 'name', 'chris']])
+        metadataIndex.writeMetadata(self.scene, [['user', 'note', 'first pass']])
+        self.assertEqual(metadataIndex.readMetadata(self.scene), {'user': {'name': 'chris', 'note': 'first pass'}})
+        # it went to the index, not a sidecar
+        self.assertFalse(os.path.exists(metadataIndex.sidecarPath(self.scene)))
+        self.assertTrue(os.path.exists('%s/%s' % (self.root, metadataIndex.DATABASE)))
+
+    def test_records_are_written_together(self):
+        other = '%s/sh010_v002.mb' % self.folder
+        self.assertTrue(metadataIndex.writeRecords(self.folder, [
+            (self.scene, metadataIndex.LAYER, 'rs_bg.cam', [['job', 'range', '1-10']]),
+            (self.scene, metadataIndex.LAYER, 'rs_fg.cam', [['job', 'range', '1-20']]),
+            (other, metadataIndex.SCENE, '', [['user', 'name', 'alex']]),
+        ]))
+        self.assertEqual(metadataIndex.readLayers(self.scene, ['rs_bg.cam', 'rs_fg.cam']),
+                         {'rs_bg.cam': {'job': {'range': '1-10'}}, 'rs_fg.cam': {'job': {'range': '1-20'}}})
+        self.assertEqual(metadataIndex.readFolder(self.folder, [other]), {other: {'user': {'name': 'alex'}}})
+
+    def test_scenes_missing_from_the_index_are_read_from_sidecars(self):
+        other = '%s/sh010_v002.mb' % self.folder
+        metadataIndex.writeMetadata(self.scene, [['user', 'name', 'chris']])
+        self.writeSidecar(metadataIndex.sidecarPath(other), {'user': {'name': 'alex'}})
+        self.writeSidecar(metadataIndex.sidecarPath(self.scene, 'rs_fg.cam'), {'job': {'range': '5'}})
+        self.assertEqual(metadataIndex.readFolder(self.folder, [self.scene, other]),
+                         {self.scene: {'user': {'name': 'chris'}}, other: {'user': {'name': 'alex'}}})
+        self.assertEqual(metadataIndex.readLayers(self.scene, ['rs_fg.cam', 'rs_bg.cam']),
+                         {'rs_fg.cam': {'job': {'range': '5'}}, 'rs_bg.cam': {}})
+
+
+class FallbackTests(IndexTestCase):
+
+    def test_project_without_an_index_uses_sidecars(self):
+        shutil.rmtree('%s/.projectData' % self.root)
+        metadataIndex.writeMetadata(self.scene, [['user', 'name', 'chris']])
+        self.assertEqual(IO.loadJSON(metadataIndex.sidecarPath(self.scene)), {'user': {'name': 'chris'}})
+        self.assertEqual(metadataIndex.readMetadata(self.scene), {'user': {'name': 'chris'}})
+        self.assertFalse(metadataIndex.writeRecords(self.folder, [(self.scene, metadataIndex.LAYER, 'a', [])]))
+
+    def test_locked_index_falls_back_to_sidecars(self):
+        index = metadataIndex.indexFor(self.folder)
+        # a rollback journal, so an exclusive lock also stops readers
+        index.network = True
+        metadataIndex.writeMetadata(self.scene, [['user', 'name', 'chris']])
+        self.assertEqual(index.journalMode, 'DELETE')
+        self.writeSidecar(metadataIndex.sidecarPath(self.scene, 'rs_bg.cam'), {'job': {'range': '1-10'}})
+
+        metadataIndex.BUSY_TIMEOUT = 0.1
+        locker = sqlite3.connect(index.path, isolation_level=None)
+        locker.execute('BEGIN EXCLUSIVE')
+        try:
+            metadataIndex.writeMetadata(self.scene, [['user', 'note', 'locked']])
+            self.assertFalse(metadataIndex.writeRecords(self.folder, [(self.scene, metadataIndex.LAYER, 'a', [])]))
+            self.assertEqual(metadataIndex.readMetadata(self.scene), {'user': {'note': 'locked'}})
+            self.assertEqual(metadataIndex.readLayers(self.scene, ['rs_bg.cam']), {'rs_bg.cam': {'job': {'range': '1-10'}}})
+        finally:
+            locker.execute('ROLLBACK')
+            locker.close()
+        self.assertEqual(IO.loadJSON(metadataIndex.sidecarPath(self.scene)), {'user': {'note': 'locked'}})
+        self.assertEqual(metadataIndex.readMetadata(self.scene), {'user': {'name': 'chris'}})
+
+
+class JournalModeTests(IndexTestCase):
+
+    def test_journal_is_picked_when_the_database_is_created(self):
+        local = metadataIndex.MetadataIndex(self.root)
+        local.network = False
+        local.get(self.scene)
+        self.assertEqual(local.journalMode, 'WAL')
+        self.assertEqual(metadataIndex.journalModeOf(local.path), 'WAL')
+
+        # a client on a share switches it back while nobody has it open
+        shared = metadataIndex.MetadataIndex(self.root)
+        shared.network = True
+        shared.get(self.scene)
+        self.assertEqual(metadataIndex.journalModeOf(shared.path), 'DELETE')
+
+        # and a local client doesn't switch it to WAL again
+        local = metadataIndex.MetadataIndex(self.root)
+        local.network = False
+        local.get(self.scene)
+        self.assertEqual(local.journalMode, 'DELETE')
+
+    def test_share_refuses_a_wal_database_open_elsewhere(self):
+        local = metadataIndex.MetadataIndex(self.root)
+        local.network = False
+        connection = local.connect()
+        connection.execute('BEGIN')
+        connection.execute('SELECT * FROM records').fetchall()
+        try:
+            shared = metadataIndex.MetadataIndex(self.root)
+            shared.network = True
+            with self.assertRaises(sqlite3.OperationalError):
+                shared.get(self.scene)
+        finally:
+            connection.execute('COMMIT')
+            connection.close()
+
+
+class ImportTests(IndexTestCase):
+
+    def test_changed_sidecars_are_imported_again(self):
+        sidecar = metadataIndex.sidecarPath(self.scene)
+        layerSidecar = metadataIndex.sidecarPath(self.scene, 'rs_bg.cam')
+        now = time.time()
+        self.writeSidecar(sidecar, {'user': {'name': 'chris'}}, now - 100)
+        self.writeSidecar(layerSidecar, {'job': {'range': '1-10'}}, now - 100)
+        # window settings without user or note aren't scene records
+        self.writeSidecar('%s/.data/settings.json' % self.folder, {'window': {'x': 1}}, now - 100)
+        self.writeSidecar('%s/.data/sh010.rs_bg.cam.times.json' % self.folder, {'1': 2.0}, now - 100)
+        index = metadataIndex.MetadataIndex(self.root)
+        self.assertEqual(index.importSidecars(), 2)
+        self.assertEqual(index.get(self.scene), {'user': {'name': 'chris'}})
+
+        # a newer sidecar replaces the record, an older one doesn't
+        self.writeSidecar(sidecar, {'user': {'name': 'alex'}}, now)
+        self.writeSidecar(layerSidecar, {'job': {'range': '1-99'}}, now - 200)
+        index.importSidecars(self.folder)
+        self.assertEqual(index.get(self.scene), {'user': {'name': 'alex'}})
+        self.assertEqual(index.sceneRecords(self.scene), {'rs_bg.cam': {'job': {'range': '1-10'}}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests reading the smedge pools from the prefs and caching the pools fetched
+from a stand-in PoolManager. Run from the root of the toolbox with:
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import baseIO.loadSave as IO  # noqa: E402
+from pipelime import lm_poolRegistry as poolRegistry  # noqa: E402
+
+
+class ParsePoolsTests(unittest.TestCase):
+
+    def test_lists(self):
+        self.assertEqual(poolRegistry.parsePools(['a', 'b']), ['a', 'b'])
+        self.assertEqual(poolRegistry.parsePools([1, 'b']), ['1', 'b'])
+        self.assertEqual(poolRegistry.parsePools([]), [])
+
+    def test_quoted_python_strings_from_older_prefs(self):
+        self.assertEqual(poolRegistry.parsePools("'['a', 'b']'"), ['a', 'b'])
+        self.assertEqual(poolRegistry.parsePools(" '(\"render\", \"sim\")' "), ['render', 'sim'])
+        self.assertEqual(poolRegistry.parsePools("'[]'"), [])
+
+    def test_anything_else_is_no_pools(self):
+        for value in (None, 5, {'a': 1}, '', 'render', "'render'", "'['a', '", "'{\"a\": 1}'"):
+            self.assertEqual(poolRegistry.parsePools(value), [], value)
+
+
+class CacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp().replace('\\', '/')
+        self.sharedFile = '%s/config/globalPrefs.json' % self.folder
+        self.userFile = '%s/user/localPrefs.json' % self.folder
+        self.registry = poolRegistry.PoolRegistry('Submit.exe', self.sharedFile, checkedFile=self.userFile)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def fetch(self, output):
+        with mock.patch.object(poolRegistry.subprocess, 'check_output', return_value=output):
+            return self.registry.fetch()
+
+    def test_fetched_pools_are_cached(self):
+        self.assertTrue(self.registry.isStale())
+        self.assertEqual(self.fetch('render\n sim \n\n'), ['render', 'sim'])
+        self.assertEqual(self.registry.pools(), ['render', 'sim'])
+        self.assertFalse(self.registry.isStale())
+
+    def test_shared_prefs_are_only_written_when_the_pools_change(self):
+        IO.writePrefsToFile([['pathToSubmitExe', 'value', "'Submit.exe'"]], self.sharedFile)
+        self.fetch('render\nsim\n')
+        written = os.stat(self.sharedFile).st_mtime_ns
+        os.utime(self.sharedFile, ns=(written - 10 ** 9, written - 10 ** 9))
+        self.fetch('render\nsim\n')
+        self.assertEqual(os.stat(self.sharedFile).st_mtime_ns, written - 10 ** 9)
+        self.fetch('render\n')
+        self.assertEqual(self.registry.pools(), ['render'])
+        # other shared prefs are kept
+        self.assertEqual(IO.loadJSON(self.sharedFile)['pathToSubmitExe'], {'value': "'Submit.exe'"})
+
+    def test_fetch_time_is_kept_in_the_users_prefs(self):
+        self.fetch('render\n')
+        self.assertNotIn('poolsChecked', IO.loadJSON(self.sharedFile))
+        checked = IO.loadJSON(self.userFile)['poolsChecked']['value']
+        self.assertAlmostEqual(checked, time.time(), delta=60)
+        # another user with the same shared pools hasn't fetched them yet
+        other = poolRegistry.PoolRegistry('Submit.exe', self.sharedFile, checkedFile='%s/other.json' % self.folder)
+        self.assertEqual(other.pools(), ['render'])
+        self.assertTrue(other.isStale())
+
+    def test_cache_goes_stale(self):
+        self.fetch('render\n')
+        IO.writePrefsToFile([['poolsChecked', 'value', time.time() - poolRegistry.POOL_TTL - 1]], self.userFile)
+        self.assertTrue(self.registry.isStale())
+
+
+if __name__ == '__main__':
+    unittest.main()
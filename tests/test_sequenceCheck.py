@@ -0,0 +1,122 @@
+"""
+Tests the checks of rendered frames with small scanline exrs written by the
+tests. Run from the root of the toolbox with:
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipelime import lm_sequenceCheck as sequenceCheck  # noqa: E402
+
+
+def attribute(name, attrType, value):
+    return name.encode() + b'\0' + attrType.encode() + b'\0' + struct.pack('<i', len(value)) + value
+
+
+def buildExr(height=20, compression=3, flags=0, comment=b'', zeroTable=False, cut=0):
+    """
+    Returns the bytes of a single part scanline exr with chunks of dummy
+    pixels. comment pads the header, cut drops bytes from the end.
+    """
+    header = struct.pack('<2i', sequenceCheck.EXR_MAGIC, 2 | flags)
+    header += attribute('compression', 'compression', bytes([compression]))
+    header += attribute('dataWindow', 'box2i', struct.pack('<4i', 0, 0, 9, height - 1))
+    if comment:
+        header += attribute('comments', 'string', comment)
+    header += b'\0'
+    linesPerChunk = sequenceCheck.EXR_LINES_PER_CHUNK[compression]
+    chunks = (height + linesPerChunk - 1) // linesPerChunk
+    offset = len(header) + 8 * chunks
+    offsets, body = [], b''
+    for chunk in range(chunks):
+        pixels = bytes(range(40))
+        offsets.append(offset + len(body))
+        body += struct.pack('<2i', chunk * linesPerChunk, len(pixels)) + pixels
+    table = b'\0' * 8 * chunks if zeroTable else struct.pack(f'<{chunks}Q', *offsets)
+    data = header + table + body
+    return data[:len(data) - cut]
+
+
+class ExrTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, data, name='frame.0001.exr'):
+        path = os.path.join(self.folder, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def isComplete(self, data):
+        return sequenceCheck.exrIsComplete(self.write(data), len(data))
+
+    def test_complete_file(self):
+        self.assertTrue(self.isComplete(buildExr()))
+        self.assertTrue(self.isComplete(buildExr(compression=0)))
+        self.assertTrue(self.isComplete(buildExr(compression=9, height=600)))
+
+    def test_zeroed_offset_table(self):
+        self.assertFalse(self.isComplete(buildExr(zeroTable=True)))
+
+    def test_last_chunk_past_the_end(self):
+        self.assertFalse(self.isComplete(buildExr(cut=1)))
+        self.assertFalse(self.isComplete(buildExr(cut=50)))
+
+    def test_file_ending_in_the_header(self):
+        data = buildExr(comment=b'x' * 100)
+        self.assertFalse(self.isComplete(data[:60]))
+
+    def test_header_bigger_than_the_first_read(self):
+        comment = b'x' * (sequenceCheck.EXR_FIRST_READ * 3)
+        self.assertTrue(self.isComplete(buildExr(comment=comment)))
+        self.assertFalse(self.isComplete(buildExr(comment=comment, cut=1)))
+        self.assertFalse(self.isComplete(buildExr(comment=comment, zeroTable=True)))
+
+    def test_offset_table_past_the_first_read(self):
+        # more chunks than fit in the first read
+        height = sequenceCheck.EXR_FIRST_READ
+        self.assertTrue(self.isComplete(buildExr(height=height, compression=0)))
+        self.assertFalse(self.isComplete(buildExr(height=height, compression=0, cut=1)))
+
+    def test_header_bigger_than_the_limit_only_checks_the_magic_number(self):
+        comment = b'x' * sequenceCheck.EXR_HEADER_SIZE
+        self.assertTrue(self.isComplete(buildExr(comment=comment, zeroTable=True)))
+
+    def test_tiled_deep_and_multipart_only_check_the_magic_number(self):
+        for flags in (0x200, 0x800, 0x1000):
+            data = buildExr(flags=flags)[:12]
+            self.assertTrue(self.isComplete(data))
+
+    def test_not_an_exr(self):
+        self.assertFalse(self.isComplete(b'\x89PNG\r\n\x1a\n' + b'\0' * 100))
+        self.assertFalse(self.isComplete(b''))
+
+    def test_check_sequence(self):
+        self.write(buildExr(), 'beauty.0001.exr')
+        self.write(b'', 'beauty.0002.exr')
+        self.write(buildExr(cut=10), 'beauty.0003.exr')
+        self.write(buildExr(), 'beauty.0005.exr')
+        # other passes in the folder are ignored
+        self.write(b'', 'diffuse.0004.exr')
+        missing, empty, truncated = sequenceCheck.checkSequence(self.folder, 'beauty.0001.exr', [1, 2, 3, 4, 5])
+        self.assertEqual((missing, empty, truncated), ([4], [2], [3]))
+
+    def test_check_sequence_of_a_missing_folder(self):
+        missing, empty, truncated = sequenceCheck.checkSequence(os.path.join(self.folder, 'nope'),
+                                                                'beauty.0001.exr', [1, 2])
+        self.assertEqual((missing, empty, truncated), ([1, 2], [], []))
+
+
+if __name__ == '__main__':
+    unittest.main()